@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
 import threading
@@ -15,10 +15,16 @@ from services.crowd_service import CrowdService
 from services.traffic_service import TrafficService
 from services.alert_service import AlertService
 from services.satellite_service import SatelliteService
+from services.refresh_engine import RefreshEngine
+from services.refresh_scheduler import RefreshScheduler
+from services.http_client import get_http_client
+from services.upstream_cache import UpstreamCache
+from services.async_ingestor import AsyncIngestor
+from services.circuit_breaker import get_breaker_statuses
 
 app = Flask(__name__)
 app.config.from_object(Config)
-CORS(app)
+CORS(app, expose_headers=['X-Cache', 'Age', 'ETag', 'Content-Range', 'Accept-Ranges'])
 socketio = SocketIO(app, cors_allowed_origins="*")
 
 # Initialize services
@@ -28,6 +34,19 @@ crowd_service = CrowdService()
 traffic_service = TrafficService()
 alert_service = AlertService()
 satellite_service = SatelliteService()
+upstream_cache = UpstreamCache()
+
+EMERGENCY_ASSEMBLY_POINTS = [
+    {'name': 'Ground A', 'coordinates': [25.4500, 81.8600], 'capacity': 100000},
+    {'name': 'Ground B', 'coordinates': [25.4200, 81.8300], 'capacity': 80000}
+]
+
+# Predicted earthquake shaking is reported at every crowd zone and assembly point
+satellite_service.set_flood_zones(crowd_service.crowd_zones)
+earthquake_service.set_intensity_sites(
+    [dict(zone, kind='crowd_zone') for zone in crowd_service.crowd_zones] +
+    [dict(point, id=point['name'], kind='assembly_point') for point in EMERGENCY_ASSEMBLY_POINTS]
+)
 
 # Global data storage
 dashboard_data = {
@@ -40,6 +59,14 @@ dashboard_data = {
     'risk_score': 0
 }
 
+def cached_response(source, loader):
+    """Serve a source through the upstream cache with hit/age metadata headers"""
+    data, cache_meta = upstream_cache.fetch(source, loader)
+    response = jsonify(data)
+    response.headers['X-Cache'] = cache_meta['status'].upper()
+    response.headers['Age'] = str(int(cache_meta['age_seconds']))
+    return response, data
+
 @app.route('/')
 def index():
     return jsonify({
@@ -57,9 +84,9 @@ def get_dashboard_data():
 def get_weather():
     """Get current weather data"""
     try:
-        weather_data = weather_service.get_current_weather()
+        response, weather_data = cached_response('weather', weather_service.get_current_weather)
         dashboard_data['weather'] = weather_data
-        return jsonify(weather_data)
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -67,8 +94,8 @@ def get_weather():
 def get_weather_forecast():
     """Get weather forecast"""
     try:
-        forecast_data = weather_service.get_forecast()
-        return jsonify(forecast_data)
+        response, _ = cached_response('forecast', weather_service.get_forecast)
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -76,9 +103,60 @@ def get_weather_forecast():
 def get_earthquakes():
     """Get recent earthquakes"""
     try:
-        earthquakes = earthquake_service.get_recent_earthquakes()
+        response, earthquakes = cached_response('earthquakes', earthquake_service.get_recent_earthquakes)
         dashboard_data['earthquakes'] = earthquakes
-        return jsonify(earthquakes)
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/earthquakes/query')
+def query_earthquakes():
+    """Query the local earthquake catalog by location, radius and magnitude"""
+    try:
+        lat = request.args.get('lat', type=float)
+        lon = request.args.get('lon', type=float)
+        radius_km = request.args.get('radius_km', type=float)
+        min_magnitude = request.args.get('min_magnitude', type=float)
+        limit = request.args.get('limit', default=20, type=int)
+        return jsonify(earthquake_service.query_earthquakes(lat, lon, radius_km, min_magnitude, limit=limit))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/earthquakes/nearest')
+def nearest_earthquakes():
+    """Get the k catalog earthquakes closest to a location"""
+    try:
+        lat = request.args.get('lat', default=Config.MAHAKUMBH_LAT, type=float)
+        lon = request.args.get('lon', default=Config.MAHAKUMBH_LON, type=float)
+        k = request.args.get('k', default=10, type=int)
+        min_magnitude = request.args.get('min_magnitude', type=float)
+        return jsonify(earthquake_service.nearest_earthquakes(lat, lon, k, min_magnitude))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/earthquakes/bbox')
+def earthquakes_in_bbox():
+    """Get catalog earthquakes inside a min_lon,min_lat,max_lon,max_lat bounding box"""
+    try:
+        bbox = [float(value) for value in request.args.get('bbox', '').split(',')]
+        if len(bbox) != 4:
+            return jsonify({'error': 'bbox must be min_lon,min_lat,max_lon,max_lat'}), 400
+        min_magnitude = request.args.get('min_magnitude', type=float)
+        limit = request.args.get('limit', default=20, type=int)
+        return jsonify(earthquake_service.earthquakes_in_bbox(*bbox, min_magnitude=min_magnitude, limit=limit))
+    except ValueError:
+        return jsonify({'error': 'bbox must be min_lon,min_lat,max_lon,max_lat'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/earthquakes/intensity')
+def get_earthquake_intensity():
+    """Get predicted shaking (MMI and PGA) at every crowd zone and assembly point"""
+    try:
+        intensity = earthquake_service.get_intensity_estimate()
+        if intensity is None:
+            return jsonify({'error': 'No intensity sites configured'}), 503
+        return jsonify(intensity)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -92,6 +170,68 @@ def get_crowd_data():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/crowd/readings', methods=['POST'])
+def ingest_crowd_readings():
+    """Buffer a batch of zone sensor readings, sent as JSON or packed binary records"""
+    try:
+        if request.mimetype == 'application/octet-stream':
+            accepted, rejected = crowd_service.ingest_binary(request.get_data(cache=False))
+        else:
+            payload = request.get_json(silent=True)
+            if not isinstance(payload, dict):
+                return jsonify({'error': 'Expected a JSON object or application/octet-stream readings'}), 400
+            accepted, rejected = crowd_service.ingest_json(payload)
+        return jsonify({'accepted': accepted, 'rejected': rejected}), 202
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': f'Malformed readings: {e}'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/crowd/readings/schema')
+def get_crowd_readings_schema():
+    """Describe the packed binary reading format and the zone index it uses"""
+    return jsonify(crowd_service.get_ingest_schema())
+
+@app.route('/api/crowd/readings/<zone_id>')
+def get_crowd_readings(zone_id):
+    """Get a zone's buffered sensor readings, oldest first"""
+    readings = crowd_service.get_zone_readings(zone_id, request.args.get('limit', type=int))
+    if readings is None:
+        return jsonify({'error': f'Unknown zone {zone_id}'}), 404
+    return jsonify(readings)
+
+@app.route('/api/crowd/predictions')
+def get_crowd_predictions():
+    """Get the forecast mean crowd density for each of the next hours"""
+    try:
+        hours = request.args.get('hours', default=24, type=int)
+        return jsonify(crowd_service.get_crowd_predictions(hours))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/crowd/heatmap')
+@app.route('/api/crowd/heatmap.png', defaults={'image': True})
+def get_crowd_heatmap(image=False):
+    """Get the crowd density raster for a min_lon,min_lat,max_lon,max_lat viewport at a cell size (m)"""
+    try:
+        bbox = request.args.get('bbox')
+        bbox = [float(value) for value in bbox.split(',')] if bbox else None
+        if bbox is not None and len(bbox) != 4:
+            return jsonify({'error': 'bbox must be min_lon,min_lat,max_lon,max_lat'}), 400
+        cell_m = request.args.get('level', type=int)
+        if not image:
+            return jsonify(crowd_service.get_heatmap(bbox, cell_m))
+        png, snapped, level = crowd_service.get_heatmap_png(bbox, cell_m)
+        response = Response(png, mimetype='image/png')
+        response.headers['X-Heatmap-Bbox'] = ','.join(str(value) for value in snapped)
+        response.headers['X-Heatmap-Cell'] = str(level)
+        response.cache_control.no_cache = True
+        return response
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/traffic')
 def get_traffic_data():
     """Get traffic data"""
@@ -137,11 +277,49 @@ def get_emergency_contacts():
 def get_satellite_imagery():
     """Get satellite imagery data"""
     try:
-        satellite_data = satellite_service.get_area_imagery()
+        response, satellite_data = cached_response('satellite', satellite_service.get_area_imagery)
         dashboard_data['satellite'] = satellite_data
-        return jsonify(satellite_data)
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/satellite/image/<image_hash>.png')
+def get_satellite_image(image_hash):
+    """Serve a rendered satellite image by content hash (immutable, conditional and range aware)"""
+    image = satellite_service.images.get(image_hash)
+    if image is None:
+        return jsonify({'error': 'Image not found'}), 404
+    response = Response(mimetype='image/png')
+    response.set_data(image)  # May be a read-only memory map of the disk cache
+    response.set_etag(image_hash)
+    response.cache_control.public = True
+    response.cache_control.max_age = Config.SATELLITE_IMAGE_MAX_AGE
+    response.cache_control.immutable = True
+    return response.make_conditional(request, accept_ranges=True, complete_length=len(image))
+
+@app.route('/api/satellite/tiles/<int:z>/<int:x>/<int:y>')
+@app.route('/api/satellite/tiles/<int:z>/<int:x>/<int:y>.png')
+def get_satellite_tile(z, x, y):
+    """Serve one XYZ tile of the event area, rendering it on first request"""
+    try:
+        tile = satellite_service.get_tile(z, x, y)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+    if tile is None:
+        return jsonify({'error': 'Tile outside the event area pyramid'}), 404
+    image, etag, max_age = tile
+    response = Response(mimetype='image/png')
+    response.set_data(image)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+@app.route('/api/satellite/tiles.json')
+def get_satellite_tile_metadata():
+    """Describe the satellite tile pyramid (TileJSON)"""
+    tile_url = request.host_url.rstrip('/') + '/api/satellite/tiles/{z}/{x}/{y}.png'
+    return jsonify(satellite_service.get_tile_metadata(tile_url))
 
 @app.route('/api/satellite/flood-analysis')
 def get_flood_analysis():
@@ -170,6 +348,30 @@ def get_satellite_evacuation_routes():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/terrain/point')
+def get_point_terrain():
+    """Get elevation, slope, aspect and flood-prone flag at a location from the DEM"""
+    try:
+        lat = request.args.get('lat', default=Config.MAHAKUMBH_LAT, type=float)
+        lon = request.args.get('lon', default=Config.MAHAKUMBH_LON, type=float)
+        terrain = satellite_service.get_point_terrain(lat, lon)
+        if terrain is None:
+            return jsonify({'error': 'No DEM configured'}), 503
+        return jsonify(terrain)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/terrain/zones')
+def get_zone_terrain():
+    """Get elevation and flood-prone ground around every crowd zone from the DEM"""
+    try:
+        zones = satellite_service.get_zone_terrain(crowd_service.crowd_zones)
+        if zones is None:
+            return jsonify({'error': 'No DEM configured'}), 503
+        return jsonify(zones)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/evacuation-routes')
 def get_evacuation_routes():
     """Get evacuation routes"""
@@ -188,10 +390,7 @@ def get_evacuation_routes():
                 'status': 'open'
             }
         ],
-        'emergency_assembly_points': [
-            {'name': 'Ground A', 'coordinates': [25.4500, 81.8600], 'capacity': 100000},
-            {'name': 'Ground B', 'coordinates': [25.4200, 81.8300], 'capacity': 80000}
-        ]
+        'emergency_assembly_points': EMERGENCY_ASSEMBLY_POINTS
     }
     return jsonify(routes)
 
@@ -204,56 +403,161 @@ def handle_connect():
 def handle_disconnect():
     print('Client disconnected')
 
+def publish_section(section, data):
+    """Store a refreshed section and push it to connected clients right away"""
+    if section in Config.CACHE_TTLS:
+        upstream_cache.put(section, data)
+    if section == 'weather':
+        crowd_service.set_weather(data)
+    if section in dashboard_data:
+        dashboard_data[section] = data
+        socketio.emit('section_update', {'section': section, 'data': data})
+
+# Upstream providers are fetched with aiohttp on their own loop when configured
+async_ingestor = None
+if Config.INGEST_BACKEND == 'aiohttp':
+    async_ingestor = AsyncIngestor(weather_service, earthquake_service, satellite_service)
+
+refresh_engine = RefreshEngine(publish_section)
+if async_ingestor is None:
+    refresh_engine.register('weather', weather_service.get_current_weather)
+    refresh_engine.register('earthquakes', earthquake_service.get_recent_earthquakes)
+    refresh_engine.register('satellite', satellite_service.get_area_imagery)
+refresh_engine.register('crowd', crowd_service.get_crowd_analytics)
+refresh_engine.register('traffic', traffic_service.get_traffic_conditions)
+refresh_engine.register('alerts', alert_service.get_all_alerts)
+
+# Each source refreshes on its own cadence after the initial full cycle
+refresh_scheduler = RefreshScheduler(refresh_engine)
+for source in refresh_engine.sources:
+    refresh_scheduler.add_job(source, run_now=False)
+
+@app.route('/api/system/refresh')
+def get_refresh_status():
+    """Get background refresh timing per source"""
+    return jsonify(refresh_engine.get_status())
+
+@app.route('/api/system/scheduler')
+def get_scheduler_status():
+    """Get per-source refresh schedule"""
+    return jsonify(refresh_scheduler.get_status())
+
+@app.route('/api/system/http')
+def get_http_stats():
+    """Get upstream connection reuse per host"""
+    return jsonify(get_http_client().get_stats())
+
+@app.route('/api/system/cache')
+def get_cache_stats():
+    """Get upstream cache hit rates and entry ages, plus the satellite image store"""
+    return jsonify(dict(
+        upstream_cache.get_stats(),
+        satellite_images=satellite_service.images.get_stats(),
+        satellite_disk=satellite_service.disk_cache.get_stats(),
+        satellite_tiles=satellite_service.tile_cache.get_stats(),
+        satellite_bands=satellite_service.band_cache.get_stats(),
+        satellite_fallback=satellite_service.fallback.get_stats(),
+        dem=satellite_service.dem.get_stats() if satellite_service.dem else None
+    ))
+
+@app.route('/api/system/coalescing')
+def get_coalescing_stats():
+    """Get how many concurrent upstream calls were coalesced per service"""
+    return jsonify({
+        'weather': weather_service.flight.get_stats(),
+        'earthquakes': earthquake_service.flight.get_stats(),
+        'satellite': satellite_service.flight.get_stats()
+    })
+
+@app.route('/api/system/breakers')
+def get_breaker_status():
+    """Get circuit breaker state and trip counts per upstream provider"""
+    return jsonify(get_breaker_statuses())
+
+@app.route('/api/system/feeds')
+def get_feed_stats():
+    """Get conditional fetch and change detection counters for upstream feeds"""
+    return jsonify({
+        'usgs': earthquake_service.get_feed_stats(),
+        'ground_motion': earthquake_service.ground_motion.get_stats(),
+        'flood': satellite_service.flood.get_stats(),
+        'scene_change': satellite_service.scene.get_stats(),
+        'crowd_sensors': crowd_service.sensors.get_stats(),
+        'crowd_anomalies': crowd_service.detector.get_stats(),
+        'crowd_forecast': crowd_service.forecaster.get_stats()
+    })
+
+@app.route('/api/system/ingest')
+def get_ingest_status():
+    """Get which backend fetches upstream providers and its counters"""
+    if async_ingestor is None:
+        return jsonify({'backend': 'threads', 'sources': list(refresh_engine.sources)})
+    return jsonify(async_ingestor.get_status())
+
+def publish_dashboard():
+    """Recalculate the risk score and emit the full dashboard"""
+    risk_score = alert_service.calculate_risk_score(dashboard_data)
+    dashboard_data['risk_score'] = risk_score
+    
+    # Emit updated data to all connected clients
+    socketio.emit('dashboard_update', dashboard_data)
+    
+    # Check for critical alerts
+    critical_alerts = alert_service.get_critical_alerts()
+    if critical_alerts:
+        socketio.emit('critical_alert', critical_alerts)
+
 def background_task():
     """Background task to update data and emit to connected clients"""
+    if async_ingestor is not None:
+        async_ingestor.start()
+    
+    # Fill every section concurrently before handing over to the scheduler
+    try:
+        refresh_engine.run_cycle()
+        publish_dashboard()
+    except Exception as e:
+        print(f"Error in initial refresh cycle: {e}")
+    
     while True:
         try:
-            # Update weather data
-            weather_data = weather_service.get_current_weather()
-            dashboard_data['weather'] = weather_data
+            refresh_scheduler.tick()
             
-            # Update earthquake data
-            earthquakes = earthquake_service.get_recent_earthquakes()
-            dashboard_data['earthquakes'] = earthquakes
+            # Publish whatever the async ingestion loop fetched since the last tick
+            ingested = async_ingestor.drain() if async_ingestor is not None else []
+            for section, data in ingested:
+                publish_section(section, data)
             
-            # Update crowd data
-            crowd_data = crowd_service.get_crowd_analytics()
-            dashboard_data['crowd'] = crowd_data
-            
-            # Update traffic data
-            traffic_data = traffic_service.get_traffic_conditions()
-            dashboard_data['traffic'] = traffic_data
-            
-            # Update satellite data
-            satellite_data = satellite_service.get_area_imagery()
-            dashboard_data['satellite'] = satellite_data
-            
-            # Update alerts
-            alerts = alert_service.get_all_alerts()
-            dashboard_data['alerts'] = alerts
-            
-            # Calculate risk score
-            risk_score = alert_service.calculate_risk_score(dashboard_data)
-            dashboard_data['risk_score'] = risk_score
-            
-            # Emit updated data to all connected clients
-            socketio.emit('dashboard_update', dashboard_data)
-            
-            # Check for critical alerts
-            critical_alerts = alert_service.get_critical_alerts()
-            if critical_alerts:
-                socketio.emit('critical_alert', critical_alerts)
-            
-            time.sleep(30)  # Update every 30 seconds
+            # Recalculate the risk score once per tick, only if a source finished
+            completed = refresh_scheduler.pop_completed()
+            if completed or ingested:
+                publish_dashboard()
             
         except Exception as e:
             print(f"Error in background task: {e}")
-            time.sleep(60)  # Wait longer on error
+        
+        time.sleep(Config.SCHEDULER_TICK)
+
+background_started = False
+background_lock = threading.Lock()
+
+def start_background_tasks():
+    """Start the background refresh once per process"""
+    global background_started
+    with background_lock:
+        if background_started:
+            return
+        background_started = True
+    socketio.start_background_task(background_task)
+
+@app.before_request
+def ensure_background_tasks():
+    # gunicorn imports the app without running __main__, so start on first request
+    start_background_tasks()
 
 if __name__ == '__main__':
     # Start background task
-    background_thread = threading.Thread(target=background_task, daemon=True)
-    background_thread.start()
+    start_background_tasks()
     
     # Get port from environment variable (for Render) or use default
     port = int(os.environ.get('PORT', 5001))
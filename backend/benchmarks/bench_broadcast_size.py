@@ -0,0 +1,70 @@
+"""
+Measure how much the satellite image inflates dashboard broadcasts.
+
+Builds a dashboard payload from the offline services (crowd, traffic, mock
+earthquakes) plus the satellite section in both shapes: the old one with the
+PNG base64-encoded into `image_data`, and the current one carrying only the
+image hash and URL. Reports the JSON size of one `dashboard_update`, and the
+bytes sent per hour to N clients at the configured refresh interval, counting
+one image download per client for the URL form (it is served immutable).
+
+    python benchmarks/bench_broadcast_size.py --clients 1,100,1000 --image satellite-imagery.png
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.crowd_service import CrowdService
+from services.earthquake_service import EarthquakeService
+from services.satellite_service import SatelliteService
+from services.traffic_service import TrafficService
+
+def dashboard_payload(satellite):
+    earthquakes = EarthquakeService()
+    return {
+        'weather': {'temperature': 31.2, 'humidity': 64, 'wind_speed': 12, 'visibility': 8000},
+        'earthquakes': earthquakes._get_mock_earthquake_data(),
+        'crowd': CrowdService().get_crowd_analytics(),
+        'traffic': TrafficService().get_traffic_conditions(),
+        'alerts': [],
+        'satellite': satellite,
+        'risk_score': {'overall_score': 42.0, 'risk_level': 'moderate'}
+    }
+
+def main():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', default='1,100,1000')
+    parser.add_argument('--image', default=os.path.join(backend_dir, 'satellite-imagery.png'))
+    args = parser.parse_args()
+
+    with open(args.image, 'rb') as image_file:
+        image = image_file.read()
+    service = SatelliteService()
+    bbox, time_range = service.default_bbox(), service.default_time_range()
+    current = service._format_satellite_data(image, bbox, time_range)
+    legacy = {key: value for key, value in current.items() if not key.startswith('image_')}
+    legacy['image_data'] = base64.b64encode(image).decode('utf-8')
+
+    payload = dashboard_payload(current)
+    legacy_bytes = len(json.dumps(dict(payload, satellite=legacy)).encode())
+    current_bytes = len(json.dumps(payload).encode())
+    per_hour = int(3600 // Config.REFRESH_INTERVAL)
+
+    print(f"image: {len(image)} bytes PNG, {len(legacy['image_data'])} bytes as base64")
+    print(f"dashboard_update: {legacy_bytes} bytes before, {current_bytes} bytes now "
+          f"({100 * (1 - current_bytes / legacy_bytes):.1f}% smaller)")
+    print(f"\n{per_hour} broadcasts per hour (REFRESH_INTERVAL={Config.REFRESH_INTERVAL}s)")
+    print(f"{'clients':>8} {'before MB/h':>12} {'now MB/h':>10} {'saved':>7}")
+    for clients in (int(value) for value in args.clients.split(',')):
+        before = legacy_bytes * per_hour * clients
+        now = current_bytes * per_hour * clients + len(image) * clients
+        print(f"{clients:>8} {before / 2 ** 20:>12.1f} {now / 2 ** 20:>10.1f} {100 * (1 - now / before):>6.1f}%")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Measure crowd forecast inference for every zone at every horizon.
+
+Trains a model on a synthetic hourly history (--train-zones zones over
+--days days: hour-of-day cycle, bathing-day surges, weather, noise) with
+the same code as `python -m services.crowd_forecast`. Then it times
+forecasting --zones zones x --horizons hours ahead four ways:
+- one model call per (zone, horizon) pair, timed on a sample and scaled up;
+- one call per horizon;
+- a single batched call (CrowdForecaster.predict);
+- the per-tick cache (CrowdService._forecast after the first call).
+Timings are the median of --repeat runs in milliseconds.
+
+    python benchmarks/bench_crowd_forecast.py --zones 1000 --horizons 48
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from services.crowd_forecast import HOURLY_PROFILE, CrowdForecaster, EventCalendar, feature_matrix, train
+from services.crowd_service import CrowdService
+from bench_crowd_zones import median_ms, synthetic_zones
+
+def synthetic_history(calendar, zones, days, seed=3):
+    rng = np.random.default_rng(seed)
+    start = (calendar.start_day * 86400) - calendar.utc_offset
+    timestamps = start + np.arange(days * 24) * 3600.0
+    hours = calendar.local_hours(timestamps).astype(np.int64)
+    bathing = calendar.features(timestamps)[1]
+    temperature = 18 + 8 * np.sin((hours - 9) / 24 * 2 * np.pi) + rng.normal(0, 1.5, timestamps.size)
+    humidity = np.clip(60 - (temperature - 18) * 2 + rng.normal(0, 5, timestamps.size), 10, 100)
+    level = rng.uniform(0.6, 1.1, zones)
+    density = (level[:, None] * HOURLY_PROFILE[hours] * (1 + 0.25 * bathing) - 0.004 * (temperature - 18)
+               + rng.normal(0, 0.04, (zones, timestamps.size)))
+    return pd.DataFrame({
+        'zone_id': np.repeat([f'sector_{index}' for index in range(zones)], timestamps.size),
+        'timestamp': np.tile(timestamps, zones),
+        'capacity': np.repeat(rng.integers(1000, 150000, zones), timestamps.size),
+        'density': np.clip(density, 0, 1).ravel(),
+        'temperature': np.tile(temperature, zones),
+        'humidity': np.tile(humidity, zones)
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--zones', type=int, default=1000)
+    parser.add_argument('--horizons', type=int, default=48)
+    parser.add_argument('--train-zones', type=int, default=40)
+    parser.add_argument('--days', type=int, default=45)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    calendar = EventCalendar(Config.CROWD_EVENT_START, Config.CROWD_BATHING_DAYS, Config.CROWD_EVENT_UTC_OFFSET_H)
+    horizons = np.arange(1, args.horizons + 1)
+    start = time.perf_counter()
+    bundle = train(synthetic_history(calendar, args.train_zones, args.days), calendar, horizons)
+    print(f"Trained on {bundle['samples']} samples in {time.perf_counter() - start:.1f}s; "
+          f"held-out MAE {bundle['mae']:.3f} (h=1 {bundle['horizon_mae'][0]:.3f}, "
+          f"h={args.horizons} {bundle['horizon_mae'][-1]:.3f})\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        model_path = os.path.join(directory, 'crowd_forecast.joblib')
+        joblib.dump(bundle, model_path)
+        forecaster = CrowdForecaster(model_path)
+        service = CrowdService(synthetic_zones(args.zones))
+        service.get_crowd_analytics()
+        service.forecaster, service.horizons = forecaster, horizons
+
+        issued, density, capacity = time.time(), service.zones.density, service.zones.capacity
+        forecaster.load()
+        pairs = args.zones * args.horizons
+        sample = min(pairs, 200)
+        rows = feature_matrix(forecaster.calendar, issued, np.tile(horizons, args.zones),
+                              np.repeat(density, args.horizons), np.repeat(capacity, args.horizons), np.nan, np.nan)
+        model = bundle['model']
+        per_pair_ms = median_ms(lambda: [model.predict(rows[index:index + 1]) for index in range(sample)],
+                                max(1, args.repeat // 5)) * pairs / sample
+
+        def per_horizon():
+            for horizon in horizons:
+                model.predict(feature_matrix(forecaster.calendar, issued, np.full(args.zones, horizon), density,
+                                             capacity, np.nan, np.nan))
+
+        def batched():
+            forecaster.predict(issued, horizons, density, capacity)
+
+        def cached():
+            service._forecast()
+
+        service.forecast = None
+        first_tick_ms = median_ms(lambda: (setattr(service, 'forecast', None), service._forecast()), args.repeat)
+        print(f"{args.zones} zones x {args.horizons} horizons = {pairs} forecasts")
+        print(f"{'method':<26} {'ms':>10}")
+        print(f"{'per (zone, horizon) est.':<26} {per_pair_ms:>10.1f}")
+        print(f"{'per horizon':<26} {median_ms(per_horizon, args.repeat):>10.1f}")
+        print(f"{'one batched call':<26} {median_ms(batched, args.repeat):>10.1f}")
+        print(f"{'first call in a tick':<26} {first_tick_ms:>10.1f}")
+        print(f"{'cached within a tick':<26} {median_ms(cached, args.repeat):>10.4f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Compare one crowd refresh over a list of zone dicts with the columnar zone table.
+
+The "dicts" path is what CrowdService did before: update each zone dict in
+place (density, risk level, flow rate), then make separate passes for the
+overall metrics, the risk assessment and the critical zones. The "columns"
+path runs the same refresh through ZoneTable as whole-array operations. The
+JSON view of every zone, which the API still builds, is timed on its own.
+Timings are the median of --repeat runs in milliseconds.
+
+    python benchmarks/bench_crowd_zones.py --sizes 4,1000,50000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.crowd_service import CrowdService
+from services.zone_table import DIRECTIONS
+
+def synthetic_zones(count, seed=11):
+    rng = random.Random(seed)
+    return [{
+        'id': f'sector_{index}',
+        'name': f'Sector {index}',
+        'coordinates': [25.4358 + rng.uniform(-0.1, 0.1), 81.8463 + rng.uniform(-0.1, 0.1)],
+        'capacity': rng.randint(1000, 150000),
+        'current_density': 0.0,
+        'flow_direction': rng.choice(DIRECTIONS),
+        'risk_level': 'low'
+    } for index in range(count)]
+
+def risk_level(density):
+    if density < 0.3:
+        return 'low'
+    elif density < 0.7:
+        return 'moderate'
+    elif density < 0.9:
+        return 'high'
+    return 'critical'
+
+def refresh_dicts(zones):
+    for zone in zones:
+        zone['current_density'] = min(1.0, max(0.0, 0.8 + random.uniform(-0.2, 0.2)))
+        zone['risk_level'] = risk_level(zone['current_density'])
+        zone['flow_rate'] = random.randint(100, 1000)
+    total_capacity = sum(zone['capacity'] for zone in zones)
+    total_current = sum(zone['capacity'] * zone['current_density'] for zone in zones)
+    metrics = {
+        'total_capacity': total_capacity,
+        'occupancy_percentage': total_current / total_capacity * 100,
+        'average_density': np.mean([zone['current_density'] for zone in zones]),
+        'max_density': max([zone['current_density'] for zone in zones]),
+        'zones_at_capacity': len([zone for zone in zones if zone['current_density'] > 0.9])
+    }
+    high_risk = len([zone for zone in zones if zone['risk_level'] in ['high', 'critical']])
+    critical = [zone for zone in zones if zone['risk_level'] in ['high', 'critical']]
+    return metrics, high_risk, critical
+
+def refresh_columns(service):
+    table = service.zones
+    table.update(np.clip(0.8 + np.random.uniform(-0.2, 0.2, len(table)), 0.0, 1.0),
+                 np.random.randint(100, 1001, len(table)))
+    return table.metrics(), table.risk_counts(), table.critical_rows()
+
+def median_ms(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='4,1000,50000')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'zones':>7} {'dicts ms':>10} {'columns ms':>11} {'speedup':>8} {'JSON view ms':>13}")
+    for count in (int(value) for value in args.sizes.split(',')):
+        zones = synthetic_zones(count)
+        service = CrowdService(synthetic_zones(count))
+        dicts_ms = median_ms(lambda: refresh_dicts(zones), args.repeat)
+        columns_ms = median_ms(lambda: refresh_columns(service), args.repeat)
+        view_ms = median_ms(lambda: service.crowd_zones, args.repeat)
+        print(f"{count:>7} {dicts_ms:>10.3f} {columns_ms:>11.3f} {dicts_ms / columns_ms:>7.1f}x {view_ms:>13.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Measure /api/dashboard latency while upstream providers are deliberately slow.
+
+Starts a local fake OpenWeather/USGS server that delays every response and
+serves a large GeoJSON feed, then runs the app once per ingestion backend
+(INGEST_BACKEND=threads and INGEST_BACKEND=aiohttp) and reports p50/p95/p99.
+
+    python benchmarks/bench_dashboard_latency.py --delay 3 --features 20000 --duration 20
+"""
+import argparse
+import http.client
+import http.server
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def build_feed(features):
+    now_ms = int(time.time() * 1000)
+    return json.dumps({
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'id': f'bench{i}',
+                'properties': {'mag': 2.5 + (i % 40) / 10, 'place': f'Synthetic event {i}',
+                               'time': now_ms - i * 1000, 'updated': now_ms, 'type': 'earthquake'},
+                'geometry': {'type': 'Point', 'coordinates': [70 + (i % 300) / 10, 20 + (i % 150) / 10, 10.0]}
+            }
+            for i in range(features)
+        ]
+    }).encode()
+
+def build_weather():
+    now = int(time.time())
+    return json.dumps({
+        'main': {'temp': 30, 'feels_like': 32, 'humidity': 60, 'pressure': 1010},
+        'weather': [{'description': 'clear sky', 'icon': '01d'}],
+        'wind': {'speed': 3, 'deg': 90}, 'clouds': {'all': 5},
+        'sys': {'sunrise': now - 21600, 'sunset': now + 21600},
+        'coord': {'lat': 25.4358, 'lon': 81.8463}
+    }).encode()
+
+def start_upstream(delay, features):
+    """Serve slow fake upstream responses from a background thread"""
+    feed = build_feed(features)
+    weather = build_weather()
+    forecast = json.dumps({'list': []}).encode()
+
+    class SlowUpstream(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(delay)
+            if 'geojson' in self.path:
+                body = feed
+            elif '/forecast' in self.path:
+                body = forecast
+            else:
+                body = weather
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class QuietServer(http.server.ThreadingHTTPServer):
+        daemon_threads = True
+
+        def handle_error(self, request, client_address):
+            # Clients going away mid-delay when a backend run ends is expected
+            pass
+
+    server = QuietServer(('127.0.0.1', free_port()), SlowUpstream)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}'
+
+def serve(upstream, port):
+    """Run the app against the fake upstream (executed in a child process)"""
+    try:
+        import eventlet
+        eventlet.monkey_patch()
+    except ImportError:
+        pass
+    sys.path.insert(0, BACKEND_DIR)
+    import app as dashboard_app
+    dashboard_app.weather_service.base_url = upstream
+    dashboard_app.earthquake_service.usgs_base_url = upstream
+    dashboard_app.start_background_tasks()
+    dashboard_app.socketio.run(dashboard_app.app, host='127.0.0.1', port=port, log_output=False)
+
+def measure(port, duration):
+    """Hit /api/dashboard back to back and return sorted latencies in ms"""
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except OSError:
+            time.sleep(0.2)
+
+    latencies = []
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        started = time.perf_counter()
+        connection.request('GET', '/api/dashboard')
+        connection.getresponse().read()
+        latencies.append((time.perf_counter() - started) * 1000)
+        connection.close()
+        time.sleep(0.01)
+    return sorted(latencies)
+
+def percentile(values, pct):
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--delay', type=float, default=3.0, help='seconds each upstream response is delayed')
+    parser.add_argument('--features', type=int, default=20000, help='events in the fake USGS feed')
+    parser.add_argument('--duration', type=float, default=20.0, help='seconds of load per backend')
+    parser.add_argument('--backends', default='threads,aiohttp')
+    parser.add_argument('--serve', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    upstream = start_upstream(args.delay, args.features)
+    print(f"upstream delay {args.delay}s, feed {args.features} features, {args.duration}s per backend")
+    for backend in args.backends.split(','):
+        port = free_port()
+        env = dict(os.environ, INGEST_BACKEND=backend, SCHEDULER_TICK='0.5',
+                   WEATHER_REFRESH_INTERVAL='1', FORECAST_REFRESH_INTERVAL='1', EARTHQUAKE_REFRESH_INTERVAL='1')
+        child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', upstream, '--port', str(port)],
+                                 cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            latencies = measure(port, args.duration)
+        finally:
+            child.terminate()
+            child.wait()
+        print(f"{backend:>8}: n={len(latencies)} p50={percentile(latencies, 50):.1f}ms "
+              f"p95={percentile(latencies, 95):.1f}ms p99={percentile(latencies, 99):.1f}ms max={latencies[-1]:.1f}ms")
+
+if __name__ == '__main__':
+    main()
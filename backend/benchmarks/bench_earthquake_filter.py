@@ -0,0 +1,115 @@
+"""
+Compare the vectorized earthquake filter with the original per-feature loop.
+
+The legacy path builds a dict per feature, uses a flat-earth distance and
+sorts everything; the current path loads the feed into the catalog, filters
+its columnar arrays by great-circle distance and only ranks the 20 most
+recent matches.
+
+    python benchmarks/bench_earthquake_filter.py --sizes 1000,10000,100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.earthquake_catalog import EarthquakeCatalog
+from services.earthquake_service import EarthquakeService
+
+def synthetic_feed(size, seed=42):
+    rng = random.Random(seed)
+    now_ms = int(time.time() * 1000)
+    features = []
+    for i in range(size):
+        # A third of the catalog falls around the subcontinent, the rest anywhere
+        if i % 3 == 0:
+            lon, lat = rng.uniform(65, 100), rng.uniform(5, 40)
+        else:
+            lon, lat = rng.uniform(-180, 180), rng.uniform(-80, 80)
+        features.append({
+            'id': f'ev{i}',
+            'properties': {'mag': rng.uniform(1, 7), 'place': 'synthetic', 'time': now_ms - rng.randint(0, 30 * 86400000),
+                           'updated': now_ms, 'type': 'earthquake'},
+            'geometry': {'coordinates': [lon, lat, rng.uniform(0, 100)]}
+        })
+    return {'features': features}
+
+def legacy_format(service, data):
+    """The original per-feature implementation"""
+    earthquakes = []
+    for feature in data.get('features', []):
+        properties = feature['properties']
+        geometry = feature['geometry']
+        earthquake = {
+            'id': feature['id'],
+            'magnitude': properties.get('mag', 0),
+            'place': properties.get('place', 'Unknown location'),
+            'time': datetime.fromtimestamp(properties['time'] / 1000).isoformat(),
+            'updated': datetime.fromtimestamp(properties['updated'] / 1000).isoformat(),
+            'coordinates': geometry['coordinates'][:2],
+            'depth': geometry['coordinates'][2] if len(geometry['coordinates']) > 2 else 0,
+            'type': properties.get('type', 'earthquake'),
+            'alert': properties.get('alert', None),
+            'tsunami': properties.get('tsunami', 0),
+            'significance': properties.get('significance', 0),
+            'felt': properties.get('felt', None),
+            'cdi': properties.get('cdi', None),
+            'mmi': properties.get('mmi', None),
+            'url': properties.get('url', ''),
+            'detail': properties.get('detail', ''),
+            'status': properties.get('status', 'reviewed')
+        }
+        lon, lat = earthquake['coordinates'][0], earthquake['coordinates'][1]
+        distance_km = (((lat - service.config.MAHAKUMBH_LAT) ** 2 + (lon - service.config.MAHAKUMBH_LON) ** 2) ** 0.5) * 111
+        if distance_km <= 1000:
+            earthquakes.append(earthquake)
+    earthquakes.sort(key=lambda x: x['time'], reverse=True)
+    return {'earthquakes': earthquakes[:20], 'total_count': len(earthquakes)}
+
+def catalog_format(service, data):
+    """The current path: load into a fresh catalog, then query around Mahakumbh"""
+    catalog = EarthquakeCatalog(window_hours=24 * 60)
+    catalog.upsert(data['features'])
+    earthquakes, total_count = catalog.query(service.config.MAHAKUMBH_LAT, service.config.MAHAKUMBH_LON,
+                                             service.config.EARTHQUAKE_RADIUS_KM)
+    return {'earthquakes': earthquakes, 'total_count': total_count}
+
+def warm_refresh(service, catalog, data):
+    """A refresh against an already loaded catalog where no event changed"""
+    catalog.upsert(data['features'])
+    return catalog.query(service.config.MAHAKUMBH_LAT, service.config.MAHAKUMBH_LON,
+                         service.config.EARTHQUAKE_RADIUS_KM)
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    service = EarthquakeService()
+    print(f"{'events':>8} {'legacy ms':>10} {'vector ms':>10} {'speedup':>8} {'warm ms':>8} "
+          f"{'legacy n':>9} {'haversine n':>12}")
+    for size in (int(value) for value in args.sizes.split(',')):
+        data = synthetic_feed(size)
+        legacy_ms, legacy = best_of(lambda: legacy_format(service, data), args.repeat)
+        vector_ms, current = best_of(lambda: catalog_format(service, data), args.repeat)
+        catalog = EarthquakeCatalog(window_hours=24 * 60)
+        catalog.upsert(data['features'])
+        warm_ms, _ = best_of(lambda: warm_refresh(service, catalog, data), args.repeat)
+        print(f"{size:>8} {legacy_ms:>10.1f} {vector_ms:>10.1f} {legacy_ms / vector_ms:>7.1f}x {warm_ms:>8.1f} "
+              f"{legacy['total_count']:>9} {current['total_count']:>12}")
+
+if __name__ == '__main__':
+    main()
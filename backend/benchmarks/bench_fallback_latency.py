@@ -0,0 +1,76 @@
+"""
+Compare serving the satellite fallback from disk on every call with the preloaded assets.
+
+The "before" columns redo what each fallback used to do per call: read the
+static PNG from disk, base64-encode and hash it, redraw the PIL mock image,
+and decode the static PNG again for every tile crop. The "after" columns go
+through FallbackAssets, which did that work once when it was created.
+Timings are the median of --repeat calls in milliseconds.
+
+    python benchmarks/bench_fallback_latency.py --repeat 200
+"""
+import argparse
+import base64
+import hashlib
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+
+from config import Config
+from services.fallback_assets import FallbackAssets, render_mock_image
+from services.tile_pyramid import crop_tile, tile_range
+
+def median_ms(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def load_static(path):
+    with open(path, 'rb') as image_file:
+        png = image_file.read()
+    return base64.b64encode(png), hashlib.sha256(png).hexdigest()
+
+def decode_and_crop(path, bbox, z, x, y):
+    with open(path, 'rb') as image_file, Image.open(io.BytesIO(image_file.read())) as source:
+        return crop_tile(source.convert('RGBA'), bbox, z, x, y)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--image', default=Config.SATELLITE_STATIC_IMAGE)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=Config.SATELLITE_MOCK_SEED)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    assets = FallbackAssets(args.image)
+    assets.mock(args.seed)
+    assets.static_image()
+    print(f"static image: {len(assets.static.png)} bytes; preloading took {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    bbox = [Config.MAHAKUMBH_LON - 0.1, Config.MAHAKUMBH_LAT - 0.1, Config.MAHAKUMBH_LON + 0.1, Config.MAHAKUMBH_LAT + 0.1]
+    x, _, y, _ = tile_range(bbox, 13)
+    tile_repeat = max(1, args.repeat // 10)
+    cases = [
+        ('static image', lambda: load_static(args.image), lambda: assets.static_or_minimal().base64,
+         args.repeat),
+        ('mock image', lambda: render_mock_image(args.seed), lambda: assets.mock(args.seed).png, args.repeat),
+        ('tile crop z13', lambda: decode_and_crop(args.image, bbox, 13, x, y),
+         lambda: crop_tile(assets.static_image(), bbox, 13, x, y), tile_repeat)
+    ]
+
+    print(f"\n{'fallback':<14} {'before ms':>10} {'after ms':>10} {'speedup':>9}")
+    for name, before, after, repeat in cases:
+        before_ms, after_ms = median_ms(before, repeat), median_ms(after, repeat)
+        print(f"{name:<14} {before_ms:>10.3f} {after_ms:>10.4f} {before_ms / after_ms:>8.0f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Measure peak Python memory while ingesting USGS GeoJSON feeds of growing size.
+
+The buffered path is the original one: json.loads the whole body, then load
+every feature into the catalog. The streaming path feeds the body to
+FeatureStream in 64 KB chunks, dropping unwanted features and fields as they
+are decoded. The body bytes themselves are allocated before tracing starts,
+so the numbers only cover parsing and what the catalog retains.
+
+    python benchmarks/bench_feed_memory.py --sizes 2000,10000,50000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.earthquake_catalog import EarthquakeCatalog
+from services.earthquake_service import EarthquakeService
+from services.geojson_stream import FeatureStream
+from bench_earthquake_filter import synthetic_feed
+
+def usgs_like_feed(size):
+    """Synthetic feed padded with the properties a real USGS summary carries"""
+    features = synthetic_feed(size)['features']
+    for feature in features:
+        event_id = feature['id']
+        feature['type'] = 'Feature'
+        feature['geometry']['type'] = 'Point'
+        feature['properties'].update({
+            'url': f'https://earthquake.usgs.gov/earthquakes/eventpage/{event_id}',
+            'detail': f'https://earthquake.usgs.gov/earthquakes/feed/v1.0/detail/{event_id}.geojson',
+            'felt': None, 'cdi': None, 'mmi': None, 'alert': None, 'status': 'automatic', 'tsunami': 0,
+            'sig': 50, 'net': 'us', 'code': event_id, 'ids': f',{event_id},', 'sources': ',us,',
+            'types': ',origin,phase-data,', 'nst': 30, 'dmin': 1.2, 'rms': 0.8, 'gap': 90, 'magType': 'mb',
+            'title': f"M 4.2 - {feature['properties']['place']}"
+        })
+    body = {'type': 'FeatureCollection', 'metadata': {'generated': 0, 'title': 'synthetic', 'count': size},
+            'features': features}
+    return json.dumps(body).encode()
+
+def buffered(body):
+    catalog = EarthquakeCatalog(window_hours=24 * 60)
+    catalog.upsert(json.loads(body).get('features', []))
+    return catalog
+
+def streaming(body, select, chunk_size=65536):
+    catalog = EarthquakeCatalog(window_hours=24 * 60)
+    stream = FeatureStream(select)
+    for start in range(0, len(body), chunk_size):
+        stream.feed(body[start:start + chunk_size])
+    catalog.upsert(stream.close())
+    return catalog
+
+def measure(fn):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    started = time.perf_counter()
+    catalog = fn()
+    elapsed = (time.perf_counter() - started) * 1000
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2 ** 20, current / 2 ** 20, elapsed, len(catalog)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='2000,10000,50000')
+    parser.add_argument('--radius', type=float, default=1000.0, help='ingest radius for the filtered run')
+    args = parser.parse_args()
+
+    everything = EarthquakeService()
+    nearby = EarthquakeService()
+    nearby.config.EARTHQUAKE_INGEST_RADIUS_KM = args.radius
+
+    runs = (
+        ('buffered', lambda body: buffered(body)),
+        ('stream', lambda body: streaming(body, everything._select_features)),
+        (f'stream {args.radius:.0f}km', lambda body: streaming(body, nearby._select_features))
+    )
+    print(f"{'events':>8} {'body MB':>8} {'mode':>16} {'peak MB':>8} {'kept MB':>8} {'ms':>7} {'events kept':>12}")
+    for size in (int(value) for value in args.sizes.split(',')):
+        body = usgs_like_feed(size)
+        for name, run in runs:
+            peak, retained, elapsed, kept = measure(lambda: run(body))
+            print(f"{size:>8} {len(body) / 2 ** 20:>8.1f} {name:>16} {peak:>8.1f} {retained:>8.1f} {elapsed:>7.0f} {kept:>12}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Compare the old jittered-point heatmap with the rasterized density grid.
+
+The "points" path is what CrowdService sent before: five jittered points per
+zone, each its own JSON object. The "raster" path bins every zone's
+occupants into the grid over all zones at the finest level that fits, and
+returns it as base64 uint8 cells (JSON) or a colour-ramped PNG. Timings are
+the median of --repeat runs in milliseconds; sizes are serialized bytes.
+
+    python benchmarks/bench_heatmap.py --sizes 4,1000,50000
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.crowd_service import CrowdService
+from bench_crowd_zones import median_ms, synthetic_zones
+
+def heatmap_points(service):
+    table = service.zones
+    rows = np.repeat(np.arange(len(table)), 5)
+    lats = table.lats[rows] + np.random.uniform(-0.01, 0.01, rows.size)
+    lngs = table.lons[rows] + np.random.uniform(-0.01, 0.01, rows.size)
+    return json.dumps([
+        {'lat': lat, 'lng': lng, 'intensity': intensity, 'zone_id': zone_id}
+        for lat, lng, intensity, zone_id in zip(lats.tolist(), lngs.tolist(), table.density[rows].tolist(),
+                                                table.ids[rows].tolist())
+    ])
+
+def heatmap_raster(service):
+    service.rasters = {}
+    return json.dumps(service.get_heatmap())
+
+def heatmap_png(service):
+    service.rasters = {}
+    return service.get_heatmap_png()[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='4,1000,50000')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'zones':>7} {'points ms':>10} {'points KB':>10} {'raster ms':>10} {'raster KB':>10} "
+          f"{'png ms':>7} {'png KB':>7} {'cell m':>7}")
+    for count in (int(value) for value in args.sizes.split(',')):
+        service = CrowdService(synthetic_zones(count))
+        service.get_crowd_analytics()
+        points_ms = median_ms(lambda: heatmap_points(service), args.repeat)
+        raster_ms = median_ms(lambda: heatmap_raster(service), args.repeat)
+        png_ms = median_ms(lambda: heatmap_png(service), args.repeat)
+        print(f"{count:>7} {points_ms:>10.2f} {len(heatmap_points(service)) / 1024:>10.1f} {raster_ms:>10.2f} "
+              f"{len(heatmap_raster(service)) / 1024:>10.1f} {png_ms:>7.2f} {len(heatmap_png(service)) / 1024:>7.1f} "
+              f"{service.get_heatmap()['cell_m']:>7}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Measure sensor reading ingest throughput into the per-zone ring buffers.
+
+Sends --readings synthetic readings spread over --zones zones in batches of
+each --batch size, through each body format the ingest endpoint accepts:
+packed binary records, JSON columns and a JSON list of reading objects.
+Times cover decoding the request body (json.loads or frombuffer) plus the
+buffer write. The baseline appends every reading to a per-zone deque, the
+obvious pure-Python structure. The target is 50k readings/s on one core.
+
+    python benchmarks/bench_sensor_ingest.py --zones 1000 --readings 200000 --batch 1000,10000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.crowd_service import CrowdService
+from services.sensor_buffer import READING_DTYPE
+from bench_crowd_zones import synthetic_zones
+
+TARGET = 50000
+
+def synthetic_readings(zone_count, count, seed=5):
+    rng = np.random.default_rng(seed)
+    readings = np.zeros(count, dtype=READING_DTYPE)
+    readings['zone'] = rng.integers(0, zone_count, count)
+    readings['timestamp'] = time.time() - 60 + np.sort(rng.random(count)) * 60
+    readings['count'] = rng.integers(0, 150000, count)
+    readings['flow'] = rng.integers(0, 1000, count)
+    return readings
+
+def bodies(readings, zone_ids, batch, kind):
+    for start in range(0, len(readings), batch):
+        chunk = readings[start:start + batch]
+        if kind == 'binary':
+            yield chunk.tobytes()
+            continue
+        zones = [zone_ids[zone] for zone in chunk['zone'].tolist()]
+        if kind == 'json columns':
+            yield json.dumps({'zone_id': zones, 'timestamp': chunk['timestamp'].tolist(),
+                              'count': chunk['count'].tolist(), 'flow': chunk['flow'].tolist()}).encode()
+        else:
+            yield json.dumps({'readings': [
+                {'zone_id': zone, 'timestamp': timestamp, 'count': count, 'flow': flow}
+                for zone, timestamp, count, flow in zip(zones, chunk['timestamp'].tolist(),
+                                                        chunk['count'].tolist(), chunk['flow'].tolist())
+            ]}).encode()
+
+def ingest_deques(payloads, zone_rows, capacity):
+    series = {}
+    for body in payloads:
+        for reading in json.loads(body)['readings']:
+            zone = zone_rows[reading['zone_id']]
+            if zone not in series:
+                series[zone] = deque(maxlen=capacity)
+            series[zone].append((reading['timestamp'], reading['count'], reading['flow']))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--zones', type=int, default=1000)
+    parser.add_argument('--readings', type=int, default=200000)
+    parser.add_argument('--batch', default='1000,10000')
+    args = parser.parse_args()
+
+    zones = synthetic_zones(args.zones)
+    zone_ids = [zone['id'] for zone in zones]
+    readings = synthetic_readings(args.zones, args.readings)
+
+    print(f"{args.readings} readings over {args.zones} zones; target {TARGET} readings/s\n")
+    print(f"{'format':<14} {'batch':>6} {'readings/s':>12} {'vs target':>10}")
+    for batch in (int(value) for value in args.batch.split(',')):
+        for kind in ('binary', 'json columns', 'json objects', 'deque baseline'):
+            payloads = list(bodies(readings, zone_ids, batch, 'json objects' if kind == 'deque baseline' else kind))
+            service = CrowdService(zones)
+            start = time.perf_counter()
+            if kind == 'deque baseline':
+                ingest_deques(payloads, service.zones.rows, service.config.CROWD_SENSOR_BUFFER_SIZE)
+            else:
+                for body in payloads:
+                    if kind == 'binary':
+                        service.ingest_binary(body)
+                    else:
+                        service.ingest_json(json.loads(body))
+            rate = args.readings / (time.perf_counter() - start)
+            print(f"{kind:<14} {batch:>6} {rate:>12,.0f} {rate / TARGET:>9.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""
+Compare grid index queries with a brute-force scan of the whole catalog.
+
+Each size loads a synthetic catalog, then runs a batch of radius, nearest
+and bounding box queries around points in northern India (standing in for
+crowd zones and assembly points). The brute-force path computes the
+great-circle distance to every event per query, which is what the catalog
+did before the index; the index only looks at the grid cells a query
+overlaps. Results are checked against each other.
+
+Bounding box queries binary-search columns kept sorted by latitude and
+test only that latitude band for longitude: "bbox" uses 2 x 2 degree
+boxes, "narrow" boxes --narrow degrees across. The sorted columns are
+built once after each change to the index; that one-off cost is reported
+separately as "columns".
+
+    python benchmarks/bench_spatial_index.py --sizes 10000,20000,100000 --queries 200
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.geo import haversine_km
+from services.spatial_index import GridIndex
+from bench_earthquake_filter import synthetic_feed
+
+def load(features, cell_degrees):
+    index = GridIndex(cell_degrees)
+    ids, lats, lons = [], [], []
+    for feature in features:
+        lon, lat = feature['geometry']['coordinates'][:2]
+        index.insert(feature['id'], lat, lon)
+        ids.append(feature['id'])
+        lats.append(lat)
+        lons.append(lon)
+    return index, np.array(ids, dtype=object), np.array(lats), np.array(lons)
+
+def query_points(count, seed=7):
+    rng = random.Random(seed)
+    return [(rng.uniform(24, 27), rng.uniform(80, 84)) for _ in range(count)]
+
+def timed(fn):
+    started = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - started) * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,20000,100000')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--radius', type=float, default=300.0)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--cell', type=float, default=1.0)
+    parser.add_argument('--narrow', type=float, default=0.2)
+    args = parser.parse_args()
+
+    points = query_points(args.queries)
+    print(f"{args.queries} queries per row, radius {args.radius:.0f} km, k={args.k}, {args.cell} degree cells")
+    print(f"{'events':>8} {'query':>7} {'brute ms':>9} {'index ms':>9} {'speedup':>8}")
+    for size in (int(value) for value in args.sizes.split(',')):
+        features = synthetic_feed(size)['features']
+        index, ids, lats, lons = load(features, args.cell)
+
+        def brute_radius():
+            found = []
+            for lat, lon in points:
+                distances = haversine_km(lat, lon, lats, lons)
+                found.append(set(ids[distances <= args.radius]))
+            return found
+
+        def index_radius():
+            return [set(index.radius(lat, lon, args.radius)[0]) for lat, lon in points]
+
+        def brute_nearest():
+            found = []
+            for lat, lon in points:
+                distances = haversine_km(lat, lon, lats, lons)
+                found.append(np.sort(np.partition(distances, args.k - 1)[:args.k]))
+            return found
+
+        def index_nearest():
+            return [index.nearest(lat, lon, args.k)[1] for lat, lon in points]
+
+        def brute_bbox():
+            found = []
+            for lat, lon in points:
+                inside = (lats >= lat - 1) & (lats <= lat + 1) & (lons >= lon - 1) & (lons <= lon + 1)
+                found.append(set(ids[inside]))
+            return found
+
+        def index_bbox():
+            return [set(index.bbox(lon - 1, lat - 1, lon + 1, lat + 1)) for lat, lon in points]
+
+        half = args.narrow / 2
+
+        def brute_narrow():
+            found = []
+            for lat, lon in points:
+                inside = (lats >= lat - half) & (lats <= lat + half) & (lons >= lon - half) & (lons <= lon + half)
+                found.append(set(ids[inside]))
+            return found
+
+        def index_narrow():
+            return [set(index.bbox(lon - half, lat - half, lon + half, lat + half)) for lat, lon in points]
+
+        columns_ms, _ = timed(index._columns)
+        for name, brute, indexed in (('radius', brute_radius, index_radius),
+                                     ('nearest', brute_nearest, index_nearest),
+                                     ('bbox', brute_bbox, index_bbox),
+                                     ('narrow', brute_narrow, index_narrow)):
+            brute_ms, expected = timed(brute)
+            index_ms, actual = timed(indexed)
+            if name == 'nearest':
+                assert all(np.allclose(a, b) for a, b in zip(expected, actual)), name
+            else:
+                assert expected == actual, name
+            print(f"{size:>8} {name:>7} {brute_ms:>9.1f} {index_ms:>9.1f} {brute_ms / index_ms:>7.1f}x")
+        print(f"{size:>8} {'columns':>7} {'':>9} {columns_ms:>9.1f}   (built once per change)")
+
+        # Incremental maintenance: move 1% of the events as if USGS revised their locations
+        moved = features[::100]
+        update_ms, _ = timed(lambda: [index.insert(feature['id'], feature['geometry']['coordinates'][1] + 0.5,
+                                                   feature['geometry']['coordinates'][0]) for feature in moved])
+        print(f"{size:>8} {'update':>7} {'':>9} {update_ms:>9.1f}   ({len(moved)} moved)")
+
+if __name__ == '__main__':
+    main()
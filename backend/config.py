@@ -40,8 +40,123 @@ class Config:
     # OpenWeatherMap API endpoints
     OPENWEATHER_BASE_URL = "https://api.openweathermap.org/data/2.5"
     
+    # Crowd Zones
+    CROWD_ZONES_FILE = os.getenv('CROWD_ZONES_FILE', '')  # JSON list of {id, name, coordinates, capacity, flow_direction}
+    CROWD_SENSOR_BUFFER_SIZE = int(os.getenv('CROWD_SENSOR_BUFFER_SIZE', '256'))  # Readings kept per zone
+    CROWD_SENSOR_MAX_AGE = float(os.getenv('CROWD_SENSOR_MAX_AGE', '300'))  # Seconds a zone's last reading stays authoritative
+    CROWD_ANOMALY_WINDOW = float(os.getenv('CROWD_ANOMALY_WINDOW', '300'))  # Seconds; time constant of the baseline density EWMA
+    CROWD_ANOMALY_TREND_WINDOW = float(os.getenv('CROWD_ANOMALY_TREND_WINDOW', '60'))  # Seconds; fast EWMA for rate of change
+    CROWD_ANOMALY_WARMUP = int(os.getenv('CROWD_ANOMALY_WARMUP', '10'))  # Readings before a zone can raise anomalies
+    CROWD_SPIKE_SIGMA = float(os.getenv('CROWD_SPIKE_SIGMA', '3'))  # Standard deviations above the baseline for a spike
+    CROWD_BUILDUP_RATE = float(os.getenv('CROWD_BUILDUP_RATE', '0.02'))  # Density rise per minute for a build-up
+    CROWD_DISPERSAL_RATE = float(os.getenv('CROWD_DISPERSAL_RATE', '0.05'))  # Density fall per minute for a rapid dispersal
+    CROWD_HEATMAP_LEVELS = [int(cell) for cell in os.getenv('CROWD_HEATMAP_LEVELS', '50,200,1000').split(',')]  # Cell sizes (m)
+    CROWD_HEATMAP_MAX_CELLS = int(os.getenv('CROWD_HEATMAP_MAX_CELLS', '256'))  # Per side; bigger viewports get a coarser level
+    CROWD_HEATMAP_DESIGN_DENSITY = float(os.getenv('CROWD_HEATMAP_DESIGN_DENSITY', '2'))  # People/m2 of a zone at capacity
+    CROWD_HEATMAP_FULL_SCALE = float(os.getenv('CROWD_HEATMAP_FULL_SCALE', '4'))  # People/m2 at the top of the raster scale
+    CROWD_FORECAST_MODEL = os.getenv('CROWD_FORECAST_MODEL', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'crowd_forecast.joblib'))  # Written by python -m services.crowd_forecast
+    CROWD_FORECAST_HORIZON_H = int(os.getenv('CROWD_FORECAST_HORIZON_H', '48'))  # Hours ahead forecast at every tick
+    CROWD_EVENT_START = os.getenv('CROWD_EVENT_START', '2025-01-13')
+    CROWD_BATHING_DAYS = os.getenv('CROWD_BATHING_DAYS', '2025-01-13,2025-01-14,2025-01-29,2025-02-03,2025-02-12,2025-02-26').split(',')
+    CROWD_EVENT_UTC_OFFSET_H = float(os.getenv('CROWD_EVENT_UTC_OFFSET_H', '5.5'))  # Local time for hour of day and calendar days
+    
     # Alert Thresholds
     CROWD_DENSITY_THRESHOLD = float(os.getenv('CROWD_DENSITY_THRESHOLD', '0.8'))
     WEATHER_ALERT_THRESHOLD = float(os.getenv('WEATHER_ALERT_THRESHOLD', '50'))
     EARTHQUAKE_MAGNITUDE_THRESHOLD = float(os.getenv('EARTHQUAKE_MAGNITUDE_THRESHOLD', '4.0'))
     FLOOD_ALERT_THRESHOLD = float(os.getenv('FLOOD_ALERT_THRESHOLD', '100'))
+    
+    # Background Refresh
+    REFRESH_INTERVAL = float(os.getenv('REFRESH_INTERVAL', '30'))
+    REFRESH_MAX_WORKERS = int(os.getenv('REFRESH_MAX_WORKERS', '6'))
+    REFRESH_DEFAULT_DEADLINE = float(os.getenv('REFRESH_DEFAULT_DEADLINE', '15'))
+    REFRESH_DEADLINES = {
+        'weather': float(os.getenv('WEATHER_REFRESH_DEADLINE', '12')),
+        'earthquakes': float(os.getenv('EARTHQUAKE_REFRESH_DEADLINE', '12')),
+        'crowd': float(os.getenv('CROWD_REFRESH_DEADLINE', '5')),
+        'traffic': float(os.getenv('TRAFFIC_REFRESH_DEADLINE', '5')),
+        'satellite': float(os.getenv('SATELLITE_REFRESH_DEADLINE', '65')),
+        'alerts': float(os.getenv('ALERTS_REFRESH_DEADLINE', '5'))
+    }
+    REFRESH_JITTER = float(os.getenv('REFRESH_JITTER', '0.1'))  # Fraction of each interval
+    SCHEDULER_TICK = float(os.getenv('SCHEDULER_TICK', '1'))
+    REFRESH_INTERVALS = {
+        'weather': float(os.getenv('WEATHER_REFRESH_INTERVAL', '600')),
+        'forecast': float(os.getenv('FORECAST_REFRESH_INTERVAL', '1800')),
+        'earthquakes': float(os.getenv('EARTHQUAKE_REFRESH_INTERVAL', '60')),
+        'crowd': float(os.getenv('CROWD_REFRESH_INTERVAL', '5')),
+        'traffic': float(os.getenv('TRAFFIC_REFRESH_INTERVAL', '30')),
+        'satellite': float(os.getenv('SATELLITE_REFRESH_INTERVAL', '21600')),
+        'alerts': float(os.getenv('ALERTS_REFRESH_INTERVAL', '30'))
+    }
+    
+    # Shared HTTP Transport
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))  # Hosts kept pooled
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '10'))  # Connections kept per host
+    
+    # Upstream Response Cache
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '64'))
+    CACHE_DEFAULT_TTL = float(os.getenv('CACHE_DEFAULT_TTL', '60'))
+    CACHE_MAX_STALE_FACTOR = float(os.getenv('CACHE_MAX_STALE_FACTOR', '10'))  # Stale data served up to TTL x factor
+    CACHE_FALLBACK_TTL = float(os.getenv('CACHE_FALLBACK_TTL', '15'))  # TTL of last-good or mock payloads served while a provider fails
+    CACHE_TTLS = {
+        'weather': float(os.getenv('WEATHER_CACHE_TTL', '600')),
+        'forecast': float(os.getenv('FORECAST_CACHE_TTL', '1800')),
+        'earthquakes': float(os.getenv('EARTHQUAKE_CACHE_TTL', '60')),
+        'satellite': float(os.getenv('SATELLITE_CACHE_TTL', '21600'))
+    }
+    
+    # Upstream Ingestion ('threads' uses the refresh scheduler, 'aiohttp' a dedicated event loop)
+    INGEST_BACKEND = os.getenv('INGEST_BACKEND', 'threads').lower()
+    
+    # Upstream Circuit Breakers
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '3'))
+    CIRCUIT_BASE_BACKOFF = float(os.getenv('CIRCUIT_BASE_BACKOFF', '30'))  # Seconds before the first probe
+    CIRCUIT_MAX_BACKOFF = float(os.getenv('CIRCUIT_MAX_BACKOFF', '900'))
+    
+    # Satellite Imagery
+    SATELLITE_IMAGE_STORE_SIZE = int(os.getenv('SATELLITE_IMAGE_STORE_SIZE', '16'))  # Rendered images kept for /api/satellite/image
+    SATELLITE_IMAGE_MAX_AGE = int(os.getenv('SATELLITE_IMAGE_MAX_AGE', '31536000'))
+    SATELLITE_CACHE_DIR = os.getenv('SATELLITE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'imagery'))
+    SATELLITE_CACHE_MAX_MB = float(os.getenv('SATELLITE_CACHE_MAX_MB', '256'))
+    SATELLITE_CACHE_TIME_QUANTUM_HOURS = float(os.getenv('SATELLITE_CACHE_TIME_QUANTUM_HOURS', '24'))  # Renders within one quantum share a key
+    SATELLITE_TILE_DIR = os.getenv('SATELLITE_TILE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'tiles'))
+    SATELLITE_TILE_CACHE_MAX_MB = float(os.getenv('SATELLITE_TILE_CACHE_MAX_MB', '128'))
+    SATELLITE_TILE_MIN_ZOOM = int(os.getenv('SATELLITE_TILE_MIN_ZOOM', '10'))
+    SATELLITE_TILE_MAX_ZOOM = int(os.getenv('SATELLITE_TILE_MAX_ZOOM', '15'))  # Sentinel-2 is 10 m; z15 is ~4 m per pixel here
+    SATELLITE_TILE_MAX_AGE = int(os.getenv('SATELLITE_TILE_MAX_AGE', '3600'))
+    SATELLITE_TILE_FALLBACK_MAX_AGE = int(os.getenv('SATELLITE_TILE_FALLBACK_MAX_AGE', '60'))  # Static crops served in place of a failed render
+    SATELLITE_TILE_RETRY_AFTER = float(os.getenv('SATELLITE_TILE_RETRY_AFTER', '60'))  # Seconds before a failed tile render is tried again
+    SATELLITE_STATIC_IMAGE = os.getenv('SATELLITE_STATIC_IMAGE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'satellite-imagery.png'))
+    SATELLITE_MOCK_SEED = int(os.getenv('SATELLITE_MOCK_SEED', '0'))  # Same seed, same mock image
+    SATELLITE_CHANGE_THRESHOLD = float(os.getenv('SATELLITE_CHANGE_THRESHOLD', '0.02'))  # Mean abs greyscale difference that counts as a new scene
+    SATELLITE_CHANGE_SIZE = int(os.getenv('SATELLITE_CHANGE_SIZE', '64'))  # Thumbnail side scenes are compared at
+    SATELLITE_BAND_DIR = os.getenv('SATELLITE_BAND_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'bands'))
+    SATELLITE_BAND_CACHE_MAX_MB = float(os.getenv('SATELLITE_BAND_CACHE_MAX_MB', '256'))
+    
+    # Terrain
+    DEM_PATH = os.getenv('DEM_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'dem.npy'))  # .npy/raw + .json sidecar, or GeoTIFF
+    DEM_TILE_SIZE = int(os.getenv('DEM_TILE_SIZE', '256'))
+    DEM_TILE_CACHE_SIZE = int(os.getenv('DEM_TILE_CACHE_SIZE', '64'))
+    DEM_FLOOD_HEIGHT_M = float(os.getenv('DEM_FLOOD_HEIGHT_M', '3'))  # Height above the river still counted as flood-prone
+    DEM_FLOOD_REFERENCE_M = float(os.getenv('DEM_FLOOD_REFERENCE_M')) if os.getenv('DEM_FLOOD_REFERENCE_M') else None  # River level; estimated from the DEM if unset
+    DEM_FLOOD_MAX_SLOPE_DEG = float(os.getenv('DEM_FLOOD_MAX_SLOPE_DEG', '2'))
+    DEM_STEEP_SLOPE_DEG = float(os.getenv('DEM_STEEP_SLOPE_DEG', '5'))
+    
+    # Flood Detection
+    FLOOD_WATER_INDEX = os.getenv('FLOOD_WATER_INDEX', 'mndwi')  # ndwi (green/NIR) or mndwi (green/SWIR)
+    FLOOD_WATER_THRESHOLD = float(os.getenv('FLOOD_WATER_THRESHOLD', '0.0'))  # Pixels above this index are water
+    FLOOD_ZONE_RADIUS_M = float(os.getenv('FLOOD_ZONE_RADIUS_M', '500'))
+    FLOOD_RESOLUTION_M = float(os.getenv('FLOOD_RESOLUTION_M', '10'))
+    FLOOD_TILE_PX = int(os.getenv('FLOOD_TILE_PX', '512'))  # Largest tile side fetched and processed at once
+    FLOOD_CRITICAL_EXCESS_FRACTION = float(os.getenv('FLOOD_CRITICAL_EXCESS_FRACTION', '0.25'))  # Zone water above its driest extent that means flood risk 1.0
+    
+    # Earthquake Feed
+    USGS_FEED = os.getenv('USGS_FEED', 'all_day')  # all_hour, all_day, all_week or all_month
+    EARTHQUAKE_RADIUS_KM = float(os.getenv('EARTHQUAKE_RADIUS_KM', '1000'))
+    EARTHQUAKE_CATALOG_WINDOW_HOURS = float(os.getenv('EARTHQUAKE_CATALOG_WINDOW_HOURS', '168'))
+    EARTHQUAKE_INDEX_CELL_DEGREES = float(os.getenv('EARTHQUAKE_INDEX_CELL_DEGREES', '1.0'))
+    EARTHQUAKE_INGEST_RADIUS_KM = float(os.getenv('EARTHQUAKE_INGEST_RADIUS_KM', '0'))  # 0 keeps events from anywhere
+    EARTHQUAKE_INGEST_MIN_MAGNITUDE = float(os.getenv('EARTHQUAKE_INGEST_MIN_MAGNITUDE', '0'))
+    FEED_CHUNK_SIZE = int(os.getenv('FEED_CHUNK_SIZE', '65536'))
+    EARTHQUAKE_RISK_WINDOW_HOURS = float(os.getenv('EARTHQUAKE_RISK_WINDOW_HOURS', '24'))  # Events that count towards risk
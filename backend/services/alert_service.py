@@ -348,33 +348,12 @@ class AlertService:
         return min(1.0, risk_score)
     
     def _calculate_earthquake_risk(self, earthquakes):
-        """Calculate earthquake risk score"""
-        if not earthquakes:
+        """Calculate earthquake risk score from the predicted shaking at crowd zones and assembly points"""
+        if not isinstance(earthquakes, dict) or not earthquakes.get('intensity'):
             return 0.1
         
-        risk_score = 0.0
-        
-        # Handle both list and dict formats
-        if isinstance(earthquakes, dict):
-            # If it's a dict with 'earthquakes' key (from USGS API)
-            earthquake_list = earthquakes.get('earthquakes', [])
-        elif isinstance(earthquakes, list):
-            # If it's directly a list
-            earthquake_list = earthquakes
-        else:
-            return 0.1
-        
-        # Consider last 5 earthquakes
-        for earthquake in earthquake_list[:5]:
-            magnitude = earthquake.get('magnitude', 0)
-            if magnitude >= 5.0:
-                risk_score += 0.4
-            elif magnitude >= 4.0:
-                risk_score += 0.2
-            elif magnitude >= 3.0:
-                risk_score += 0.1
-        
-        return min(1.0, risk_score)
+        # Strongest predicted MMI across all sites, scaled by the ground motion estimator
+        return max(0.1, earthquakes['intensity']['risk_score'])
     
     def _calculate_crowd_risk(self, crowd_data):
         """Calculate crowd risk score"""
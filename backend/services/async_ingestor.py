@@ -0,0 +1,258 @@
+import asyncio
+import itertools
+import random
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+from config import Config
+from services.circuit_breaker import get_breaker, is_failure_status
+
+try:
+    # Under eventlet the loop needs a real OS thread and an unpatched selector
+    from eventlet import patcher
+    _threading = patcher.original('threading')
+    _queue = patcher.original('queue')
+    _selectors = patcher.original('selectors')
+except ImportError:
+    import threading as _threading
+    import queue as _queue
+    import selectors as _selectors
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+POLL_INTERVAL = 0.05  # Seconds the loop thread sleeps when no request is waiting
+NO_RESPONSE = (None, {}, b'')
+
+class AsyncIngestor:
+    """Fetch upstream sources with aiohttp on a dedicated event loop thread
+
+    The loop thread only moves bytes: it takes request specs from one queue
+    and puts raw (status, headers, body) results on another. Scheduling,
+    circuit breakers, parsing and catalog updates all run in drain() on the
+    caller's side, so no OS thread ever touches the services' green locks.
+    Each source is a generator that yields request specs, receives the
+    (status, headers, body) of each, and returns the section data.
+    """
+
+    def __init__(self, weather_service, earthquake_service, satellite_service):
+        self.config = Config()
+        self.weather_service = weather_service
+        self.earthquake_service = earthquake_service
+        self.satellite_service = satellite_service
+        self.sources = {
+            'weather': self._fetch_weather,
+            'forecast': self._fetch_forecast,
+            'earthquakes': self._fetch_earthquakes,
+            'satellite': self._fetch_satellite
+        }
+        self.requests = _queue.SimpleQueue()  # (job id, spec) for the loop thread
+        self.responses = _queue.SimpleQueue()  # (job id, status, headers, body, error) back from it
+        self.job_ids = itertools.count()
+        self.jobs = {}  # Source name -> the refresh in progress
+        self.next_run = {name: 0.0 for name in self.sources}
+        self.stats = {name: {'runs': 0, 'failures': 0, 'last_run': None, 'last_duration_ms': None, 'last_error': None}
+                      for name in self.sources}
+        self.session = None
+        self.thread = None
+
+    def start(self):
+        """Start the ingestion loop on its own OS thread"""
+        if aiohttp is None:
+            raise RuntimeError("aiohttp is required for INGEST_BACKEND=aiohttp")
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = _threading.Thread(target=self._run, name='async-ingest', daemon=True)
+        self.thread.start()
+
+    def drain(self):
+        """Advance source refreshes without blocking; return (section, data) pairs finished since the last call
+
+        Call it regularly (every scheduler tick) from the app side.
+        """
+        finished = []
+        while True:
+            try:
+                job_id, status, headers, body, error = self.responses.get_nowait()
+            except _queue.Empty:
+                break
+            job = next((job for job in self.jobs.values() if job['id'] == job_id), None)
+            if job is None:
+                continue  # Abandoned at its deadline; the breaker was settled then
+            breaker, job['breaker'] = job['breaker'], None
+            if error is not None:
+                print(f"Error ingesting {job['name']}: {error}")
+            outcome = (breaker, error is None and not is_failure_status(status))
+            self._advance(job, (status, headers, body), finished, outcome)
+
+        now = time.monotonic()
+        for job in list(self.jobs.values()):
+            if now - job['started'] > job['deadline']:
+                if job['breaker'] is not None:
+                    # Count the abandoned request so a half-open probe is not left dangling
+                    job['breaker'].record_failure()
+                    job['breaker'] = None
+                job['generator'].close()
+                self._finish(job, finished, error=f"no result within {job['deadline']}s")
+
+        for name, fetch in self.sources.items():
+            if name not in self.jobs and now >= self.next_run[name]:
+                self.jobs[name] = job = {
+                    'id': None, 'name': name, 'generator': fetch(), 'breaker': None, 'started': now,
+                    'deadline': self.config.REFRESH_DEADLINES.get(name, self.config.REFRESH_DEFAULT_DEADLINE)
+                }
+                self._advance(job, None, finished)
+        return finished
+
+    def get_status(self):
+        """Get per-source ingestion counters"""
+        return {
+            'backend': 'aiohttp',
+            'running': bool(self.thread and self.thread.is_alive()),
+            'in_flight': sorted(self.jobs),
+            'sources': {name: dict(stats) for name, stats in self.stats.items()}
+        }
+
+    def _advance(self, job, response, finished, outcome=None):
+        """Hand a response to the source and submit its next request, or finish it
+
+        outcome is (breaker, ok) for the request that produced the response. It
+        is settled only once the source has consumed the response, so a body
+        the source fails on counts against the host too and a half-open probe
+        is always settled one way or the other.
+        """
+        while True:
+            try:
+                spec = job['generator'].send(response)
+            except StopIteration as stop:
+                self._settle(outcome, True)
+                self._finish(job, finished, data=stop.value)
+                return
+            except Exception as e:
+                self._settle(outcome, False)
+                self._finish(job, finished, error=str(e) or type(e).__name__)
+                return
+            self._settle(outcome, True)
+            outcome = None
+            breaker = get_breaker(urlsplit(spec['url']).hostname)
+            if breaker.allow():
+                break
+            response = NO_RESPONSE
+        job['id'] = next(self.job_ids)
+        job['breaker'] = breaker
+        self.requests.put((job['id'], spec))
+
+    def _settle(self, outcome, consumed):
+        """Record a request's (breaker, ok) outcome, as a failure if the source could not use the response"""
+        if outcome is None:
+            return
+        breaker, ok = outcome
+        if ok and consumed:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+
+    def _finish(self, job, finished, data=None, error=None):
+        name = job['name']
+        del self.jobs[name]
+        elapsed = time.monotonic() - job['started']
+        interval = self.config.REFRESH_INTERVALS.get(name, self.config.REFRESH_INTERVAL)
+        jitter = interval * self.config.REFRESH_JITTER
+        self.next_run[name] = job['started'] + interval + random.uniform(-jitter, jitter)
+
+        stats = self.stats[name]
+        stats['runs'] += 1
+        stats['last_run'] = datetime.now().isoformat()
+        stats['last_duration_ms'] = round(elapsed * 1000, 1)
+        stats['last_error'] = error
+        if error is not None:
+            print(f"Error ingesting {name}: {error}")
+            stats['failures'] += 1
+        else:
+            finished.append((name, data))
+
+    def _run(self):
+        loop = asyncio.SelectorEventLoop(_selectors.DefaultSelector())
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self._main())
+        except Exception as e:
+            print(f"Async ingestion loop stopped: {e}")
+        finally:
+            loop.close()
+
+    async def _main(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.config.HTTP_POOL_CONNECTIONS * self.config.HTTP_POOL_MAXSIZE,
+            limit_per_host=self.config.HTTP_POOL_MAXSIZE
+        )
+        headers = {'Accept-Encoding': 'gzip, deflate', 'User-Agent': 'mahakumbh-disaster-prediction/1.0'}
+        in_flight = set()
+        async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+            self.session = session
+            while True:
+                try:
+                    job_id, spec = self.requests.get_nowait()
+                except _queue.Empty:
+                    await asyncio.sleep(POLL_INTERVAL)
+                    continue
+                task = asyncio.ensure_future(self._request(job_id, spec))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+
+    async def _request(self, job_id, spec):
+        """Send a request described by a service and queue its raw (status, headers, body) or error"""
+        spec = dict(spec)
+        method = spec.pop('method')
+        url = spec.pop('url')
+        timeout = aiohttp.ClientTimeout(total=spec.pop('timeout', 10))
+        if 'params' in spec:
+            spec['params'] = {key: str(value) for key, value in spec['params'].items()}
+        try:
+            async with self.session.request(method, url, timeout=timeout, **spec) as response:
+                body = await response.read()
+        except Exception as e:
+            self.responses.put((job_id, None, {}, b'', f"{url}: {e!r}"))
+            return
+        self.responses.put((job_id, response.status, response.headers, body, None))
+
+    def _fetch_weather(self):
+        status, _, body = yield self.weather_service.current_weather_request()
+        return self.weather_service.parse_current_weather(status, body)
+
+    def _fetch_forecast(self):
+        status, _, body = yield self.weather_service.forecast_request()
+        return self.weather_service.parse_forecast(status, body)
+
+    def _fetch_earthquakes(self):
+        service = self.earthquake_service
+        stream = service.feed_stream()
+        status, headers, body = yield service.recent_earthquakes_request()
+        if status == 200:
+            # Chunked as on the requests path so the parser only buffers one chunk of unparsed text
+            size = self.config.FEED_CHUNK_SIZE
+            for start in range(0, len(body), size):
+                stream.feed(body[start:start + size])
+        return service.parse_recent_earthquakes(status, stream, headers)
+
+    def _fetch_satellite(self):
+        service = self.satellite_service
+        bbox = service.default_bbox()
+        time_range = service.quantize_time_range(service.default_time_range())
+        cached = service.cached_imagery(bbox, time_range)
+        if cached:
+            return cached
+        if not service.has_credentials():
+            return service.parse_imagery(None, b'', bbox, time_range)
+
+        access_token = service.cached_access_token()
+        if not access_token:
+            status, _, body = yield service.token_request()
+            access_token = service.parse_token(status, body)
+        if not access_token:
+            return service.parse_imagery(None, b'', bbox, time_range)
+
+        status, _, body = yield service.imagery_request(access_token, bbox, time_range)
+        return service.parse_imagery(status, body, bbox, time_range)
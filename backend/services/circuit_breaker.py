@@ -0,0 +1,101 @@
+import threading
+import time
+from datetime import datetime
+from config import Config
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider whose circuit is open"""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"circuit open for {name}, next probe in {retry_in:.0f}s")
+        self.name = name
+        self.retry_in = retry_in
+
+class CircuitBreaker:
+    """Stop calling a failing provider and probe it again with exponential backoff"""
+
+    def __init__(self, name, failure_threshold=None, base_backoff=None, max_backoff=None):
+        self.config = Config()
+        self.name = name
+        self.failure_threshold = failure_threshold or self.config.CIRCUIT_FAILURE_THRESHOLD
+        self.base_backoff = base_backoff or self.config.CIRCUIT_BASE_BACKOFF
+        self.max_backoff = max_backoff or self.config.CIRCUIT_MAX_BACKOFF
+        self.lock = threading.Lock()
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.backoff = self.base_backoff
+        self.retry_at = 0.0
+        self.opened_at = None
+        self.trip_count = 0
+        self.rejected_calls = 0
+
+    def allow(self):
+        """Return True if a call may go out now (at most one probe while half open)"""
+        with self.lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.time() >= self.retry_at:
+                self.state = 'half_open'
+                return True
+            self.rejected_calls += 1
+            return False
+
+    def check(self):
+        """Raise CircuitOpenError unless a call may go out now"""
+        if not self.allow():
+            raise CircuitOpenError(self.name, max(0.0, self.retry_at - time.time()))
+
+    def record_success(self):
+        with self.lock:
+            self.state = 'closed'
+            self.consecutive_failures = 0
+            self.backoff = self.base_backoff
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.consecutive_failures += 1
+            if self.state == 'half_open':
+                # Probe failed: stay open and wait twice as long before the next one
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+                self._open()
+            elif self.state == 'closed' and self.consecutive_failures >= self.failure_threshold:
+                self.trip_count += 1
+                self._open()
+
+    def get_status(self):
+        with self.lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'trip_count': self.trip_count,
+                'rejected_calls': self.rejected_calls,
+                'backoff_seconds': self.backoff,
+                'opened_at': datetime.fromtimestamp(self.opened_at).isoformat() if self.opened_at else None,
+                'next_probe_in': round(max(0.0, self.retry_at - time.time()), 1) if self.state == 'open' else None
+            }
+
+    def _open(self):
+        self.state = 'open'
+        self.opened_at = self.opened_at or time.time()
+        self.retry_at = time.time() + self.backoff
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name):
+    """Get the process-wide breaker for a provider"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+def get_breaker_statuses():
+    """Get the state of every provider breaker"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.get_status() for name, breaker in breakers.items()}
+
+def is_failure_status(status_code):
+    """Responses that count against a provider (no response, server errors, throttling)"""
+    return status_code is None or status_code >= 500 or status_code == 429
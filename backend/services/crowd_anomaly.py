@@ -0,0 +1,157 @@
+import threading
+import numpy as np
+
+ANOMALY_TYPES = [
+    'sudden_density_spike',
+    'flow_direction_change',
+    'unusual_movement_pattern',
+    'crowd_buildup',
+    'rapid_dispersal'
+]
+ANOMALY_SEVERITIES = ['low', 'moderate', 'high']
+SPIKE, BUILDUP, DISPERSAL = (ANOMALY_TYPES.index(kind) for kind in ('sudden_density_spike', 'crowd_buildup', 'rapid_dispersal'))
+SEVERITY_RATIOS = np.array([1.5, 2.5])  # Multiple of the trigger threshold at which 'moderate' and 'high' start
+TURBULENT = 0.2  # Share of recent readings that reversed the flow at which severity goes up a level
+MIN_STD = 0.02  # Density standard deviation floor, so a zone that has been flat does not alarm on noise
+
+class AnomalyDetector:
+    """Running per-zone density statistics that flag spikes, build-ups and dispersals
+
+    Every zone keeps a slow EWMA mean and variance of its density (the
+    baseline), a fast EWMA whose lead over the slow one gives the rate of
+    change, and how often its flow has reversed. Weights decay with the time
+    between readings, so irregular sensors and the regular refresh tick are
+    treated alike. Each reading is O(1) and a batch is applied as array
+    operations across zones.
+    """
+
+    def __init__(self, zones, window=300.0, trend_window=60.0, warmup=10, spike_sigma=3.0,
+                 buildup_rate=0.02, dispersal_rate=0.05):
+        self.window = window
+        self.trend_window = trend_window
+        self.warmup = warmup
+        self.spike_sigma = spike_sigma
+        self.buildup_rate = buildup_rate
+        self.dispersal_rate = dispersal_rate
+        self.lock = threading.Lock()
+        self.observations = np.zeros(zones, dtype=np.int64)
+        self.last_time = np.full(zones, -np.inf)
+        self.density = np.zeros(zones)
+        self.mean = np.zeros(zones)
+        self.var = np.zeros(zones)
+        self.fast = np.zeros(zones)
+        self.spike_z = np.zeros(zones)
+        self.flow_sign = np.zeros(zones, dtype=np.int8)
+        self.reversal_rate = np.zeros(zones)
+        self.reversals = np.zeros(zones, dtype=np.int64)
+        self.stats = {'readings': 0, 'skipped': 0, 'resets': 0}
+
+    def observe(self, rows, timestamps, density, flows):
+        """Fold a batch of readings (parallel arrays, any order) into the zone statistics
+
+        Readings no newer than a zone's last one are ignored. A zone with
+        several readings in the batch takes them in timestamp order, one
+        vectorized step per reading depth.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        density = np.asarray(density, dtype=np.float64)
+        flows = np.asarray(flows, dtype=np.float64)
+        with self.lock:
+            valid = ((rows >= 0) & (rows < len(self.mean)) & np.isfinite(timestamps)
+                     & np.isfinite(density) & np.isfinite(flows))
+            valid[valid] = timestamps[valid] > self.last_time[rows[valid]]
+            self.stats['skipped'] += int(valid.size - np.count_nonzero(valid))
+            rows, timestamps, density, flows = rows[valid], timestamps[valid], density[valid], flows[valid]
+
+            order = np.lexsort((timestamps, rows))
+            rows, timestamps, density, flows = rows[order], timestamps[order], density[order], flows[order]
+            starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]]) if rows.size else np.empty(0, dtype=np.int64)
+            rank = np.arange(rows.size) - np.repeat(starts, np.diff(np.r_[starts, rows.size]))
+            # One step per reading depth: a zone's first readings, then its second, ...
+            by_depth = np.argsort(rank, kind='stable')
+            for step in np.split(by_depth, np.cumsum(np.bincount(rank))[:-1]) if rows.size else ():
+                self._step(rows[step], timestamps[step], density[step], flows[step])
+            self.stats['readings'] += int(rows.size)
+        return int(rows.size)
+
+    def reset(self, rows):
+        """Forget the history of the given zones, e.g. when their data source changes"""
+        with self.lock:
+            self.observations[rows] = 0
+            self.last_time[rows] = -np.inf
+            self.spike_z[rows] = 0.0
+            self.flow_sign[rows] = 0
+            self.reversal_rate[rows] = 0.0
+            self.reversals[rows] = 0
+            self.stats['resets'] += int(np.size(rows))
+
+    def rate(self):
+        """Estimated density change per minute of every zone
+
+        A linear trend leaves an EWMA behind by its time constant, so the fast
+        average leads the slow one by rate x (window - trend_window).
+        """
+        return (self.fast - self.mean) / (self.window - self.trend_window) * 60
+
+    def events(self):
+        """Current anomalies: (rows, type codes, severity codes, timestamps, scores), sorted by row
+
+        A spike is judged on a zone's latest reading; build-up and dispersal
+        on its trend. Scores are the spike's z-score and the trend's density
+        change per minute. Zones report nothing for their first warmup
+        readings.
+        """
+        with self.lock:
+            warm = self.observations > self.warmup
+            rate = self.rate()
+            triggers = [
+                (SPIKE, warm & (self.spike_z >= self.spike_sigma), self.spike_z, self.spike_sigma),
+                (BUILDUP, warm & (rate >= self.buildup_rate), rate, self.buildup_rate),
+                (DISPERSAL, warm & (rate <= -self.dispersal_rate), rate, -self.dispersal_rate)
+            ]
+            rows = np.concatenate([np.flatnonzero(hit) for _, hit, _, _ in triggers])
+            types = np.concatenate([np.full(np.count_nonzero(hit), kind, dtype=np.int8) for kind, hit, _, _ in triggers])
+            scores = np.concatenate([score[hit] for _, hit, score, _ in triggers])
+            ratios = np.concatenate([score[hit] / bound for _, hit, score, bound in triggers])
+            severities = (np.searchsorted(SEVERITY_RATIOS, ratios, side='right')
+                          + (self.reversal_rate[rows] >= TURBULENT)).clip(max=len(ANOMALY_SEVERITIES) - 1)
+            order = np.argsort(rows, kind='stable')
+            return rows[order], types[order], severities[order].astype(np.int8), self.last_time[rows][order], scores[order]
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, zones=len(self.mean),
+                        warm_zones=int(np.count_nonzero(self.observations > self.warmup)),
+                        turbulent_zones=int(np.count_nonzero(self.reversal_rate >= TURBULENT)),
+                        flow_reversals=int(self.reversals.sum()))
+
+    def _step(self, rows, timestamps, density, flows):
+        """Apply one reading to each of rows (no row twice)"""
+        # Time-decayed weights, but never below 1/n: until a window's worth of readings has
+        # arrived the averages are plain running means, not dominated by the first reading
+        dt = timestamps - self.last_time[rows]
+        running = 1.0 / (self.observations[rows] + 1)
+        alpha = np.maximum(-np.expm1(-dt / self.window), running)
+        beta = np.maximum(-np.expm1(-dt / self.trend_window), running)
+
+        # A spike is a jump from the short-term level, in units of the baseline's spread, so a
+        # steady ramp (a build-up) does not also read as one
+        mean, var = self.mean[rows], self.var[rows]
+        self.spike_z[rows] = (density - self.fast[rows]) / np.sqrt(np.maximum(var, MIN_STD ** 2))
+        diff = density - mean
+        increment = alpha * diff
+        self.mean[rows] = mean + increment
+        self.var[rows] = (1 - alpha) * (var + diff * increment)
+        self.fast[rows] += beta * (density - self.fast[rows])
+
+        # Flow sign is direction: negative readings move against the zone's flow_direction
+        sign, previous = np.sign(flows).astype(np.int8), self.flow_sign[rows]
+        reversed_flow = (sign != 0) & (previous != 0) & (sign != previous)
+        self.reversal_rate[rows] += beta * (reversed_flow - self.reversal_rate[rows])
+        self.reversals[rows] += reversed_flow
+        self.flow_sign[rows] = np.where(sign != 0, sign, previous)
+
+        self.last_time[rows] = timestamps
+        self.density[rows] = density
+        self.observations[rows] += 1
@@ -0,0 +1,236 @@
+import argparse
+import os
+import threading
+import time
+from datetime import date, datetime
+import numpy as np
+
+FEATURES = ['horizon_h', 'hour_sin', 'hour_cos', 'event_day', 'bathing_day', 'days_to_bathing',
+            'days_since_bathing', 'density', 'log_capacity', 'temperature', 'humidity']
+CALENDAR_HORIZON_DAYS = 30  # Distance reported for bathing days further off than this, or with none left
+# Fallback density by local hour of day when no model is available
+HOURLY_PROFILE = np.array([0.35] * 6 + [0.7] * 5 + [0.875] * 5 + [0.8] * 5 + [0.35] * 3)
+
+class EventCalendar:
+    """Local day numbers of the event: its first day and the bathing (snan) days"""
+
+    def __init__(self, event_start, bathing_days, utc_offset_h):
+        self.event_start = event_start
+        self.bathing_days = sorted(bathing_days)
+        self.utc_offset = utc_offset_h * 3600
+        self.start_day = _day_number(event_start)
+        self.bathing = np.array([_day_number(day) for day in self.bathing_days], dtype=np.int64)
+
+    def local_hours(self, timestamps):
+        """Local hour of day (fractional) of epoch timestamps"""
+        return (np.asarray(timestamps) + self.utc_offset) % 86400 / 3600
+
+    def features(self, timestamps):
+        """(event_day, bathing_day, days_to_bathing, days_since_bathing) of epoch timestamps"""
+        day = np.floor((np.asarray(timestamps) + self.utc_offset) / 86400).astype(np.int64)
+        if not self.bathing.size:
+            far = np.full(day.shape, CALENDAR_HORIZON_DAYS)
+            return day - self.start_day, np.zeros(day.shape), far, far
+        following = np.searchsorted(self.bathing, day, side='left')
+        preceding = np.searchsorted(self.bathing, day, side='right') - 1
+        to_next = np.where(following < self.bathing.size,
+                           self.bathing[np.minimum(following, self.bathing.size - 1)] - day, CALENDAR_HORIZON_DAYS)
+        since_last = np.where(preceding >= 0, day - self.bathing[np.maximum(preceding, 0)], CALENDAR_HORIZON_DAYS)
+        return (day - self.start_day, (to_next == 0).astype(np.float64),
+                np.minimum(to_next, CALENDAR_HORIZON_DAYS), np.minimum(since_last, CALENDAR_HORIZON_DAYS))
+
+    def to_dict(self):
+        return {'event_start': self.event_start, 'bathing_days': self.bathing_days,
+                'utc_offset_h': self.utc_offset / 3600}
+
+def feature_matrix(calendar, issued, horizons, density, capacity, temperature, humidity):
+    """Model inputs, one row per (zone state at issued, hours ahead) sample; all arguments are flat arrays
+
+    Unknown weather is NaN, which the model handles natively.
+    """
+    horizons = np.asarray(horizons, dtype=np.float64)
+    targets = np.asarray(issued, dtype=np.float64) + horizons * 3600
+    angle = calendar.local_hours(targets) * (2 * np.pi / 24)
+    event_day, bathing_day, days_to, days_since = calendar.features(targets)
+    columns = [horizons, np.sin(angle), np.cos(angle), event_day, bathing_day, days_to, days_since,
+               density, np.log1p(capacity), temperature, humidity]
+    return np.column_stack(np.broadcast_arrays(*columns)).astype(np.float32)
+
+def hourly_series(history):
+    """Zones x hours density matrix plus hourly mean temperature and humidity from a readings DataFrame
+
+    history needs zone_id, timestamp (epoch seconds or ISO 8601), capacity and
+    either density or count; temperature and humidity are optional.
+    Returns (zone ids, first hour epoch, density, capacity, temperature, humidity).
+    """
+    import pandas as pd
+
+    frame = history.copy()
+    if not pd.api.types.is_numeric_dtype(frame['timestamp']):
+        frame['timestamp'] = (pd.to_datetime(frame['timestamp'], utc=True) - pd.Timestamp(0, tz='UTC')) / pd.Timedelta(seconds=1)
+    if 'density' not in frame:
+        frame['density'] = frame['count'] / frame['capacity'].clip(lower=1)
+    for column in ('temperature', 'humidity'):
+        if column not in frame:
+            frame[column] = np.nan
+    frame['hour'] = (frame['timestamp'] // 3600).astype(np.int64)
+    hourly = frame.groupby(['zone_id', 'hour']).mean(numeric_only=True)
+    first_hour, last_hour = int(frame['hour'].min()), int(frame['hour'].max())
+    hours = np.arange(first_hour, last_hour + 1)
+
+    density = hourly['density'].unstack().reindex(columns=hours)
+    capacity = hourly['capacity'].groupby(level='zone_id').last().reindex(density.index)
+    weather = hourly[['temperature', 'humidity']].groupby(level='hour').mean().reindex(hours)
+    return (density.index.tolist(), first_hour * 3600, density.to_numpy(dtype=np.float64), capacity.to_numpy(),
+            weather['temperature'].to_numpy(), weather['humidity'].to_numpy())
+
+def training_samples(calendar, horizons, first_hour, density, capacity, temperature, humidity):
+    """(features, targets, issue times) for every hour and horizon with both ends observed"""
+    zones, hours = density.shape
+    features, targets, issued = [], [], []
+    for horizon in horizons:
+        if horizon >= hours:
+            continue
+        now, later = density[:, :hours - horizon], density[:, horizon:]
+        zone, hour = np.nonzero(np.isfinite(now) & np.isfinite(later))
+        times = first_hour + hour * 3600.0
+        features.append(feature_matrix(calendar, times, np.full(zone.size, horizon), now[zone, hour],
+                                       capacity[zone], temperature[hour], humidity[hour]))
+        targets.append(later[zone, hour])
+        issued.append(times)
+    if not features:
+        raise ValueError(f"History is shorter than the {min(horizons)} h horizon")
+    return np.concatenate(features), np.concatenate(targets), np.concatenate(issued)
+
+def train(history, calendar, horizons, max_samples=500000, holdout=0.2, seed=0):
+    """Fit a gradient-boosted forecaster on a readings DataFrame; returns the model bundle to save
+
+    The last holdout share of issue times is held out to measure the mean
+    absolute error per horizon, then the model is refit on everything.
+    """
+    from sklearn.ensemble import HistGradientBoostingRegressor
+
+    zone_ids, first_hour, density, capacity, temperature, humidity = hourly_series(history)
+    features, targets, issued = training_samples(calendar, horizons, first_hour, density, capacity,
+                                                 temperature, humidity)
+    if len(targets) > max_samples:
+        keep = np.random.default_rng(seed).choice(len(targets), max_samples, replace=False)
+        features, targets, issued = features[keep], targets[keep], issued[keep]
+
+    def fit(rows):
+        # Inference cost grows with the number of trees; 100 keep 1k zones x 48 horizons near 0.25 s on one core
+        model = HistGradientBoostingRegressor(max_iter=100, learning_rate=0.2, early_stopping=False, random_state=seed)
+        return model.fit(features[rows], targets[rows])
+
+    cutoff = np.quantile(issued, 1 - holdout)
+    held_out = issued > cutoff
+    errors = np.abs(fit(~held_out).predict(features[held_out]) - targets[held_out])
+    horizon_of = features[held_out, FEATURES.index('horizon_h')]
+    horizon_mae = [float(errors[horizon_of == horizon].mean()) if np.any(horizon_of == horizon) else None
+                   for horizon in horizons]
+    return {
+        'model': fit(np.ones(len(targets), dtype=bool)),
+        'features': FEATURES,
+        'horizons': list(horizons),
+        'calendar': calendar.to_dict(),
+        'horizon_mae': horizon_mae,
+        'mae': float(errors.mean()),
+        'samples': int(len(targets)),
+        'zones': len(zone_ids),
+        'trained_at': datetime.now().isoformat()
+    }
+
+class CrowdForecaster:
+    """A trained crowd density model, loaded from disk on first use and reloaded when the file changes
+
+    predict() runs every zone at every horizon through the model in one call.
+    Without a usable model file (or scikit-learn) it returns None and callers
+    fall back to the time-of-day profile.
+    """
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+        self.lock = threading.Lock()
+        self.bundle = None
+        self.calendar = None
+        self.loaded_mtime = None
+        self.stats = {'loads': 0, 'load_errors': 0, 'predictions': 0, 'last_predict_ms': None}
+
+    def load(self):
+        """The model bundle, (re)loading it if the file appeared or changed since the last look"""
+        try:
+            mtime = os.path.getmtime(self.model_path)
+        except OSError:
+            return None
+        with self.lock:
+            if mtime != self.loaded_mtime:
+                self.loaded_mtime = mtime
+                try:
+                    import joblib
+
+                    bundle = joblib.load(self.model_path)
+                    if bundle.get('features') != FEATURES:
+                        raise ValueError(f"model features {bundle.get('features')} do not match {FEATURES}")
+                    self.bundle, self.calendar = bundle, EventCalendar(**bundle['calendar'])
+                    self.stats['loads'] += 1
+                except Exception as e:
+                    print(f"Error loading crowd forecast model {self.model_path}: {e}")
+                    self.bundle, self.calendar = None, None
+                    self.stats['load_errors'] += 1
+            return self.bundle
+
+    def predict(self, issued, horizons, density, capacity, temperature=np.nan, humidity=np.nan):
+        """Zones x horizons predicted density (clipped to 0-1) from each zone's density now, or None"""
+        bundle = self.load()
+        if bundle is None:
+            return None
+        start = time.perf_counter()
+        zones, steps = len(density), len(horizons)
+        features = feature_matrix(self.calendar, issued, np.tile(horizons, zones), np.repeat(density, steps),
+                                  np.repeat(capacity, steps), temperature, humidity)
+        predicted = np.clip(bundle['model'].predict(features), 0.0, 1.0).reshape(zones, steps)
+        self.stats['predictions'] += 1
+        self.stats['last_predict_ms'] = (time.perf_counter() - start) * 1000
+        return predicted
+
+    def error(self, horizons):
+        """Held-out mean absolute error of the loaded model at each horizon (NaN where unknown)"""
+        bundle = self.bundle
+        mae = dict(zip(bundle['horizons'], bundle['horizon_mae'])) if bundle else {}
+        return np.array([mae.get(horizon) if mae.get(horizon) is not None else np.nan for horizon in horizons])
+
+    def get_stats(self):
+        bundle = self.bundle or {}
+        return dict(self.stats, model_path=self.model_path, loaded=bool(bundle), trained_at=bundle.get('trained_at'),
+                    mae=bundle.get('mae'), samples=bundle.get('samples'))
+
+def profile_forecast(calendar, issued, horizons, zones):
+    """Zones x horizons density from the hour-of-day profile alone, for when there is no model"""
+    hours = calendar.local_hours(issued + np.asarray(horizons, dtype=np.float64) * 3600).astype(np.int64)
+    return np.broadcast_to(HOURLY_PROFILE[hours], (zones, len(horizons)))
+
+def _day_number(iso_date):
+    return date.fromisoformat(iso_date).toordinal() - date(1970, 1, 1).toordinal()
+
+def main():
+    """Train a model from stored zone readings (CSV or Parquet) and save it for CrowdForecaster"""
+    import joblib
+    import pandas as pd
+    from config import Config
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('history', help='zone_id, timestamp, capacity, density or count[, temperature, humidity]')
+    parser.add_argument('--out', default=Config.CROWD_FORECAST_MODEL)
+    parser.add_argument('--max-samples', type=int, default=500000)
+    args = parser.parse_args()
+
+    read = pd.read_parquet if args.history.endswith('.parquet') else pd.read_csv
+    calendar = EventCalendar(Config.CROWD_EVENT_START, Config.CROWD_BATHING_DAYS, Config.CROWD_EVENT_UTC_OFFSET_H)
+    bundle = train(read(args.history), calendar, range(1, Config.CROWD_FORECAST_HORIZON_H + 1), args.max_samples)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    joblib.dump(bundle, args.out)
+    print(f"Trained on {bundle['samples']} samples from {bundle['zones']} zones; "
+          f"held-out MAE {bundle['mae']:.3f}; saved to {args.out}")
+
+if __name__ == '__main__':
+    main()
@@ -1,59 +1,103 @@
+import base64
+import json
+import os
 import numpy as np
 import random
-from datetime import datetime, timedelta
+import time
+from datetime import datetime
 from config import Config
+from services.zone_table import RISK_LEVELS, ZoneTable, risk_codes
+from services.sensor_buffer import READING_DTYPE, SensorRingBuffer
+from services.crowd_anomaly import ANOMALY_SEVERITIES, ANOMALY_TYPES, BUILDUP, SPIKE, AnomalyDetector
+from services.density_grid import DensityGrid
+from services.crowd_forecast import CrowdForecaster, EventCalendar, profile_forecast
+
+DEFAULT_ZONES = [
+    {
+        'id': 'zone_1',
+        'name': 'Main Ghat Area',
+        'coordinates': [25.4358, 81.8463],
+        'capacity': 100000,
+        'flow_direction': 'north'
+    },
+    {
+        'id': 'zone_2',
+        'name': 'Prayagraj Fort',
+        'coordinates': [25.4300, 81.8400],
+        'capacity': 50000,
+        'flow_direction': 'south'
+    },
+    {
+        'id': 'zone_3',
+        'name': 'Triveni Sangam',
+        'coordinates': [25.4400, 81.8500],
+        'capacity': 150000,
+        'flow_direction': 'east'
+    },
+    {
+        'id': 'zone_4',
+        'name': 'Anand Bhavan',
+        'coordinates': [25.4250, 81.8350],
+        'capacity': 30000,
+        'flow_direction': 'west'
+    }
+]
+
+NO_ANOMALIES = {'anomalies': []}
+RASTER_CACHE_SIZE = 64  # Heatmap viewports kept between updates
 
 class CrowdService:
-    def __init__(self):
+    def __init__(self, zones=None):
         self.config = Config()
-        self.crowd_zones = [
-            {
-                'id': 'zone_1',
-                'name': 'Main Ghat Area',
-                'coordinates': [25.4358, 81.8463],
-                'capacity': 100000,
-                'current_density': 0.0,
-                'flow_direction': 'north',
-                'risk_level': 'low'
-            },
-            {
-                'id': 'zone_2',
-                'name': 'Prayagraj Fort',
-                'coordinates': [25.4300, 81.8400],
-                'capacity': 50000,
-                'current_density': 0.0,
-                'flow_direction': 'south',
-                'risk_level': 'low'
-            },
-            {
-                'id': 'zone_3',
-                'name': 'Triveni Sangam',
-                'coordinates': [25.4400, 81.8500],
-                'capacity': 150000,
-                'current_density': 0.0,
-                'flow_direction': 'east',
-                'risk_level': 'low'
-            },
-            {
-                'id': 'zone_4',
-                'name': 'Anand Bhavan',
-                'coordinates': [25.4250, 81.8350],
-                'capacity': 30000,
-                'current_density': 0.0,
-                'flow_direction': 'west',
-                'risk_level': 'low'
-            }
-        ]
-        
+        self.zones = ZoneTable(zones or self._load_zones())
+        self.sensors = SensorRingBuffer(len(self.zones), self.config.CROWD_SENSOR_BUFFER_SIZE)
+        self.detector = AnomalyDetector(
+            len(self.zones),
+            window=self.config.CROWD_ANOMALY_WINDOW,
+            trend_window=self.config.CROWD_ANOMALY_TREND_WINDOW,
+            warmup=self.config.CROWD_ANOMALY_WARMUP,
+            spike_sigma=self.config.CROWD_SPIKE_SIGMA,
+            buildup_rate=self.config.CROWD_BUILDUP_RATE,
+            dispersal_rate=self.config.CROWD_DISPERSAL_RATE
+        )
+        self.anomalies = self.detector.events()
+        self.heatmap = DensityGrid(
+            self.config.CROWD_HEATMAP_LEVELS,
+            reference_lat=self.config.MAHAKUMBH_LAT,
+            design_density=self.config.CROWD_HEATMAP_DESIGN_DENSITY,
+            max_cells=self.config.CROWD_HEATMAP_MAX_CELLS,
+            full_scale=self.config.CROWD_HEATMAP_FULL_SCALE
+        )
+        self.heatmap_radii = self.heatmap.radii(self.zones.capacity)
+        self.rasters = {}  # (bbox, level) -> (values, snapped bbox, level) until the next update
+        self.calendar = EventCalendar(self.config.CROWD_EVENT_START, self.config.CROWD_BATHING_DAYS,
+                                      self.config.CROWD_EVENT_UTC_OFFSET_H)
+        self.forecaster = CrowdForecaster(self.config.CROWD_FORECAST_MODEL)
+        self.horizons = np.arange(1, self.config.CROWD_FORECAST_HORIZON_H + 1)
+        self.forecast = None  # (issued, source, zones x horizons density) until the next update
+        self.weather = {}
+        self.reporting = np.zeros(len(self.zones), dtype=bool)
+    
+    @property
+    def crowd_zones(self):
+        """JSON view of every zone"""
+        return self.zones.records(extra=self._anomaly_fields(), defaults=NO_ANOMALIES)
+    
     def get_crowd_analytics(self):
         """Get comprehensive crowd analytics data"""
         try:
-            # Update crowd data for all zones
-            for zone in self.crowd_zones:
-                zone['current_density'] = self._simulate_crowd_density()
-                zone['risk_level'] = self._calculate_risk_level(zone['current_density'])
-                zone['flow_rate'] = self._simulate_flow_rate()
-                zone['anomalies'] = self._detect_anomalies(zone)
+            # Update crowd data for all zones at once, from sensors where they reported recently
+            count = len(self.zones)
+            density, flow_rate = self._simulate_crowd_density(count), self._simulate_flow_rate(count)
+            timestamps, counts, flows = self.sensors.latest()
+            with np.errstate(invalid='ignore'):
+                reporting = time.time() - timestamps <= self.config.CROWD_SENSOR_MAX_AGE
+            density = np.where(reporting, counts / np.maximum(self.zones.capacity, 1), density)
+            flow_rate = np.where(reporting, np.rint(flows), flow_rate)
+            self.zones.update(density, flow_rate)
+            self.rasters = {}
+            self.forecast = None
+            self._detect_anomalies(reporting)
             
             return {
                 'zones': self.crowd_zones,
@@ -68,6 +112,86 @@ class CrowdService:
             print(f"Error generating crowd analytics: {e}")
             return self._get_mock_crowd_data()
     
+    def ingest_binary(self, body):
+        """Buffer packed READING_DTYPE readings; returns (accepted, rejected)"""
+        if len(body) % READING_DTYPE.itemsize:
+            raise ValueError(f"Body length {len(body)} is not a multiple of the {READING_DTYPE.itemsize}-byte reading size")
+        readings = np.frombuffer(body, dtype=READING_DTYPE)
+        accepted = self.sensors.ingest(readings['zone'], readings['timestamp'], readings['count'], readings['flow'])
+        return accepted, len(readings) - accepted
+    
+    def ingest_json(self, payload):
+        """Buffer JSON readings, either {"readings": [{zone_id, timestamp, count, flow}, ...]}
+        or columns {"zone_id": [...], "timestamp": [...], "count": [...], "flow": [...]}; returns (accepted, rejected)"""
+        rows = self.zones.rows
+        if 'readings' in payload:
+            readings = payload['readings']
+            if not isinstance(readings, list) or not all(isinstance(reading, dict) for reading in readings):
+                raise ValueError("readings must be a list of objects")
+            columns = np.array([(rows.get(reading.get('zone_id'), -1), _epoch(reading.get('timestamp')),
+                                 _number(reading.get('count')), _number(reading.get('flow', 0)))
+                                for reading in readings], dtype=np.float64).reshape(-1, 4).T
+            zones, timestamps, counts, flows = columns
+        else:
+            names = [name for name in ('zone_id', 'timestamp', 'count', 'flow') if name in payload]
+            if not {'zone_id', 'timestamp', 'count'} <= set(names):
+                raise ValueError("expected a readings list or zone_id, timestamp and count columns")
+            if not all(isinstance(payload[name], list) for name in names):
+                raise ValueError(f"{', '.join(names)} must be lists")
+            zones = np.array([rows.get(zone_id, -1) for zone_id in payload['zone_id']], dtype=np.int64)
+            timestamps = np.array([_epoch(value) for value in payload['timestamp']], dtype=np.float64)
+            counts = np.array(payload['count'], dtype=np.float64)
+            flows = np.array(payload['flow'], dtype=np.float64) if 'flow' in payload else np.zeros(len(zones))
+            if not len(zones) == len(timestamps) == len(counts) == len(flows):
+                raise ValueError("zone_id, timestamp, count and flow must be the same length")
+        accepted = self.sensors.ingest(zones, timestamps, counts, flows)
+        return accepted, len(zones) - accepted
+    
+    def get_zone_readings(self, zone_id, limit=None):
+        """A zone's buffered sensor readings, oldest first, or None for an unknown zone"""
+        row = self.zones.rows.get(zone_id)
+        if row is None:
+            return None
+        timestamps, counts, flows = self.sensors.series(row, limit)
+        return {
+            'zone_id': zone_id,
+            'capacity': int(self.zones.capacity[row]),
+            'timestamp': timestamps.tolist(),
+            'count': counts.tolist(),
+            'flow': flows.tolist()
+        }
+    
+    def get_ingest_schema(self):
+        """How to address zones in binary readings"""
+        return {
+            'content_type': 'application/octet-stream',
+            'record_size': READING_DTYPE.itemsize,
+            'fields': [{'name': name, 'type': READING_DTYPE.fields[name][0].str, 'offset': READING_DTYPE.fields[name][1]}
+                       for name in READING_DTYPE.names],
+            'zones': self.zones.ids.tolist()  # A reading's zone field is its index in this list
+        }
+    
+    def get_heatmap(self, bbox=None, cell_m=None):
+        """Crowd density raster over bbox (default: every zone) as base64 uint8 cells, north row first"""
+        values, snapped, level = self._heatmap_raster(bbox, cell_m)
+        height, width = values.shape
+        return {
+            'bbox': snapped,
+            'cell_m': level,
+            'levels': self.heatmap.levels,
+            'width': width,
+            'height': height,
+            'encoding': 'uint8',
+            'full_scale': self.heatmap.full_scale,  # People/m2 that a cell value of 255 stands for
+            'max_density': float(values.max()),
+            'data': base64.b64encode(self.heatmap.quantize(values).tobytes()).decode('ascii')
+        }
+    
+    def get_heatmap_png(self, bbox=None, cell_m=None):
+        """Crowd density raster over bbox as a colour-ramped PNG: (png bytes, snapped bbox, cell size)"""
+        values, snapped, level = self._heatmap_raster(bbox, cell_m)
+        return self.heatmap.to_png(values), snapped, level
+    
     def get_stampede_risk_assessment(self):
         """Get stampede risk assessment"""
         try:
@@ -97,33 +221,34 @@ class CrowdService:
     def get_crowd_predictions(self, hours_ahead=24):
         """Get crowd predictions for the next hours"""
         try:
-            predictions = []
-            current_time = datetime.now()
-            
-            for hour in range(1, hours_ahead + 1):
-                prediction_time = current_time + timedelta(hours=hour)
-                
-                # Predict crowd density based on time patterns
-                predicted_density = self._predict_density_by_time(prediction_time)
-                
-                predictions.append({
-                    'timestamp': prediction_time.isoformat(),
-                    'predicted_density': predicted_density,
-                    'confidence': random.uniform(0.7, 0.95),
-                    'risk_level': self._calculate_risk_level(predicted_density)
-                })
+            issued, source, predicted = self._forecast()
+            steps = min(max(hours_ahead, 1), len(self.horizons))
+            density = predicted[:, :steps].mean(axis=0) if len(self.zones) else np.zeros(steps)
+            confidence = self._forecast_confidence(source, self.horizons[:steps])
+            predictions = [{
+                'timestamp': datetime.fromtimestamp(issued + hour * 3600).isoformat(),
+                'predicted_density': value,
+                'confidence': score,
+                'risk_level': RISK_LEVELS[risk]
+            } for hour, value, score, risk in zip(self.horizons[:steps].tolist(), density.tolist(), confidence,
+                                                   risk_codes(density).tolist())]
             
             return {
                 'predictions': predictions,
-                'model_accuracy': random.uniform(0.8, 0.92),
-                'last_updated': datetime.now().isoformat()
+                'source': source,
+                'model_accuracy': float(np.mean(self._forecast_confidence(source, self.horizons))) if source == 'model' else None,
+                'last_updated': datetime.fromtimestamp(issued).isoformat()
             }
         except Exception as e:
             print(f"Error generating crowd predictions: {e}")
             return {'predictions': [], 'model_accuracy': 0.85, 'last_updated': datetime.now().isoformat()}
     
-    def _simulate_crowd_density(self):
-        """Simulate crowd density (0.0 to 1.0)"""
+    def set_weather(self, weather):
+        """Latest current-weather reading, used as forecast inputs"""
+        self.weather = weather or {}
+    
+    def _simulate_crowd_density(self, count):
+        """Simulate crowd density (0.0 to 1.0) for count zones"""
         # Simulate realistic crowd patterns
         hour = datetime.now().hour
         
@@ -137,63 +262,65 @@ class CrowdService:
             base_density = 0.3
         
         # Add some randomness
-        return min(1.0, max(0.0, base_density + random.uniform(-0.2, 0.2)))
+        return np.clip(base_density + np.random.uniform(-0.2, 0.2, count), 0.0, 1.0)
     
-    def _simulate_flow_rate(self):
-        """Simulate crowd flow rate (people per minute)"""
-        return random.randint(100, 1000)
+    def _simulate_flow_rate(self, count):
+        """Simulate crowd flow rate (people per minute) for count zones"""
+        return np.random.randint(100, 1001, count)
     
     def _calculate_risk_level(self, density):
         """Calculate risk level based on crowd density"""
-        if density < 0.3:
-            return 'low'
-        elif density < 0.7:
-            return 'moderate'
-        elif density < 0.9:
-            return 'high'
-        else:
-            return 'critical'
+        return RISK_LEVELS[int(risk_codes(density))]
     
-    def _detect_anomalies(self, zone):
-        """Detect anomalies in crowd behavior"""
-        anomalies = []
-        
-        # Simulate various anomalies
-        if random.random() < 0.1:  # 10% chance of anomaly
-            anomaly_types = [
-                'sudden_density_spike',
-                'flow_direction_change',
-                'unusual_movement_pattern',
-                'crowd_buildup',
-                'rapid_dispersal'
-            ]
-            anomalies.append({
-                'type': random.choice(anomaly_types),
-                'severity': random.choice(['low', 'moderate', 'high']),
-                'timestamp': datetime.now().isoformat(),
-                'description': f'Anomaly detected in {zone["name"]}'
+    def _detect_anomalies(self, reporting):
+        """Feed this tick's sensor readings to the anomaly detector and keep its current events
+
+        Only zones reporting from sensors are observed, with every reading
+        buffered since the last tick; simulated densities never reach the
+        detector. A zone that starts or stops reporting has its statistics
+        reset, and events are only kept for zones reporting now.
+        """
+        switched = np.flatnonzero(reporting != self.reporting)
+        if switched.size:
+            self.detector.reset(switched)
+        self.reporting = reporting
+        rows, timestamps, counts, flows = self.sensors.drain()
+        live = reporting[rows]
+        rows, timestamps, counts, flows = rows[live], timestamps[live], counts[live], flows[live]
+        self.detector.observe(rows, timestamps, counts / np.maximum(self.zones.capacity[rows], 1), flows)
+        events = self.detector.events()
+        kept = reporting[events[0]]
+        self.anomalies = tuple(column[kept] for column in events)
+    
+    def _anomaly_fields(self):
+        """Row -> {'anomalies': [...]} for zones with anomalies, for the JSON view"""
+        fields = {}
+        for row, kind, severity, timestamp, score in zip(*(column.tolist() for column in self.anomalies)):
+            fields.setdefault(row, {'anomalies': []})['anomalies'].append({
+                'type': ANOMALY_TYPES[kind],
+                'severity': ANOMALY_SEVERITIES[severity],
+                'timestamp': datetime.fromtimestamp(timestamp).isoformat(),
+                'description': self._describe_anomaly(row, kind, score)
             })
-        
-        return anomalies
+        return fields
+    
+    def _describe_anomaly(self, row, kind, score):
+        name = self.zones.names[row]
+        if kind == SPIKE:
+            return f'Density in {name} jumped to {self.detector.density[row]:.0%}, {score:.1f} standard deviations above normal'
+        if kind == BUILDUP:
+            return f'Crowd building up in {name}: density rising {score:.1%} of capacity per minute'
+        return f'Crowd dispersing rapidly from {name}: density falling {-score:.1%} of capacity per minute'
     
     def _calculate_overall_metrics(self):
         """Calculate overall crowd metrics"""
-        total_capacity = sum(zone['capacity'] for zone in self.crowd_zones)
-        total_current = sum(zone['capacity'] * zone['current_density'] for zone in self.crowd_zones)
-        
-        return {
-            'total_capacity': total_capacity,
-            'current_occupancy': int(total_current),
-            'occupancy_percentage': (total_current / total_capacity) * 100,
-            'average_density': np.mean([zone['current_density'] for zone in self.crowd_zones]),
-            'max_density': max([zone['current_density'] for zone in self.crowd_zones]),
-            'zones_at_capacity': len([zone for zone in self.crowd_zones if zone['current_density'] > 0.9])
-        }
+        return dict(self.zones.metrics(), zones_reporting=int(np.count_nonzero(self.reporting)))
     
     def _assess_overall_risk(self):
         """Assess overall risk level"""
-        high_risk_zones = len([zone for zone in self.crowd_zones if zone['risk_level'] in ['high', 'critical']])
-        total_zones = len(self.crowd_zones)
+        counts = self.zones.risk_counts()
+        high_risk_zones = counts['high'] + counts['critical']
+        total_zones = len(self.zones)
         
         if high_risk_zones == 0:
             overall_risk = 'low'
@@ -208,44 +335,70 @@ class CrowdService:
             'level': overall_risk,
             'high_risk_zones': high_risk_zones,
             'total_zones': total_zones,
-            'risk_percentage': (high_risk_zones / total_zones) * 100
+            'risk_percentage': (high_risk_zones / total_zones) * 100 if total_zones else 0.0
         }
     
     def _generate_predictions(self):
-        """Generate crowd predictions"""
-        return {
-            'next_hour': {
-                'predicted_density': random.uniform(0.6, 0.9),
-                'confidence': random.uniform(0.8, 0.95)
-            },
-            'next_3_hours': {
-                'predicted_density': random.uniform(0.5, 0.8),
-                'confidence': random.uniform(0.7, 0.9)
-            },
-            'next_6_hours': {
-                'predicted_density': random.uniform(0.4, 0.7),
-                'confidence': random.uniform(0.6, 0.8)
+        """Generate crowd predictions: mean density over the next 1, 3 and 6 hours"""
+        _, source, predicted = self._forecast()
+        predictions = {}
+        for name, hours in (('next_hour', 1), ('next_3_hours', 3), ('next_6_hours', 6)):
+            steps = min(hours, len(self.horizons))
+            confidence = self._forecast_confidence(source, self.horizons[:steps])
+            predictions[name] = {
+                'predicted_density': float(predicted[:, :steps].mean()) if len(self.zones) else 0.0,
+                'confidence': float(np.mean(confidence)) if source == 'model' else None
             }
-        }
+        return predictions
+    
+    def _forecast(self):
+        """Every zone's density at every horizon, computed once per update in one batched model call"""
+        forecast = self.forecast
+        if forecast is None:
+            issued = time.time()
+            predicted = self.forecaster.predict(
+                issued, self.horizons, self.zones.density, self.zones.capacity,
+                _number(self.weather.get('temperature')), _number(self.weather.get('humidity'))
+            )
+            if predicted is None:
+                forecast = (issued, 'time_of_day', profile_forecast(self.calendar, issued, self.horizons, len(self.zones)))
+            else:
+                forecast = (issued, 'model', predicted)
+            self.forecast = forecast
+        return forecast
+    
+    def _forecast_confidence(self, source, horizons):
+        """1 - held-out mean absolute error of the model at each horizon; None without a model"""
+        if source != 'model':
+            return [None] * len(horizons)
+        return np.clip(1 - np.nan_to_num(self.forecaster.error(horizons), nan=1.0), 0.0, 1.0).tolist()
     
     def _generate_heatmap_data(self):
-        """Generate heatmap data for visualization"""
-        heatmap_data = []
-        
-        for zone in self.crowd_zones:
-            # Generate multiple points around the zone center
-            for i in range(5):
-                lat_offset = random.uniform(-0.01, 0.01)
-                lon_offset = random.uniform(-0.01, 0.01)
-                
-                heatmap_data.append({
-                    'lat': zone['coordinates'][0] + lat_offset,
-                    'lng': zone['coordinates'][1] + lon_offset,
-                    'intensity': zone['current_density'],
-                    'zone_id': zone['id']
-                })
-        
-        return heatmap_data
+        """Generate heatmap data for visualization: the raster over every zone"""
+        return self.get_heatmap()
+    
+    def _heatmap_raster(self, bbox, cell_m):
+        """Rasterize zone occupancy over a viewport, reusing rasters from the same update"""
+        key = (tuple(bbox) if bbox else None, cell_m)
+        raster = self.rasters.get(key)
+        if raster is None:
+            if bbox:
+                area = list(bbox)
+                if not (area[0] < area[2] and area[1] < area[3]):
+                    raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+            else:
+                area = (self.heatmap.extent(self.zones.lats, self.zones.lons, self.heatmap_radii)
+                        or [self.config.MAHAKUMBH_LON, self.config.MAHAKUMBH_LAT] * 2)
+            level = self.heatmap.level_for(area, cell_m)
+            if level is None:
+                raise ValueError(f"Viewport needs more than {self.heatmap.max_cells} cells a side at every level")
+            occupants = self.zones.capacity * self.zones.density
+            values, snapped = self.heatmap.rasterize(area, level, self.zones.lats, self.zones.lons,
+                                                     occupants, self.heatmap_radii)
+            if len(self.rasters) >= RASTER_CACHE_SIZE:
+                self.rasters = {}
+            raster = self.rasters[key] = (values, snapped, level)
+        return raster
     
     def _analyze_flow_patterns(self):
         """Analyze crowd flow patterns"""
@@ -268,7 +421,7 @@ class CrowdService:
     
     def _calculate_average_density(self):
         """Calculate average crowd density across all zones"""
-        return np.mean([zone['current_density'] for zone in self.crowd_zones])
+        return float(self.zones.density.mean()) if len(self.zones) else 0.0
     
     def _get_weather_impact(self):
         """Get weather impact on crowd behavior"""
@@ -362,20 +515,17 @@ class CrowdService:
     
     def _identify_critical_zones(self):
         """Identify zones with critical risk levels"""
-        return [zone for zone in self.crowd_zones if zone['risk_level'] in ['high', 'critical']]
+        return self.zones.records(self.zones.critical_rows(), extra=self._anomaly_fields(), defaults=NO_ANOMALIES)
     
-    def _predict_density_by_time(self, target_time):
-        """Predict crowd density based on time patterns"""
-        hour = target_time.hour
-        
-        if 6 <= hour <= 10:
-            return random.uniform(0.6, 0.8)
-        elif 11 <= hour <= 15:
-            return random.uniform(0.8, 0.95)
-        elif 16 <= hour <= 20:
-            return random.uniform(0.7, 0.9)
-        else:
-            return random.uniform(0.2, 0.5)
+    def _load_zones(self):
+        """Zone definitions from CROWD_ZONES_FILE (a JSON list), or the built-in four"""
+        if self.config.CROWD_ZONES_FILE and os.path.exists(self.config.CROWD_ZONES_FILE):
+            try:
+                with open(self.config.CROWD_ZONES_FILE) as zones_file:
+                    return json.load(zones_file)
+            except (OSError, ValueError) as e:
+                print(f"Error loading crowd zones from {self.config.CROWD_ZONES_FILE}: {e}")
+        return DEFAULT_ZONES
     
     def _get_mock_crowd_data(self):
         """Get mock crowd data for fallback"""
@@ -398,4 +548,16 @@ class CrowdService:
             'recommendations': ['Continue monitoring'],
             'critical_zones': [],
             'timestamp': datetime.now().isoformat()
-        }
\ No newline at end of file
+        }
+
+def _epoch(value):
+    """Epoch seconds from a number or an ISO 8601 string (NaN if neither)"""
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return float('nan')
+    return _number(value)
+
+def _number(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else float('nan')
@@ -0,0 +1,317 @@
+import json
+import math
+import os
+import threading
+from collections import OrderedDict, namedtuple
+import numpy as np
+from services.geo import METRES_PER_DEGREE_LAT, METRES_PER_DEGREE_LON, haversine_km
+
+# Derived terrain for one tile of the raster; arrays share the tile's shape
+TerrainTile = namedtuple('TerrainTile', ['elevation', 'slope', 'aspect', 'flood_prone', 'pixel_km2'])
+
+def open_dem(path):
+    """Memory-map a DEM and read its georeferencing: (array, bbox, nodata)
+
+    .npy files and raw rasters are described by a JSON sidecar next to them
+    (dem.npy or dem.raw -> dem.json) holding "bbox" [min_lon, min_lat, max_lon,
+    max_lat] and optionally "nodata"; raw rasters also need "width", "height",
+    "dtype" and optionally "offset". Uncompressed GeoTIFFs are mapped with
+    tifffile when it is installed and take their bbox from the GeoTIFF tags
+    unless the sidecar gives one.
+    """
+    sidecar_path = os.path.splitext(path)[0] + '.json'
+    sidecar = {}
+    if os.path.exists(sidecar_path):
+        with open(sidecar_path) as sidecar_file:
+            sidecar = json.load(sidecar_file)
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npy':
+        elevation = np.load(path, mmap_mode='r')
+    elif extension in ('.tif', '.tiff'):
+        try:
+            import tifffile
+        except ImportError:
+            raise ValueError("Reading GeoTIFF DEMs needs tifffile; convert the DEM to .npy or install tifffile")
+        elevation = tifffile.memmap(path, mode='r')
+        if 'bbox' not in sidecar:
+            sidecar['bbox'] = _geotiff_bbox(path, elevation.shape)
+    else:
+        missing = [key for key in ('width', 'height', 'dtype') if key not in sidecar]
+        if missing:
+            raise ValueError(f"Raw DEM {path} needs {', '.join(missing)} in {sidecar_path}")
+        elevation = np.memmap(path, dtype=np.dtype(sidecar['dtype']), mode='r', offset=sidecar.get('offset', 0),
+                              shape=(sidecar['height'], sidecar['width']))
+
+    if elevation.ndim != 2:
+        raise ValueError(f"DEM {path} has {elevation.ndim} dimensions, expected a single band")
+    if len(sidecar.get('bbox', [])) != 4:
+        raise ValueError(f"DEM {path} needs a bbox [min_lon, min_lat, max_lon, max_lat] in {sidecar_path}")
+    return elevation, [float(value) for value in sidecar['bbox']], sidecar.get('nodata')
+
+def _geotiff_bbox(path, shape):
+    """Bbox from the ModelTiepoint and ModelPixelScale tags of a north-up GeoTIFF"""
+    import tifffile
+
+    with tifffile.TiffFile(path) as tif:
+        tags = tif.pages[0].tags
+        if 'ModelTiepointTag' not in tags or 'ModelPixelScaleTag' not in tags:
+            raise ValueError(f"GeoTIFF {path} has no tiepoint/pixel scale tags; give its bbox in a JSON sidecar")
+        i, j, _, x, y, _ = tags['ModelTiepointTag'].value[:6]
+        scale_x, scale_y = tags['ModelPixelScaleTag'].value[:2]
+    min_lon = x - i * scale_x
+    max_lat = y + j * scale_y
+    return [min_lon, max_lat - shape[0] * scale_y, min_lon + shape[1] * scale_x, max_lat]
+
+def horn_gradient(z, dx, dy):
+    """Elevation gradient (east, south) of the interior of a halo-padded grid by Horn's 3x3 method"""
+    a, b, c = z[:-2, :-2], z[:-2, 1:-1], z[:-2, 2:]
+    d, f = z[1:-1, :-2], z[1:-1, 2:]
+    g, h, i = z[2:, :-2], z[2:, 1:-1], z[2:, 2:]
+    dz_dx = ((c + 2 * f + i) - (a + 2 * d + g)) / (8 * dx)
+    dz_dy = ((g + 2 * h + i) - (a + 2 * b + c)) / (8 * dy)
+    return dz_dx, dz_dy
+
+class DemRaster:
+    """Digital elevation model read through a memory map
+
+    Only the windows a query touches are read from disk. Slope, aspect and
+    the flood-prone mask are computed per tile (with a one-pixel halo so tile
+    edges match the whole-raster result) and kept in a bounded LRU.
+    Flood-prone pixels are flat ground at most flood_height_m above the
+    reference (river) level, which is estimated from a strided sample of the
+    raster unless given.
+    """
+
+    def __init__(self, elevation, bbox, nodata=None, tile_size=256, flood_height_m=3.0, flood_max_slope=2.0,
+                 steep_slope=5.0, reference_m=None, max_tiles=64):
+        self.elevation = elevation
+        self.height, self.width = elevation.shape
+        self.bbox = list(bbox)
+        self.nodata = nodata
+        self.tile_size = tile_size
+        self.flood_height_m = flood_height_m
+        self.flood_max_slope = flood_max_slope
+        self.steep_slope = steep_slope
+        self.max_tiles = max_tiles
+        self.pixel_lon = (self.bbox[2] - self.bbox[0]) / self.width
+        self.pixel_lat = (self.bbox[3] - self.bbox[1]) / self.height
+        self.lock = threading.Lock()
+        self.tiles = OrderedDict()
+        self.tile_totals = {}
+        self.stats = {'tiles_computed': 0, 'tiles_reused': 0, 'evictions': 0}
+        self.reference_m = reference_m if reference_m is not None else self._river_level()
+
+    def elevations(self, lats, lons):
+        """Bilinearly interpolated elevation at points (NaN outside the raster or next to nodata)"""
+        rows, columns, inside = self._pixel_coordinates(lats, lons)
+        row0 = np.clip(np.floor(rows).astype(np.int64), 0, max(0, self.height - 2))
+        column0 = np.clip(np.floor(columns).astype(np.int64), 0, max(0, self.width - 2))
+        row1 = np.minimum(row0 + 1, self.height - 1)
+        column1 = np.minimum(column0 + 1, self.width - 1)
+        row_weight = np.clip(rows - row0, 0.0, 1.0)
+        column_weight = np.clip(columns - column0, 0.0, 1.0)
+        # Fancy indexing a memmap only pages in the pixels it touches
+        top = (self._read(self.elevation[row0, column0]) * (1 - column_weight)
+               + self._read(self.elevation[row0, column1]) * column_weight)
+        bottom = (self._read(self.elevation[row1, column0]) * (1 - column_weight)
+                  + self._read(self.elevation[row1, column1]) * column_weight)
+        return np.where(inside, top * (1 - row_weight) + bottom * row_weight, np.nan)
+
+    def terrain_at(self, lats, lons):
+        """Elevation, slope, aspect and flood-prone flag at points, from the tiles they fall in"""
+        lats, lons = np.atleast_1d(np.asarray(lats, dtype=np.float64)), np.atleast_1d(np.asarray(lons, dtype=np.float64))
+        rows, columns, inside = self._pixel_coordinates(lats, lons)
+        rows = np.clip(np.round(rows).astype(np.int64), 0, self.height - 1)
+        columns = np.clip(np.round(columns).astype(np.int64), 0, self.width - 1)
+        slope = np.full(lats.shape, np.nan, dtype=np.float32)
+        aspect = np.full(lats.shape, np.nan, dtype=np.float32)
+        flood_prone = np.zeros(lats.shape, dtype=bool)
+        tile_ids = (rows // self.tile_size) * (self.width // self.tile_size + 1) + columns // self.tile_size
+        for tile_id in np.unique(tile_ids[inside]):
+            selected = inside & (tile_ids == tile_id)
+            tile_row, tile_column = rows[selected][0] // self.tile_size, columns[selected][0] // self.tile_size
+            tile = self.tile(tile_row, tile_column)
+            local_rows = rows[selected] - tile_row * self.tile_size
+            local_columns = columns[selected] - tile_column * self.tile_size
+            slope[selected] = tile.slope[local_rows, local_columns]
+            aspect[selected] = tile.aspect[local_rows, local_columns]
+            flood_prone[selected] = tile.flood_prone[local_rows, local_columns]
+        return {'elevation': self.elevations(lats, lons), 'slope': slope, 'aspect': aspect, 'flood_prone': flood_prone}
+
+    def profile(self, start, end, samples=64):
+        """Terrain sampled evenly along a straight line between two (lat, lon) points"""
+        fractions = np.linspace(0.0, 1.0, samples)
+        terrain = self.terrain_at(start[0] + (end[0] - start[0]) * fractions, start[1] + (end[1] - start[1]) * fractions)
+        terrain['distance_km'] = float(haversine_km(start[0], start[1], [end[0]], [end[1]])[0])
+        return terrain
+
+    def area_summary(self, bbox):
+        """Elevation, slope and flood-prone statistics over the raster pixels inside a lon/lat bbox"""
+        rows = self._row_range(bbox[1], bbox[3])
+        columns = self._column_range(bbox[0], bbox[2])
+        return self._summarize([self._piece_totals(key, tile_rows, tile_columns)
+                                for key, tile_rows, tile_columns, _, _ in self._pieces(rows, columns)])
+
+    def zone_summary(self, lat, lon, radius_m):
+        """The same statistics over the pixels within radius_m of a point"""
+        radius_lat = radius_m / METRES_PER_DEGREE_LAT
+        radius_lon = radius_m / (METRES_PER_DEGREE_LON * math.cos(math.radians(lat)))
+        rows = self._row_range(lat - radius_lat, lat + radius_lat)
+        columns = self._column_range(lon - radius_lon, lon + radius_lon)
+        totals = []
+        for key, tile_rows, tile_columns, row_start, column_start in self._pieces(rows, columns):
+            row_count, column_count = tile_rows.stop - tile_rows.start, tile_columns.stop - tile_columns.start
+            centre_lats = self.bbox[3] - (np.arange(row_start, row_start + row_count) + 0.5) * self.pixel_lat
+            centre_lons = self.bbox[0] + (np.arange(column_start, column_start + column_count) + 0.5) * self.pixel_lon
+            dy = (centre_lats - lat) * METRES_PER_DEGREE_LAT
+            dx = (centre_lons - lon) * METRES_PER_DEGREE_LON * math.cos(math.radians(lat))
+            inside = dy[:, None] ** 2 + dx[None, :] ** 2 <= radius_m ** 2
+            totals.append(_totals(self.tile(*key), tile_rows, tile_columns, inside, self.steep_slope))
+        return self._summarize(totals)
+
+    def tile(self, tile_row, tile_column):
+        """Derived terrain for one tile, computed on first use"""
+        key = (int(tile_row), int(tile_column))
+        with self.lock:
+            tile = self.tiles.get(key)
+            if tile is not None:
+                self.tiles.move_to_end(key)
+                self.stats['tiles_reused'] += 1
+                return tile
+
+        tile = self._compute_tile(*key)
+        with self.lock:
+            self.tiles[key] = tile
+            self.stats['tiles_computed'] += 1
+            while len(self.tiles) > self.max_tiles:
+                self.tiles.popitem(last=False)
+                self.stats['evictions'] += 1
+        return tile
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, cached_tiles=len(self.tiles), summarized_tiles=len(self.tile_totals),
+                        shape=[self.height, self.width], bbox=self.bbox, tile_size=self.tile_size,
+                        reference_m=round(self.reference_m, 2))
+
+    def _compute_tile(self, tile_row, tile_column):
+        row0, column0 = tile_row * self.tile_size, tile_column * self.tile_size
+        row1, column1 = min(self.height, row0 + self.tile_size), min(self.width, column0 + self.tile_size)
+        halo_row0, halo_row1 = max(0, row0 - 1), min(self.height, row1 + 1)
+        halo_column0, halo_column1 = max(0, column0 - 1), min(self.width, column1 + 1)
+        z = self._read(self.elevation[halo_row0:halo_row1, halo_column0:halo_column1])
+        # At the raster edge the missing halo row/column repeats the edge
+        z = np.pad(z, ((int(halo_row0 == row0), int(halo_row1 == row1)),
+                       (int(halo_column0 == column0), int(halo_column1 == column1))), mode='edge')
+
+        centre_lat = self.bbox[3] - (row0 + row1) / 2 * self.pixel_lat
+        dx = self.pixel_lon * METRES_PER_DEGREE_LON * math.cos(math.radians(centre_lat))
+        dy = self.pixel_lat * METRES_PER_DEGREE_LAT
+        dz_dx, dz_dy = horn_gradient(z, dx, dy)
+        slope = np.degrees(np.arctan(np.hypot(dz_dx, dz_dy))).astype(np.float32)
+        # Compass direction the slope faces: downhill is (-dz/dx east, +dz/dy north) with rows running south
+        aspect = np.mod(np.degrees(np.arctan2(-dz_dx, dz_dy)), 360.0).astype(np.float32)
+        aspect[slope == 0] = np.nan
+
+        elevation = np.ascontiguousarray(z[1:-1, 1:-1])
+        with np.errstate(invalid='ignore'):
+            flood_prone = (elevation - self.reference_m <= self.flood_height_m) & (slope <= self.flood_max_slope)
+        return TerrainTile(elevation, slope, aspect, flood_prone, dx * dy / 1e6)
+
+    def _piece_totals(self, key, rows, columns):
+        """Totals for part of a tile; whole tiles are summed once and remembered, arrays or not"""
+        whole = (rows.start == 0 and columns.start == 0 and rows.stop == min(self.tile_size, self.height - key[0] * self.tile_size)
+                 and columns.stop == min(self.tile_size, self.width - key[1] * self.tile_size))
+        if not whole:
+            return _totals(self.tile(*key), rows, columns, None, self.steep_slope)
+        with self.lock:
+            totals = self.tile_totals.get(key)
+        if totals is None:
+            totals = _totals(self.tile(*key), rows, columns, None, self.steep_slope)
+            with self.lock:
+                self.tile_totals[key] = totals
+        return totals
+
+    def _pieces(self, rows, columns):
+        """(tile key, tile-local row slice, column slice, first global row, first global column) covering a window"""
+        pieces = []
+        if rows.start >= rows.stop or columns.start >= columns.stop:
+            return pieces
+        for tile_row in range(rows.start // self.tile_size, (rows.stop - 1) // self.tile_size + 1):
+            for tile_column in range(columns.start // self.tile_size, (columns.stop - 1) // self.tile_size + 1):
+                row_start = max(rows.start, tile_row * self.tile_size)
+                row_stop = min(rows.stop, (tile_row + 1) * self.tile_size)
+                column_start = max(columns.start, tile_column * self.tile_size)
+                column_stop = min(columns.stop, (tile_column + 1) * self.tile_size)
+                offset_row, offset_column = tile_row * self.tile_size, tile_column * self.tile_size
+                pieces.append(((tile_row, tile_column),
+                               slice(row_start - offset_row, row_stop - offset_row),
+                               slice(column_start - offset_column, column_stop - offset_column),
+                               row_start, column_start))
+        return pieces
+
+    def _summarize(self, totals):
+        """Combine per-piece totals into one set of statistics (None if no pixel had data)"""
+        totals = [piece for piece in totals if piece[0]]
+        if not totals:
+            return None
+        count, total, low, high, slope_total, steep_km2, flood_km2, area_km2 = (
+            sum(piece[0] for piece in totals), sum(piece[1] for piece in totals), min(piece[2] for piece in totals),
+            max(piece[3] for piece in totals), sum(piece[4] for piece in totals), sum(piece[5] for piece in totals),
+            sum(piece[6] for piece in totals), sum(piece[7] for piece in totals))
+        return {
+            'elevation_range': {'min': round(low, 2), 'max': round(high, 2), 'average': round(total / count, 2)},
+            'average_slope': round(slope_total / count, 3),
+            'steep_area_km2': round(steep_km2, 4),
+            'flood_prone_area_km2': round(flood_km2, 4),
+            'flood_prone_fraction': round(flood_km2 / area_km2, 4),
+            'area_km2': round(area_km2, 4)
+        }
+
+    def _pixel_coordinates(self, lats, lons):
+        lats, lons = np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64)
+        rows = (self.bbox[3] - lats) / self.pixel_lat - 0.5
+        columns = (lons - self.bbox[0]) / self.pixel_lon - 0.5
+        inside = (lats >= self.bbox[1]) & (lats <= self.bbox[3]) & (lons >= self.bbox[0]) & (lons <= self.bbox[2])
+        return rows, columns, inside
+
+    def _row_range(self, min_lat, max_lat):
+        return slice(max(0, math.floor((self.bbox[3] - max_lat) / self.pixel_lat)),
+                     min(self.height, math.ceil((self.bbox[3] - min_lat) / self.pixel_lat)))
+
+    def _column_range(self, min_lon, max_lon):
+        return slice(max(0, math.floor((min_lon - self.bbox[0]) / self.pixel_lon)),
+                     min(self.width, math.ceil((max_lon - self.bbox[0]) / self.pixel_lon)))
+
+    def _read(self, window):
+        """Copy raster values to float32 with nodata as NaN"""
+        values = np.asarray(window, dtype=np.float32)
+        if self.nodata is not None:
+            values = np.where(values == np.float32(self.nodata), np.float32(np.nan), values)
+        return values
+
+    def _river_level(self):
+        """Low percentile of a strided sample of the raster, standing in for the river surface"""
+        step = max(1, int(math.sqrt(self.height * self.width / 1e6)))
+        sample = self._read(self.elevation[::step, ::step])
+        if not np.isfinite(sample).any():
+            return 0.0
+        return float(np.nanpercentile(sample, 2))
+
+def _totals(tile, rows, columns, mask, steep_slope):
+    """(pixels, elevation sum, min, max, slope sum, steep km2, flood-prone km2, area km2) over valid pixels"""
+    elevation = tile.elevation[rows, columns]
+    valid = np.isfinite(elevation)
+    if mask is not None:
+        valid &= mask
+    pixels = int(np.count_nonzero(valid))
+    if not pixels:
+        return (0, 0.0, np.inf, -np.inf, 0.0, 0.0, 0.0, 0.0)
+    values = elevation[valid]
+    slopes = tile.slope[rows, columns][valid]
+    return (pixels, float(values.sum(dtype=np.float64)), float(values.min()), float(values.max()),
+            float(np.nansum(slopes, dtype=np.float64)),
+            int(np.count_nonzero(slopes > steep_slope)) * tile.pixel_km2,
+            int(np.count_nonzero(tile.flood_prone[rows, columns][valid])) * tile.pixel_km2,
+            pixels * tile.pixel_km2)
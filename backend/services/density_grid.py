@@ -0,0 +1,115 @@
+import io
+import math
+import numpy as np
+from services.geo import METRES_PER_DEGREE_LAT, METRES_PER_DEGREE_LON
+
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+MIN_DISC_POINTS = 16
+MAX_DISC_POINTS = 1024
+# PNG colour ramp: quantized value -> RGBA, transparent at zero through blue, green and yellow to red
+RAMP_VALUES = [0, 1, 64, 128, 192, 255]
+RAMP_COLOURS = [(0, 0, 255, 0), (0, 0, 255, 64), (0, 200, 255, 128), (0, 255, 0, 170), (255, 255, 0, 210), (255, 0, 0, 240)]
+
+def disc_offsets(count):
+    """count points spread evenly over the unit disc (a sunflower pattern): (dx, dy) arrays"""
+    index = np.arange(count)
+    radius = np.sqrt((index + 0.5) / count)
+    angle = index * GOLDEN_ANGLE
+    return radius * np.cos(angle), radius * np.sin(angle)
+
+def ramp_palette():
+    """256 x 4 uint8 RGBA lookup table for quantized densities"""
+    values = np.arange(256)
+    return np.stack([np.interp(values, RAMP_VALUES, [colour[channel] for colour in RAMP_COLOURS])
+                     for channel in range(4)], axis=1).round().astype(np.uint8)
+
+class DensityGrid:
+    """Crowd occupancy binned into square cells over a viewport, at a few fixed cell sizes
+
+    Each level is one grid anchored at (0, 0) degrees, with the longitude
+    step fixed at reference_lat, so a cell stays put whichever viewport asks
+    for it. A zone's occupants are spread evenly over a disc whose area holds
+    its capacity at design_density people/m2, sampled as points and binned
+    with one bincount. Grids never exceed max_cells a side: a viewport too
+    big for the requested level gets the next coarser one.
+    """
+
+    def __init__(self, levels, reference_lat, design_density=2.0, max_cells=256, full_scale=4.0):
+        self.levels = sorted(levels)
+        self.lon_metres = METRES_PER_DEGREE_LON * math.cos(math.radians(reference_lat))
+        self.design_density = design_density
+        self.max_cells = max_cells
+        self.full_scale = full_scale  # People/m2 that quantizes to 255
+        self.palette = ramp_palette()
+
+    def radii(self, capacity):
+        """Disc radius in metres of zones with the given capacities"""
+        return np.sqrt(np.asarray(capacity, dtype=np.float64) / (self.design_density * math.pi))
+
+    def extent(self, lats, lons, radii):
+        """Bounding box [min_lon, min_lat, max_lon, max_lat] of every zone's disc"""
+        if len(lats) == 0:
+            return None
+        lat_pad, lon_pad = radii / METRES_PER_DEGREE_LAT, radii / self.lon_metres
+        return [float((lons - lon_pad).min()), float((lats - lat_pad).min()),
+                float((lons + lon_pad).max()), float((lats + lat_pad).max())]
+
+    def level_for(self, bbox, cell_m=None):
+        """Cell size for bbox: cell_m (or the finest level) coarsened until the grid fits, or None if none does"""
+        if cell_m is not None and cell_m not in self.levels:
+            raise ValueError(f"Unknown heatmap level {cell_m}; available: {self.levels}")
+        for level in self.levels[self.levels.index(cell_m) if cell_m is not None else 0:]:
+            columns, rows = self._window(bbox, level)[1:]
+            if columns <= self.max_cells and rows <= self.max_cells:
+                return level
+        return None
+
+    def rasterize(self, bbox, cell_m, lats, lons, occupants, radii):
+        """People/m2 per cell over bbox, north row first: (values, snapped bbox)
+
+        The bbox is widened to whole cells; the returned one is what the
+        values cover.
+        """
+        (first_column, first_row), columns, rows = self._window(bbox, cell_m)
+        lat_step, lon_step = cell_m / METRES_PER_DEGREE_LAT, cell_m / self.lon_metres
+        snapped = [first_column * lon_step, first_row * lat_step,
+                   (first_column + columns) * lon_step, (first_row + rows) * lat_step]
+
+        # Only zones whose disc reaches the window contribute points
+        lat_pad, lon_pad = radii / METRES_PER_DEGREE_LAT, radii / self.lon_metres
+        near = ((lats + lat_pad >= snapped[1]) & (lats - lat_pad <= snapped[3])
+                & (lons + lon_pad >= snapped[0]) & (lons - lon_pad <= snapped[2]) & (occupants > 0))
+        values = np.zeros(rows * columns)
+        if near.any():
+            # Enough points that neighbouring ones sit within half a cell of each other
+            count = int(np.clip(math.ceil(4 * math.pi * float(radii[near].max()) ** 2 / cell_m ** 2),
+                                MIN_DISC_POINTS, MAX_DISC_POINTS))
+            dx, dy = disc_offsets(count)
+            point_lats = lats[near, None] + lat_pad[near, None] * dy
+            point_lons = lons[near, None] + lon_pad[near, None] * dx
+            row = first_row + rows - 1 - np.floor(point_lats / lat_step).astype(np.int64)
+            column = np.floor(point_lons / lon_step).astype(np.int64) - first_column
+            inside = (row >= 0) & (row < rows) & (column >= 0) & (column < columns)
+            weights = np.broadcast_to((occupants[near] / count)[:, None], inside.shape)
+            values = np.bincount((row * columns + column)[inside], weights=weights[inside], minlength=rows * columns)
+        return (values / cell_m ** 2).reshape(rows, columns).astype(np.float32), snapped
+
+    def quantize(self, values):
+        """uint8 cells, 255 at full_scale people/m2 and above"""
+        return np.clip(np.rint(values / self.full_scale * 255), 0, 255).astype(np.uint8)
+
+    def to_png(self, values):
+        """Colour-ramped RGBA PNG of a raster, transparent where nobody is"""
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.fromarray(self.palette[self.quantize(values)], 'RGBA').save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue()
+
+    def _window(self, bbox, cell_m):
+        """((first column, first row), columns, rows) of the cells covering bbox at a level"""
+        lat_step, lon_step = cell_m / METRES_PER_DEGREE_LAT, cell_m / self.lon_metres
+        first_column, first_row = math.floor(bbox[0] / lon_step), math.floor(bbox[1] / lat_step)
+        columns = max(1, math.ceil(bbox[2] / lon_step) - first_column)
+        rows = max(1, math.ceil(bbox[3] / lat_step) - first_row)
+        return (first_column, first_row), columns, rows
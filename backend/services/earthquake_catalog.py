@@ -0,0 +1,202 @@
+import threading
+import time
+from datetime import datetime
+import numpy as np
+from services.geo import haversine_km, top_n_indices
+from services.spatial_index import GridIndex
+
+# Feature properties read by the catalog and its dashboard records
+RECORD_PROPERTIES = ('mag', 'place', 'time', 'updated', 'type', 'alert', 'tsunami', 'significance',
+                     'felt', 'cdi', 'mmi', 'url', 'detail', 'status')
+
+class EarthquakeCatalog:
+    """In-memory earthquake catalog keyed by USGS event id over a rolling time window"""
+
+    def __init__(self, window_hours, cell_degrees=1.0):
+        self.window_ms = int(window_hours * 3600 * 1000)
+        self.lock = threading.Lock()
+        self.events = {}
+        self.index = GridIndex(cell_degrees)
+        self.columns = None
+        self.stats = {'inserted': 0, 'updated': 0, 'unchanged': 0, 'expired': 0}
+
+    def upsert(self, features):
+        """Add new events and replace those whose `updated` timestamp changed"""
+        counts = {'inserted': 0, 'updated': 0, 'unchanged': 0}
+        changed = []
+        with self.lock:
+            events = self.events
+            for feature in features:
+                properties = feature['properties']
+                existing = events.get(feature['id'])
+                if existing is not None and existing['updated'] == properties['updated']:
+                    counts['unchanged'] += 1
+                    continue
+                coordinates = (feature.get('geometry') or {}).get('coordinates') or ()
+                if len(coordinates) < 2:
+                    continue
+                events[feature['id']] = {
+                    'feature': feature,
+                    'updated': properties['updated'],
+                    'time': properties['time'],
+                    'lon': coordinates[0],
+                    'lat': coordinates[1],
+                    'depth': coordinates[2] if len(coordinates) > 2 and coordinates[2] is not None else 0,
+                    'magnitude': properties.get('mag') or 0,
+                    'record': None
+                }
+                changed.append(feature['id'])
+                counts['inserted' if existing is None else 'updated'] += 1
+
+            if changed:
+                self.columns = None
+                self.index.insert_many(changed, [events[event_id]['lat'] for event_id in changed],
+                                       [events[event_id]['lon'] for event_id in changed])
+            for key, value in counts.items():
+                self.stats[key] += value
+        self.expire()
+        return counts
+
+    def expire(self, now_ms=None):
+        """Drop events older than the window"""
+        cutoff = (now_ms or time.time() * 1000) - self.window_ms
+        with self.lock:
+            stale = [event_id for event_id, event in self.events.items() if event['time'] < cutoff]
+            for event_id in stale:
+                del self.events[event_id]
+                self.index.remove(event_id)
+            if stale:
+                self.columns = None
+                self.stats['expired'] += len(stale)
+        return len(stale)
+
+    def query(self, lat=None, lon=None, radius_km=None, min_magnitude=None, since_ms=None, limit=20):
+        """Most recent events matching a radius, magnitude and time filter: (records, total matches)"""
+        with self.lock:
+            if lat is not None and lon is not None and radius_km is not None:
+                # Only the grid cells overlapping the radius are scanned
+                ids, distances = self.index.radius(lat, lon, radius_km)
+                times, magnitudes = self._attributes(ids)
+            else:
+                columns = self._columns()
+                ids, times, magnitudes = columns['ids'], columns['times'], columns['magnitudes']
+                distances = None
+                if lat is not None and lon is not None:
+                    distances = haversine_km(lat, lon, columns['lats'], columns['lons'])
+
+            mask = np.ones(ids.size, dtype=bool)
+            if min_magnitude is not None:
+                mask &= magnitudes >= min_magnitude
+            if since_ms is not None:
+                mask &= times >= since_ms
+
+            matches = np.flatnonzero(mask)
+            recent = matches[top_n_indices(times[matches], limit)]
+            records = [self._record(ids[i], None if distances is None else distances[i]) for i in recent]
+            return records, int(matches.size)
+
+    def nearest(self, lat, lon, k=10, min_magnitude=None):
+        """The k events closest to a point, closest first"""
+        with self.lock:
+            if min_magnitude is None:
+                ids, distances = self.index.nearest(lat, lon, k)
+            else:
+                # Widen the search until enough events pass the magnitude filter
+                wanted = k
+                while True:
+                    ids, distances = self.index.nearest(lat, lon, wanted)
+                    _, magnitudes = self._attributes(ids)
+                    keep = magnitudes >= min_magnitude
+                    if keep.sum() >= k or ids.size < wanted:
+                        ids, distances = ids[keep][:k], distances[keep][:k]
+                        break
+                    wanted *= 4
+            return [self._record(event_id, distance) for event_id, distance in zip(ids, distances)]
+
+    def within_bbox(self, min_lon, min_lat, max_lon, max_lat, min_magnitude=None, limit=20):
+        """Most recent events inside a bounding box: (records, total matches)"""
+        with self.lock:
+            ids = self.index.bbox(min_lon, min_lat, max_lon, max_lat)
+            times, magnitudes = self._attributes(ids)
+            matches = np.flatnonzero(magnitudes >= min_magnitude) if min_magnitude is not None else np.arange(ids.size)
+            recent = matches[top_n_indices(times[matches], limit)]
+            return [self._record(ids[i], None) for i in recent], int(matches.size)
+
+    def snapshot(self):
+        """Columnar arrays of every event (ids, updated, lats, lons, depths, magnitudes, times); treat as read-only"""
+        with self.lock:
+            return self._columns()
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, events=len(self.events), window_hours=self.window_ms / 3600000,
+                        index_cells=len(self.index.cells))
+
+    def __len__(self):
+        return len(self.events)
+
+    def _columns(self):
+        """Columnar view of the catalog, rebuilt only after the catalog changed"""
+        if self.columns is None:
+            events = list(self.events.values())
+            count = len(events)
+            self.columns = {
+                'ids': np.array(list(self.events.keys()), dtype=object),
+                'updated': np.fromiter((event['updated'] for event in events), np.int64, count),
+                'lons': np.fromiter((event['lon'] for event in events), np.float64, count),
+                'lats': np.fromiter((event['lat'] for event in events), np.float64, count),
+                'depths': np.fromiter((event['depth'] for event in events), np.float64, count),
+                'times': np.fromiter((event['time'] for event in events), np.int64, count),
+                'magnitudes': np.fromiter((event['magnitude'] for event in events), np.float64, count)
+            }
+        return self.columns
+
+    def _attributes(self, ids):
+        """Times and magnitudes for a set of event ids"""
+        events = [self.events[event_id] for event_id in ids]
+        count = len(events)
+        return (np.fromiter((event['time'] for event in events), np.int64, count),
+                np.fromiter((event['magnitude'] for event in events), np.float64, count))
+
+    def _record(self, event_id, distance_km):
+        """Dashboard record for one event, built on first use"""
+        event = self.events[event_id]
+        if event['record'] is None:
+            event['record'] = _build_record(event['feature'])
+        record = dict(event['record'])
+        if distance_km is not None:
+            record['distance_km'] = round(float(distance_km), 1)
+        return record
+
+def slim_feature(feature):
+    """Copy of a USGS feature keeping only the fields the catalog uses"""
+    properties = feature.get('properties') or {}
+    return {
+        'id': feature.get('id'),
+        'properties': {key: properties[key] for key in RECORD_PROPERTIES if key in properties},
+        'geometry': {'coordinates': ((feature.get('geometry') or {}).get('coordinates') or [])[:3]}
+    }
+
+def _build_record(feature):
+    """Build the dashboard record for one USGS feature"""
+    properties = feature['properties']
+    geometry = feature['geometry']
+    return {
+        'id': feature['id'],
+        'magnitude': properties.get('mag', 0),
+        'place': properties.get('place', 'Unknown location'),
+        'time': datetime.fromtimestamp(properties['time'] / 1000).isoformat(),
+        'updated': datetime.fromtimestamp(properties['updated'] / 1000).isoformat(),
+        'coordinates': geometry['coordinates'][:2],  # [longitude, latitude]
+        'depth': geometry['coordinates'][2] if len(geometry['coordinates']) > 2 else 0,
+        'type': properties.get('type', 'earthquake'),
+        'alert': properties.get('alert', None),
+        'tsunami': properties.get('tsunami', 0),
+        'significance': properties.get('significance', 0),
+        'felt': properties.get('felt', None),
+        'cdi': properties.get('cdi', None),
+        'mmi': properties.get('mmi', None),
+        'url': properties.get('url', ''),
+        'detail': properties.get('detail', ''),
+        'status': properties.get('status', 'reviewed')
+    }
@@ -1,55 +1,195 @@
-import requests
-import json
 from datetime import datetime, timedelta
 import random
+import numpy as np
 from config import Config
+from services.http_client import get_http_client
+from services.single_flight import SingleFlight
+from services.earthquake_catalog import EarthquakeCatalog, slim_feature
+from services.geo import haversine_km
+from services.geojson_stream import FeatureStream
+from services.ground_motion import GroundMotionEstimator
 
 class EarthquakeService:
     def __init__(self):
         self.config = Config()
+        self.http = get_http_client()
+        self.flight = SingleFlight()
+        self.last_good = None
+        self.catalog = EarthquakeCatalog(self.config.EARTHQUAKE_CATALOG_WINDOW_HOURS,
+                                         self.config.EARTHQUAKE_INDEX_CELL_DEGREES)
+        self.feed_etag = None
+        self.feed_last_modified = None
+        self.feed_fingerprint = None
+        self.feed_stats = {'fetches': 0, 'parsed': 0, 'not_modified': 0, 'unchanged': 0, 'malformed': 0}
+        self.last_stream_stats = None
+        self.ground_motion = None
         self.usgs_base_url = "https://earthquake.usgs.gov/earthquakes/feed/v1.0"
         
     def get_recent_earthquakes(self):
         """Get recent earthquakes from USGS"""
-        try:
-            # Try to get real data from USGS
-            url = f"{self.usgs_base_url}/summary/all_day.geojson"
-            response = requests.get(url, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return self._format_earthquake_data(data)
-            else:
-                return self._get_mock_earthquake_data()
-                
-        except Exception as e:
-            print(f"Error fetching earthquake data: {e}")
-            return self._get_mock_earthquake_data()
+        return self.flight.do(('get_recent_earthquakes',), self._fetch_recent_earthquakes)
     
     def get_earthquakes_near_location(self, lat, lon, radius_km=500):
-        """Get earthquakes near a specific location"""
-        try:
-            url = f"{self.usgs_base_url}/query"
-            params = {
-                'format': 'geojson',
-                'starttime': (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d'),
-                'endtime': datetime.now().strftime('%Y-%m-%d'),
-                'latitude': lat,
-                'longitude': lon,
-                'maxradiuskm': radius_km,
-                'minmagnitude': 2.0
-            }
+        """Get earthquakes of the last 7 days near a specific location"""
+        if not len(self.catalog):
+            # Nothing ingested yet: load the feed once instead of querying USGS per location
+            self.get_recent_earthquakes()
+        if not len(self.catalog):
+            return self._get_mock_earthquake_data()
+        since = datetime.now() - timedelta(days=7)
+        return self.query_earthquakes(lat, lon, radius_km, min_magnitude=2.0, since=since)
+    
+    def query_earthquakes(self, lat=None, lon=None, radius_km=None, min_magnitude=None, since=None, limit=20):
+        """Answer recent, radius and magnitude queries from the local catalog"""
+        since_ms = int(since.timestamp() * 1000) if since else None
+        earthquakes, total_count = self.catalog.query(lat, lon, radius_km, min_magnitude, since_ms, limit)
+        return {
+            'earthquakes': earthquakes,
+            'total_count': total_count,
+            'last_updated': datetime.now().isoformat()
+        }
+    
+    def nearest_earthquakes(self, lat, lon, k=10, min_magnitude=None):
+        """Find the k catalog events closest to a location"""
+        return {
+            'earthquakes': self.catalog.nearest(lat, lon, k, min_magnitude),
+            'last_updated': datetime.now().isoformat()
+        }
+    
+    def earthquakes_in_bbox(self, min_lon, min_lat, max_lon, max_lat, min_magnitude=None, limit=20):
+        """Find the most recent catalog events inside a bounding box"""
+        earthquakes, total_count = self.catalog.within_bbox(min_lon, min_lat, max_lon, max_lat, min_magnitude, limit)
+        return {
+            'earthquakes': earthquakes,
+            'total_count': total_count,
+            'last_updated': datetime.now().isoformat()
+        }
+    
+    def set_intensity_sites(self, sites):
+        """Set the crowd zones and assembly points predicted shaking is reported for"""
+        if self.ground_motion is None:
+            self.ground_motion = GroundMotionEstimator(sites)
+        else:
+            self.ground_motion.set_sites(sites)
+    
+    def get_intensity_estimate(self):
+        """Predicted shaking at every site from catalog events inside the risk window"""
+        if self.ground_motion is None:
+            return None
+        since = datetime.now() - timedelta(hours=self.config.EARTHQUAKE_RISK_WINDOW_HOURS)
+        return self.ground_motion.estimate(self.catalog.snapshot(), int(since.timestamp() * 1000))
+    
+    def recent_earthquakes_request(self):
+        """Describe the USGS summary feed request, made conditional once we hold a parsed copy"""
+        headers = {}
+        if self.last_good is not None:
+            if self.feed_etag:
+                headers['If-None-Match'] = self.feed_etag
+            if self.feed_last_modified:
+                headers['If-Modified-Since'] = self.feed_last_modified
+        return {
+            'method': 'GET',
+            'url': f"{self.usgs_base_url}/summary/{self.config.USGS_FEED}.geojson",
+            'headers': headers,
+            'timeout': 10
+        }
+    
+    def feed_stream(self):
+        """Start a streaming parse of one feed response; feed it the body chunks"""
+        return FeatureStream(self._select_features)
+    
+    def parse_recent_earthquakes(self, status_code, stream, headers=None):
+        """Build earthquake data from a streamed feed response (status_code is None if the request failed)"""
+        if status_code is not None:
+            self.feed_stats['fetches'] += 1
+        
+        # Feed not modified since our copy: skip parsing, but let events age out of the window
+        if status_code == 304 and self.last_good is not None:
+            self.feed_stats['not_modified'] += 1
+            return self._refresh_from_catalog()
+        
+        if status_code == 200:
+            try:
+                features = stream.close()
+            except ValueError as e:
+                print(f"Error parsing earthquake feed: {e}")
+                self.feed_stats['malformed'] += 1
+                return self._fallback_earthquakes()
+            headers = headers or {}
+            self.feed_etag = headers.get('ETag')
+            self.feed_last_modified = headers.get('Last-Modified')
+            self.last_stream_stats = dict(stream.stats)
+            
+            # Same bytes as last time (e.g. server without validators): nothing new to upsert
+            if stream.fingerprint == self.feed_fingerprint and self.last_good is not None:
+                self.feed_stats['unchanged'] += 1
+                return self._refresh_from_catalog()
             
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                return self._format_earthquake_data(data)
-            else:
-                return self._get_mock_earthquake_data()
-                
+            self.catalog.upsert(features)
+            self.last_good = self._recent_near_mahakumbh()
+            self.feed_fingerprint = stream.fingerprint
+            self.feed_stats['parsed'] += 1
+            return self.last_good
+        return self._fallback_earthquakes()
+    
+    def get_feed_stats(self):
+        """Get how many feed refreshes were skipped because nothing changed"""
+        return dict(
+            self.feed_stats,
+            catalog=self.catalog.get_stats(),
+            skipped_cycles=self.feed_stats['not_modified'] + self.feed_stats['unchanged'],
+            last_stream=self.last_stream_stats,
+            etag=self.feed_etag,
+            last_modified=self.feed_last_modified
+        )
+    
+    def _fetch_recent_earthquakes(self):
+        """Fetch recent earthquakes from the USGS summary feed"""
+        try:
+            stream = self.feed_stream()
+            with self.http.stream(**self.recent_earthquakes_request()) as response:
+                if response.status_code == 200:
+                    for chunk in response.iter_content(chunk_size=self.config.FEED_CHUNK_SIZE):
+                        stream.feed(chunk)
+            return self.parse_recent_earthquakes(response.status_code, stream, response.headers)
         except Exception as e:
-            print(f"Error fetching location-specific earthquake data: {e}")
-            return self._get_mock_earthquake_data()
+            print(f"Error fetching earthquake data: {e}")
+            return self._fallback_earthquakes()
+    
+    def _select_features(self, features):
+        """Drop features outside the ingest radius or below the ingest magnitude and trim the rest"""
+        radius_km = self.config.EARTHQUAKE_INGEST_RADIUS_KM
+        min_magnitude = self.config.EARTHQUAKE_INGEST_MIN_MAGNITUDE
+        if radius_km > 0 or min_magnitude > 0:
+            keep = np.ones(len(features), dtype=bool)
+            if min_magnitude > 0:
+                magnitudes = np.array([(feature.get('properties') or {}).get('mag') or 0 for feature in features],
+                                      dtype=np.float64)
+                keep &= magnitudes >= min_magnitude
+            if radius_km > 0:
+                points = np.array([((feature.get('geometry') or {}).get('coordinates') or [np.nan, np.nan])[:2]
+                                   for feature in features], dtype=np.float64)
+                distances = haversine_km(self.config.MAHAKUMBH_LAT, self.config.MAHAKUMBH_LON, points[:, 1], points[:, 0])
+                keep &= distances <= radius_km
+            features = [feature for feature, kept in zip(features, keep) if kept]
+        return [slim_feature(feature) for feature in features]
+    
+    def _fallback_earthquakes(self):
+        """Last good feed result, or mock data if there never was one; flagged so it is not cached as fresh"""
+        return dict(self.last_good or self._get_mock_earthquake_data(), fallback=True)
+    
+    def _refresh_from_catalog(self):
+        """Expire old events and rebuild the result from the catalog as it stands"""
+        self.catalog.expire()
+        self.last_good = self._recent_near_mahakumbh()
+        return self.last_good
+    
+    def _recent_near_mahakumbh(self):
+        """Last 20 catalog events within the configured radius of Mahakumbh, with predicted shaking"""
+        data = self.query_earthquakes(self.config.MAHAKUMBH_LAT, self.config.MAHAKUMBH_LON,
+                                      self.config.EARTHQUAKE_RADIUS_KM)
+        data['intensity'] = self.get_intensity_estimate()
+        return data
     
     def get_seismic_risk_assessment(self):
         """Get seismic risk assessment for the area"""
@@ -83,64 +223,6 @@ class EarthquakeService:
             print(f"Error generating seismic risk assessment: {e}")
             return {}
     
-    def _format_earthquake_data(self, data):
-        """Format earthquake data from USGS response"""
-        earthquakes = []
-        
-        for feature in data.get('features', []):
-            properties = feature['properties']
-            geometry = feature['geometry']
-            
-            earthquake = {
-                'id': feature['id'],
-                'magnitude': properties.get('mag', 0),
-                'place': properties.get('place', 'Unknown location'),
-                'time': datetime.fromtimestamp(properties['time'] / 1000).isoformat(),
-                'updated': datetime.fromtimestamp(properties['updated'] / 1000).isoformat(),
-                'coordinates': geometry['coordinates'][:2],  # [longitude, latitude]
-                'depth': geometry['coordinates'][2] if len(geometry['coordinates']) > 2 else 0,
-                'type': properties.get('type', 'earthquake'),
-                'alert': properties.get('alert', None),
-                'tsunami': properties.get('tsunami', 0),
-                'significance': properties.get('significance', 0),
-                'felt': properties.get('felt', None),
-                'cdi': properties.get('cdi', None),
-                'mmi': properties.get('mmi', None),
-                'url': properties.get('url', ''),
-                'detail': properties.get('detail', ''),
-                'status': properties.get('status', 'reviewed')
-            }
-            
-            # Filter earthquakes near Mahakumbh location
-            if self._is_near_mahakumbh(earthquake['coordinates']):
-                earthquakes.append(earthquake)
-        
-        # Sort by time (most recent first)
-        earthquakes.sort(key=lambda x: x['time'], reverse=True)
-        
-        return {
-            'earthquakes': earthquakes[:20],  # Return last 20 earthquakes
-            'total_count': len(earthquakes),
-            'last_updated': datetime.now().isoformat()
-        }
-    
-    def _is_near_mahakumbh(self, coordinates):
-        """Check if earthquake coordinates are near Mahakumbh location"""
-        if not coordinates or len(coordinates) < 2:
-            return False
-            
-        lon, lat = coordinates[0], coordinates[1]
-        mahakumbh_lat, mahakumbh_lon = self.config.MAHAKUMBH_LAT, self.config.MAHAKUMBH_LON
-        
-        # Calculate distance (simple approximation)
-        lat_diff = abs(lat - mahakumbh_lat)
-        lon_diff = abs(lon - mahakumbh_lon)
-        
-        # Rough distance calculation (1 degree ≈ 111 km)
-        distance_km = ((lat_diff ** 2 + lon_diff ** 2) ** 0.5) * 111
-        
-        return distance_km <= 1000  # Within 1000 km
-    
     def _get_mock_earthquake_data(self):
         """Generate mock earthquake data for testing"""
         earthquakes = []
@@ -189,5 +271,20 @@ class EarthquakeService:
         return {
             'earthquakes': earthquakes,
             'total_count': len(earthquakes),
+            'intensity': self._estimate_from_records(earthquakes),
             'last_updated': datetime.now().isoformat()
         }
+    
+    def _estimate_from_records(self, earthquakes):
+        """Predicted shaking from dashboard records that are not in the catalog (mock data)"""
+        if self.ground_motion is None:
+            return None
+        events = {
+            'ids': np.array([earthquake['id'] for earthquake in earthquakes], dtype=object),
+            'updated': [earthquake['updated'] for earthquake in earthquakes],
+            'lats': np.array([earthquake['coordinates'][1] for earthquake in earthquakes], dtype=np.float64),
+            'lons': np.array([earthquake['coordinates'][0] for earthquake in earthquakes], dtype=np.float64),
+            'depths': np.array([earthquake['depth'] for earthquake in earthquakes], dtype=np.float64),
+            'magnitudes': np.array([earthquake['magnitude'] for earthquake in earthquakes], dtype=np.float64)
+        }
+        return self.ground_motion.estimate(events, cache=False)
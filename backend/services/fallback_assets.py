@@ -0,0 +1,117 @@
+import base64
+import hashlib
+import io
+import random
+import threading
+from collections import OrderedDict, namedtuple
+
+# Immutable view of one image: PNG bytes, the same bytes base64-encoded, and their SHA-256
+FallbackAsset = namedtuple('FallbackAsset', ['png', 'base64', 'hash'])
+
+MINIMAL_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
+)
+
+def make_asset(png):
+    return FallbackAsset(png, base64.b64encode(png), hashlib.sha256(png).hexdigest())
+
+class FallbackAssets:
+    """Fallback imagery loaded once and shared: the static image and one mock render per seed"""
+
+    def __init__(self, static_path, max_mock_seeds=8):
+        self.static_path = static_path
+        self.max_mock_seeds = max_mock_seeds
+        self.lock = threading.Lock()
+        self.minimal = make_asset(MINIMAL_PNG)
+        self.static = self._load_static()
+        self.static_rgba = None
+        self.mocks = OrderedDict()
+
+    def static_or_minimal(self):
+        """The static image, or a 1x1 PNG if it could not be loaded"""
+        return self.static or self.minimal
+
+    def mock(self, seed):
+        """The mock render for a seed, drawn on first use; the static image if PIL is unavailable"""
+        with self.lock:
+            asset = self.mocks.get(seed)
+            if asset is not None:
+                self.mocks.move_to_end(seed)
+                return asset
+        try:
+            png = render_mock_image(seed)
+        except Exception as e:
+            print(f"Error creating mock satellite image: {e}")
+            png = None
+        asset = make_asset(png) if png else self.static_or_minimal()
+        with self.lock:
+            self.mocks[seed] = asset
+            while len(self.mocks) > self.max_mock_seeds:
+                self.mocks.popitem(last=False)
+        return asset
+
+    def static_image(self):
+        """The static image decoded to RGBA once, for cropping tiles"""
+        with self.lock:
+            if self.static_rgba is None:
+                from PIL import Image
+                with Image.open(io.BytesIO(self.static_or_minimal().png)) as image:
+                    self.static_rgba = image.convert('RGBA')
+            return self.static_rgba
+
+    def get_stats(self):
+        with self.lock:
+            return {
+                'static_bytes': len(self.static.png) if self.static else 0,
+                'static_decoded': self.static_rgba is not None,
+                'mock_seeds': list(self.mocks)
+            }
+
+    def _load_static(self):
+        try:
+            with open(self.static_path, 'rb') as image_file:
+                return make_asset(image_file.read())
+        except OSError as e:
+            print(f"Static satellite image not available ({e}), using minimal PNG fallback")
+            return None
+
+def render_mock_image(seed):
+    """Draw a 256x256 terrain-like PNG, the same for the same seed; None without PIL"""
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        return None
+
+    rng = random.Random(seed)
+    width, height = 256, 256
+    image = Image.new('RGB', (width, height), color=(34, 139, 34))  # Forest green base
+    draw = ImageDraw.Draw(image)
+
+    # Water bodies
+    for _ in range(3):
+        x1, y1 = rng.randint(0, width), rng.randint(0, height)
+        draw.ellipse([x1, y1, x1 + rng.randint(40, 120), y1 + rng.randint(40, 120)], fill=(70, 130, 180))
+
+    # Urban areas
+    for _ in range(5):
+        x1, y1 = rng.randint(0, width), rng.randint(0, height)
+        draw.rectangle([x1, y1, x1 + rng.randint(20, 80), y1 + rng.randint(20, 80)], fill=(128, 128, 128))
+
+    # Roads
+    for _ in range(4):
+        x1, y1 = rng.randint(0, width), rng.randint(0, height)
+        draw.line([x1, y1, x1 + rng.randint(80, 200), y1 + rng.randint(80, 200)], fill=(64, 64, 64), width=6)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+_assets = {}
+_assets_lock = threading.Lock()
+
+def get_fallback_assets(static_path):
+    """Get the process-wide fallback assets for a static image"""
+    with _assets_lock:
+        if static_path not in _assets:
+            _assets[static_path] = FallbackAssets(static_path)
+        return _assets[static_path]
@@ -0,0 +1,218 @@
+import hashlib
+import io
+import math
+import os
+import tarfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+from services.geo import METRES_PER_DEGREE_LAT, METRES_PER_DEGREE_LON
+
+# Reflectance of the green, NIR and SWIR bands as 32-bit floats, NaN where there is no data
+WATER_BANDS_EVALSCRIPT = """
+                //VERSION=3
+                function setup() {
+                    return {
+                        input: [{ bands: ["B03", "B08", "B11", "dataMask"], units: "REFLECTANCE" }],
+                        output: [
+                            { id: "B03", bands: 1, sampleType: "FLOAT32" },
+                            { id: "B08", bands: 1, sampleType: "FLOAT32" },
+                            { id: "B11", bands: 1, sampleType: "FLOAT32" }
+                        ]
+                    };
+                }
+
+                function evaluatePixel(sample) {
+                    if (sample.dataMask == 0) {
+                        return { B03: [NaN], B08: [NaN], B11: [NaN] };
+                    }
+                    return { B03: [sample.B03], B08: [sample.B08], B11: [sample.B11] };
+                }
+            """
+WATER_BANDS = ['B03', 'B08', 'B11']
+
+# McFeeters (1996) NDWI uses NIR; Xu (2006) MNDWI swaps in SWIR, which separates water from built-up land better
+WATER_INDICES = {'ndwi': ('B03', 'B08'), 'mndwi': ('B03', 'B11')}
+
+def water_index(green, other):
+    """Normalised difference (green - other) / (green + other); NaN where undefined"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        index = np.subtract(green, other, dtype=np.float32)
+        index /= np.add(green, other, dtype=np.float32)
+    return index
+
+def read_band_tar(body):
+    """Float32 arrays by band name from a multi-response process API tar of single-band TIFFs"""
+    from PIL import Image
+
+    bands = {}
+    with tarfile.open(fileobj=io.BytesIO(body)) as archive:
+        for member in archive.getmembers():
+            if not member.isfile():
+                continue
+            with Image.open(archive.extractfile(member)) as image:
+                bands[os.path.splitext(os.path.basename(member.name))[0]] = np.asarray(image, dtype=np.float32)
+    return bands
+
+def split_bbox(bbox, resolution_m, tile_px):
+    """Split a lon/lat bbox into tiles of at most tile_px pixels a side: [(bbox, width, height)]"""
+    min_lon, min_lat, max_lon, max_lat = bbox
+    cos_lat = math.cos(math.radians((min_lat + max_lat) / 2))
+    width = max(1, math.ceil((max_lon - min_lon) * METRES_PER_DEGREE_LON * cos_lat / resolution_m))
+    height = max(1, math.ceil((max_lat - min_lat) * METRES_PER_DEGREE_LAT / resolution_m))
+    columns, rows = math.ceil(width / tile_px), math.ceil(height / tile_px)
+    lon_step, lat_step = (max_lon - min_lon) / columns, (max_lat - min_lat) / rows
+    tiles = []
+    for row in range(rows):
+        for column in range(columns):
+            tile_bbox = [min_lon + column * lon_step, max_lat - (row + 1) * lat_step,
+                         min_lon + (column + 1) * lon_step, max_lat - row * lat_step]
+            tiles.append((tile_bbox, math.ceil(width / columns), math.ceil(height / rows)))
+    return tiles
+
+class FloodEngine:
+    """Water masks from Sentinel-2 bands, summarised per crowd zone
+
+    Bboxes are processed one tile at a time so memory is bounded by the tile
+    size. Tile summaries are cached by the hash of the tile's band data and
+    whole results by the imagery hash, so unchanged imagery is never
+    recomputed. Growth is measured against the previous distinct imagery and
+    excess water against the smallest extent seen for each zone.
+    """
+
+    def __init__(self, zones, index='mndwi', threshold=0.0, zone_radius_m=500.0, max_tiles=256):
+        if index not in WATER_INDICES:
+            raise ValueError(f"Unknown water index {index!r}, expected one of {sorted(WATER_INDICES)}")
+        self.index = index
+        self.threshold = threshold
+        self.zone_radius_m = zone_radius_m
+        self.max_tiles = max_tiles
+        self.lock = threading.Lock()
+        self.set_zones(zones)
+
+    def set_zones(self, zones):
+        """Replace the zones water is measured in (drops every cached summary)"""
+        with self.lock:
+            self.zones = [{'id': zone['id'], 'name': zone['name'], 'coordinates': list(zone['coordinates'])}
+                          for zone in zones]
+            self.tile_summaries = OrderedDict()
+            self.results = OrderedDict()
+            self.previous = None
+            self.baseline = {}
+            self.stats = {'tiles_computed': 0, 'tiles_reused': 0, 'results_computed': 0, 'results_reused': 0}
+
+    def analyze_tile(self, tile_hash, body, tile_bbox):
+        """Water and valid pixel areas (km2) for a tile and each zone it overlaps"""
+        key = (tile_hash, tuple(round(value, 6) for value in tile_bbox))
+        with self.lock:
+            summary = self.tile_summaries.get(key)
+            if summary is not None:
+                self.tile_summaries.move_to_end(key)
+                self.stats['tiles_reused'] += 1
+                return summary
+
+        bands = read_band_tar(body)
+        green, other = WATER_INDICES[self.index]
+        index = water_index(bands[green], bands[other])
+        del bands
+        valid = np.isfinite(index)
+        water = valid & (index > self.threshold)
+        del index
+        summary = self._summarize_tile(tile_bbox, water, valid)
+
+        with self.lock:
+            self.tile_summaries[key] = summary
+            self.stats['tiles_computed'] += 1
+            while len(self.tile_summaries) > self.max_tiles:
+                self.tile_summaries.popitem(last=False)
+        return summary
+
+    def combine(self, imagery_hash, summaries):
+        """Merge tile summaries into the per-zone result for an imagery hash"""
+        with self.lock:
+            if imagery_hash in self.results:
+                self.stats['results_reused'] += 1
+                return self.results[imagery_hash]
+
+            water_km2 = sum(summary['water_km2'] for summary in summaries)
+            valid_km2 = sum(summary['valid_km2'] for summary in summaries)
+            zones = []
+            for zone in self.zones:
+                zone_water = sum(summary['zones'].get(zone['id'], (0.0, 0.0))[0] for summary in summaries)
+                zone_valid = sum(summary['zones'].get(zone['id'], (0.0, 0.0))[1] for summary in summaries)
+                fraction = zone_water / zone_valid if zone_valid else None
+                previous = self.previous['zones'].get(zone['id']) if self.previous else None
+                if fraction is not None:
+                    self.baseline[zone['id']] = min(self.baseline.get(zone['id'], fraction), fraction)
+                baseline = self.baseline.get(zone['id'])
+                zones.append({
+                    'zone_id': zone['id'],
+                    'name': zone['name'],
+                    'water_area_km2': round(zone_water, 4),
+                    'observed_area_km2': round(zone_valid, 4),
+                    'water_fraction': round(fraction, 4) if fraction is not None else None,
+                    'growth_km2': round(zone_water - previous, 4) if previous is not None else None,
+                    'excess_fraction': round(fraction - baseline, 4) if fraction is not None else None
+                })
+
+            result = {
+                'imagery_hash': imagery_hash,
+                'index': self.index,
+                'threshold': self.threshold,
+                'zone_radius_m': self.zone_radius_m,
+                'tiles': len(summaries),
+                'water_area_km2': round(water_km2, 4),
+                'water_fraction': round(water_km2 / valid_km2, 4) if valid_km2 else None,
+                'zones': zones,
+                'analysis_timestamp': datetime.now().isoformat()
+            }
+            self.previous = {'hash': imagery_hash,
+                             'zones': {zone['zone_id']: zone['water_area_km2'] for zone in zones}}
+            self.results[imagery_hash] = result
+            self.stats['results_computed'] += 1
+            while len(self.results) > 8:
+                self.results.popitem(last=False)
+            return result
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, index=self.index, zones=len(self.zones), cached_tiles=len(self.tile_summaries))
+
+    def _summarize_tile(self, tile_bbox, water, valid):
+        height, width = water.shape
+        min_lon, min_lat, max_lon, max_lat = tile_bbox
+        cos_lat = math.cos(math.radians((min_lat + max_lat) / 2))
+        pixel_w_m = (max_lon - min_lon) * METRES_PER_DEGREE_LON * cos_lat / width
+        pixel_h_m = (max_lat - min_lat) * METRES_PER_DEGREE_LAT / height
+        pixel_km2 = pixel_w_m * pixel_h_m / 1e6
+
+        zones = {}
+        for zone in self.zones:
+            lat, lon = zone['coordinates']
+            # Only the pixel window around the zone is masked, not the whole tile
+            row_centre = (max_lat - lat) * METRES_PER_DEGREE_LAT / pixel_h_m
+            column_centre = (lon - min_lon) * METRES_PER_DEGREE_LON * cos_lat / pixel_w_m
+            rows = slice(max(0, math.floor(row_centre - self.zone_radius_m / pixel_h_m)),
+                         min(height, math.ceil(row_centre + self.zone_radius_m / pixel_h_m)))
+            columns = slice(max(0, math.floor(column_centre - self.zone_radius_m / pixel_w_m)),
+                            min(width, math.ceil(column_centre + self.zone_radius_m / pixel_w_m)))
+            if rows.start >= rows.stop or columns.start >= columns.stop:
+                continue
+            dy = (np.arange(rows.start, rows.stop) + 0.5 - row_centre) * pixel_h_m
+            dx = (np.arange(columns.start, columns.stop) + 0.5 - column_centre) * pixel_w_m
+            inside = dy[:, None] ** 2 + dx[None, :] ** 2 <= self.zone_radius_m ** 2
+            zones[zone['id']] = (
+                float(np.count_nonzero(water[rows, columns] & inside)) * pixel_km2,
+                float(np.count_nonzero(valid[rows, columns] & inside)) * pixel_km2
+            )
+
+        return {
+            'water_km2': float(np.count_nonzero(water)) * pixel_km2,
+            'valid_km2': float(np.count_nonzero(valid)) * pixel_km2,
+            'zones': zones
+        }
+
+def imagery_hash(tile_hashes):
+    """Hash identifying a whole analysis from the hashes of its tiles, in order"""
+    return hashlib.sha256(''.join(tile_hashes).encode()).hexdigest()
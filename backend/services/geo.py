@@ -0,0 +1,21 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+METRES_PER_DEGREE_LAT = 110574.0
+METRES_PER_DEGREE_LON = 111320.0  # At the equator; scale by cos(latitude)
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance in km from one point to arrays of points (degrees)"""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlon = np.radians(np.asarray(lons, dtype=np.float64) - lon)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+def top_n_indices(values, n):
+    """Indices of the n largest values, largest first, without sorting the whole array"""
+    if values.size <= n:
+        return np.argsort(values)[::-1]
+    top = np.argpartition(values, values.size - n)[-n:]
+    return top[np.argsort(values[top])[::-1]]
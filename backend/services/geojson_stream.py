@@ -0,0 +1,135 @@
+import codecs
+import hashlib
+import json
+import re
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_decoder = json.JSONDecoder()
+
+class FeatureStream:
+    """Incremental GeoJSON FeatureCollection parser fed with raw body chunks
+
+    Features are decoded one at a time as their bytes arrive and handed to
+    `select`, which returns the (possibly trimmed) ones to keep, so only the
+    unparsed tail of the body and the kept features are ever held in memory.
+    """
+
+    def __init__(self, select=None):
+        self.select = select
+        self.features = []
+        self.digest = hashlib.sha256()
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.state = 'start'
+        self.key = None
+        self.stats = {'bytes': 0, 'seen': 0, 'kept': 0, 'max_buffer': 0}
+
+    def feed(self, chunk):
+        """Consume the next chunk of the response body"""
+        if not chunk:
+            return
+        self.digest.update(chunk)
+        self.stats['bytes'] += len(chunk)
+        self.buffer += self.decoder.decode(chunk)
+        self.stats['max_buffer'] = max(self.stats['max_buffer'], len(self.buffer))
+        self._parse(final=False)
+
+    def close(self):
+        """Finish parsing and return the kept features; raises ValueError on a truncated body"""
+        self.buffer += self.decoder.decode(b'', final=True)
+        self._parse(final=True)
+        if self.state != 'done':
+            raise ValueError(f"GeoJSON feed ended early (parser state {self.state})")
+        return self.features
+
+    @property
+    def fingerprint(self):
+        """SHA-256 of every byte fed so far"""
+        return self.digest.hexdigest()
+
+    def _parse(self, final):
+        buffer = self.buffer
+        pos = 0
+        batch = []
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos >= len(buffer) or self.state == 'done':
+                break
+            char = buffer[pos]
+            state = self.state
+
+            if state == 'start':
+                self._expect(char, '{')
+                pos += 1
+                self.state = 'key'
+            elif state in ('key', 'next_key'):
+                if char == '}' and (state == 'next_key' or self.key is None):
+                    pos += 1
+                    self.state = 'done'
+                    continue
+                if state == 'next_key':
+                    self._expect(char, ',')
+                    pos += 1
+                    self.state = 'key'
+                    continue
+                value, end = self._decode(buffer, pos, final)
+                if end is None:
+                    break
+                self.key = value
+                pos = end
+                self.state = 'colon'
+            elif state == 'colon':
+                self._expect(char, ':')
+                pos += 1
+                self.state = 'features' if self.key == 'features' else 'value'
+            elif state == 'value':
+                # Any other member (type, metadata, bbox) is small: decode and drop it
+                _, end = self._decode(buffer, pos, final)
+                if end is None:
+                    break
+                pos = end
+                self.state = 'next_key'
+            elif state == 'features':
+                self._expect(char, '[')
+                pos += 1
+                self.state = 'feature'
+            elif state in ('feature', 'next_feature'):
+                if char == ']':
+                    pos += 1
+                    self.state = 'next_key'
+                    continue
+                if state == 'next_feature':
+                    self._expect(char, ',')
+                    pos += 1
+                    self.state = 'feature'
+                    continue
+                feature, end = self._decode(buffer, pos, final)
+                if end is None:
+                    break
+                batch.append(feature)
+                pos = end
+                self.state = 'next_feature'
+
+        self.buffer = buffer[pos:]
+        if batch:
+            self.stats['seen'] += len(batch)
+            kept = self.select(batch) if self.select else batch
+            self.stats['kept'] += len(kept)
+            self.features.extend(kept)
+
+    def _decode(self, buffer, pos, final):
+        """Decode one JSON value at pos: (value, end), or (None, None) if it may continue in the next chunk"""
+        try:
+            value, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if final:
+                raise ValueError("Malformed GeoJSON feed")
+            return None, None
+        if end == len(buffer) and not final:
+            # A number at the very end of the buffer might still have more digits coming
+            return None, None
+        return value, end
+
+    def _expect(self, char, expected):
+        if char != expected:
+            raise ValueError(f"Malformed GeoJSON feed: expected {expected!r}, found {char!r}")
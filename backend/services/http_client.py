@@ -0,0 +1,142 @@
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from config import Config
+from services.circuit_breaker import get_breaker, is_failure_status
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTP adapter whose per-host connection pools report every new connection"""
+
+    def __init__(self, on_new_connection, **kwargs):
+        self.on_new_connection = on_new_connection
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self.on_new_connection),
+            'https': _counting_pool(HTTPSConnectionPool, self.on_new_connection)
+        }
+
+class HttpClient:
+    """Shared keep-alive HTTP transport for all upstream providers"""
+
+    def __init__(self, pool_connections=None, pool_maxsize=None):
+        self.config = Config()
+        self.pool_connections = pool_connections or self.config.HTTP_POOL_CONNECTIONS
+        self.pool_maxsize = pool_maxsize or self.config.HTTP_POOL_MAXSIZE
+        self.lock = threading.Lock()
+        self.host_stats = {}
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+            'User-Agent': 'mahakumbh-disaster-prediction/1.0'
+        })
+        adapter = PooledHTTPAdapter(
+            self._record_new_connection,
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=0
+        )
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, **kwargs):
+        """Send a GET request over a pooled connection"""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """Send a POST request over a pooled connection"""
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """Send a request over a pooled connection, failing fast while the host's circuit is open"""
+        breaker = self._breaker(url)
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except Exception:
+            breaker.record_failure()
+            raise
+        _settle(breaker, response)
+        return response
+
+    @contextmanager
+    def stream(self, method, url, **kwargs):
+        """Send a request and yield the response with its body unread; use as a context manager
+
+        The host's breaker is settled when the block exits, not when the headers
+        arrive: an error reading the body, or in the caller's handling of it,
+        counts as a failed call.
+        """
+        breaker = self._breaker(url)
+        try:
+            with self.session.request(method, url, stream=True, **kwargs) as response:
+                yield response
+        except Exception:
+            breaker.record_failure()
+            raise
+        _settle(breaker, response)
+
+    def get_stats(self):
+        """Get per-host request and connection counts"""
+        with self.lock:
+            hosts = {
+                host: {
+                    'requests': stats['requests'],
+                    'new_connections': stats['new_connections'],
+                    'reused_connections': max(0, stats['requests'] - stats['new_connections'])
+                }
+                for host, stats in self.host_stats.items()
+            }
+        return {
+            'pool_connections': self.pool_connections,
+            'pool_maxsize': self.pool_maxsize,
+            'hosts': hosts
+        }
+
+    def _breaker(self, url):
+        """The breaker for url's host, after checking that a call may go out now"""
+        host = urlsplit(url).hostname
+        breaker = get_breaker(host)
+        breaker.check()
+        self._increment(host, 'requests')
+        return breaker
+
+    def _record_new_connection(self, host):
+        """Count a TCP/TLS handshake to a host"""
+        self._increment(host, 'new_connections')
+
+    def _increment(self, host, counter):
+        with self.lock:
+            stats = self.host_stats.setdefault(host, {'requests': 0, 'new_connections': 0})
+            stats[counter] += 1
+
+def _settle(breaker, response):
+    if is_failure_status(response.status_code):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+def _counting_pool(base, on_new_connection):
+    """Build a connection pool class that calls `on_new_connection` for each new socket"""
+    class CountingConnectionPool(base):
+        def _new_conn(self):
+            on_new_connection(self.host)
+            return super()._new_conn()
+    return CountingConnectionPool
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_http_client():
+    """Get the process-wide HTTP client"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
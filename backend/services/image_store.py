@@ -0,0 +1,40 @@
+import hashlib
+import mmap
+import threading
+from collections import OrderedDict
+
+class ImageStore:
+    """Content-addressed in-memory store for rendered images, evicting the least recently used"""
+
+    def __init__(self, max_images=16):
+        self.max_images = max_images
+        self.lock = threading.Lock()
+        self.images = OrderedDict()
+        self.stats = {'puts': 0, 'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def put(self, image_bytes, image_hash=None):
+        """Store image bytes (or a read-only memory map) and return their SHA-256 hex digest"""
+        image_hash = image_hash or hashlib.sha256(image_bytes).hexdigest()
+        with self.lock:
+            self.stats['puts'] += 1
+            self.images[image_hash] = image_bytes if isinstance(image_bytes, (bytes, mmap.mmap)) else bytes(image_bytes)
+            self.images.move_to_end(image_hash)
+            while len(self.images) > self.max_images:
+                self.images.popitem(last=False)
+                self.stats['evictions'] += 1
+        return image_hash
+
+    def get(self, image_hash):
+        """Image bytes for a hash, or None if unknown or evicted"""
+        with self.lock:
+            image = self.images.get(image_hash)
+            if image is None:
+                self.stats['misses'] += 1
+                return None
+            self.images.move_to_end(image_hash)
+            self.stats['hits'] += 1
+            return image
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, images=len(self.images), bytes=sum(len(image) for image in self.images.values()))
@@ -0,0 +1,105 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+
+class ImageryDiskCache:
+    """Size-bounded on-disk LRU of rendered imagery that survives restarts
+
+    Entries are files named by their key; recency is the file mtime, so the
+    LRU order is rebuilt from the directory on startup. Reads are memory-mapped.
+    """
+
+    def __init__(self, directory, max_bytes, suffix='.png'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        self._load()
+
+    @staticmethod
+    def make_key(**parts):
+        """Stable key for a render from its normalized parameters"""
+        return hashlib.sha256(json.dumps(parts, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+    def get(self, key):
+        """Memory-mapped read-only contents for a key, or None"""
+        with self.lock:
+            if key not in self.entries:
+                self.stats['misses'] += 1
+                return None
+            path = self._path(key)
+            try:
+                with open(path, 'rb') as cached_file:
+                    contents = mmap.mmap(cached_file.fileno(), 0, access=mmap.ACCESS_READ)
+                os.utime(path)
+            except (OSError, ValueError) as e:
+                print(f"Error reading cached imagery {key}: {e}")
+                self.total_bytes -= self.entries.pop(key)
+                self.stats['misses'] += 1
+                return None
+            self.entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return contents
+
+    def put(self, key, contents):
+        """Write contents for a key atomically, then evict least recently used entries over the size limit"""
+        if len(contents) > self.max_bytes:
+            return
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, 'wb') as cached_file:
+                cached_file.write(contents)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Error caching imagery {key}: {e}")
+            return
+        with self.lock:
+            self.total_bytes += len(contents) - self.entries.pop(key, 0)
+            self.entries[key] = len(contents)
+            self.stats['writes'] += 1
+            self._evict()
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, entries=len(self.entries), bytes=self.total_bytes,
+                        max_bytes=self.max_bytes, directory=self.directory)
+
+    def _load(self):
+        """Rebuild the LRU order from what a previous run left on disk"""
+        if not os.path.isdir(self.directory):
+            return
+        found = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith('.tmp') and time.time() - os.path.getmtime(path) > 3600:
+                os.remove(path)  # Left behind by a crash mid-write
+            elif name.endswith(self.suffix):
+                stat = os.stat(path)
+                found.append((stat.st_mtime, name[:-len(self.suffix)], stat.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its size limit"""
+        while self.total_bytes > self.max_bytes and self.entries:
+            old_key, size = self.entries.popitem(last=False)
+            self.total_bytes -= size
+            self.stats['evictions'] += 1
+            try:
+                os.remove(self._path(old_key))
+            except OSError as e:
+                print(f"Error evicting cached imagery {old_key}: {e}")
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
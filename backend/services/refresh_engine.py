@@ -0,0 +1,114 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from config import Config
+
+class RefreshEngine:
+    """Fan out data source refreshes over a bounded worker pool"""
+
+    def __init__(self, publish, max_workers=None):
+        self.config = Config()
+        self.publish = publish
+        self.max_workers = max_workers or self.config.REFRESH_MAX_WORKERS
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='refresh')
+        self.sources = {}
+        self.in_flight = {}
+        self.lock = threading.Lock()
+        self.cycle_count = 0
+        self.last_cycle = {}
+
+    def register(self, name, fetch, deadline=None):
+        """Register a data source and the deadline (seconds) it gets per cycle"""
+        if deadline is None:
+            deadline = self.config.REFRESH_DEADLINES.get(name, self.config.REFRESH_DEFAULT_DEADLINE)
+        self.sources[name] = {'fetch': fetch, 'deadline': deadline}
+
+    def submit(self, name):
+        """Start a refresh of one source, or return None if it is still running"""
+        with self.lock:
+            running = self.in_flight.get(name)
+            if running and not running.done():
+                return None
+            future = self.executor.submit(self._run_source, name)
+            self.in_flight[name] = future
+            return future
+
+    def run_cycle(self, names=None):
+        """Refresh all (or the given) sources concurrently and return the cycle timing"""
+        names = list(names or self.sources.keys())
+        cycle_start = time.monotonic()
+        timings = {}
+        pending = {}
+
+        for name in names:
+            future = self.submit(name)
+            if future is None:
+                timings[name] = {'status': 'skipped', 'reason': 'previous refresh still running'}
+            else:
+                pending[future] = name
+
+        # Collect results as they complete, giving up on each source at its own deadline
+        while pending:
+            now = time.monotonic()
+            for future, name in list(pending.items()):
+                if now - cycle_start >= self.sources[name]['deadline']:
+                    timings[name] = {
+                        'status': 'timeout',
+                        'duration_ms': round((now - cycle_start) * 1000, 1),
+                        'deadline_s': self.sources[name]['deadline']
+                    }
+                    del pending[future]
+            if not pending:
+                break
+
+            next_deadline = min(self.sources[name]['deadline'] for name in pending.values())
+            done, _ = wait(list(pending), timeout=max(0, cycle_start + next_deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                timings[name] = future.result()
+
+        cycle_duration = time.monotonic() - cycle_start
+        timed = {name: t for name, t in timings.items() if 'duration_ms' in t}
+        critical_path = max(timed, key=lambda name: timed[name]['duration_ms']) if timed else None
+
+        self.cycle_count += 1
+        self.last_cycle = {
+            'cycle': self.cycle_count,
+            'started_at': datetime.fromtimestamp(time.time() - cycle_duration).isoformat(),
+            'duration_ms': round(cycle_duration * 1000, 1),
+            'critical_path': critical_path,
+            'sources': timings
+        }
+        return self.last_cycle
+
+    def get_status(self):
+        """Get engine configuration and the timing of the last cycle"""
+        with self.lock:
+            running = [name for name, future in self.in_flight.items() if not future.done()]
+        return {
+            'max_workers': self.max_workers,
+            'sources': {name: {'deadline_s': source['deadline']} for name, source in self.sources.items()},
+            'running': running,
+            'last_cycle': self.last_cycle
+        }
+
+    def shutdown(self):
+        """Stop accepting work and release the worker pool"""
+        self.executor.shutdown(wait=False)
+
+    def _run_source(self, name):
+        """Fetch one source and publish it as soon as it is ready"""
+        started = time.monotonic()
+        try:
+            data = self.sources[name]['fetch']()
+            self.publish(name, data)
+            status = {'status': 'ok'}
+        except Exception as e:
+            print(f"Error refreshing {name}: {e}")
+            status = {'status': 'error', 'error': str(e)}
+
+        status['duration_ms'] = round((time.monotonic() - started) * 1000, 1)
+        status['deadline_s'] = self.sources[name]['deadline']
+        return status
@@ -0,0 +1,120 @@
+import random
+import threading
+import time
+from datetime import datetime
+from config import Config
+
+class RefreshScheduler:
+    """Run each refresh engine source on its own interval with jitter"""
+
+    def __init__(self, engine):
+        self.config = Config()
+        self.engine = engine
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.completed = 0
+
+    def add_job(self, name, interval=None, jitter=None, run_now=True):
+        """Schedule a registered engine source every `interval` seconds (+/- jitter)"""
+        if interval is None:
+            interval = self.config.REFRESH_INTERVALS.get(name, self.config.REFRESH_INTERVAL)
+        if jitter is None:
+            jitter = interval * self.config.REFRESH_JITTER
+        job = {
+            'interval': interval,
+            'jitter': jitter,
+            'next_run': time.time(),
+            'started_at': None,
+            'last_run': None,
+            'last_status': None,
+            'last_error': None,
+            'last_duration_ms': None,
+            'late_ms': 0.0,
+            'overrun_ms': 0.0,
+            'runs': 0,
+            'failures': 0,
+            'skipped_overlaps': 0
+        }
+        if not run_now:
+            job['next_run'] += self._jittered(job)
+        self.jobs[name] = job
+
+    def tick(self):
+        """Start every due job that is not already running; return the names started"""
+        now = time.time()
+        started = []
+        with self.lock:
+            due = [name for name, job in self.jobs.items()
+                   if job['next_run'] <= now and job['started_at'] is None]
+
+        for name in due:
+            future = self.engine.submit(name)
+            with self.lock:
+                job = self.jobs[name]
+                if future is None:
+                    # Source is still in flight from another caller; never run it twice at once
+                    job['skipped_overlaps'] += 1
+                    job['next_run'] = now + self._jittered(job)
+                    continue
+                job['started_at'] = now
+                job['late_ms'] = round(max(0.0, now - job['next_run']) * 1000, 1)
+            future.add_done_callback(lambda f, name=name: self._on_done(name, f))
+            started.append(name)
+        return started
+
+    def pop_completed(self):
+        """Return how many jobs finished since the last call"""
+        with self.lock:
+            completed, self.completed = self.completed, 0
+            return completed
+
+    def get_status(self):
+        """Get next run time, last result and overrun for every job"""
+        now = time.time()
+        with self.lock:
+            return {
+                name: {
+                    'interval_s': job['interval'],
+                    'jitter_s': round(job['jitter'], 2),
+                    'next_run': datetime.fromtimestamp(job['next_run']).isoformat(),
+                    'seconds_until_next_run': round(max(0.0, job['next_run'] - now), 1),
+                    'running': job['started_at'] is not None,
+                    'last_run': job['last_run'],
+                    'last_status': job['last_status'],
+                    'last_error': job['last_error'],
+                    'last_duration_ms': job['last_duration_ms'],
+                    'late_ms': job['late_ms'],
+                    'overrun_ms': job['overrun_ms'],
+                    'runs': job['runs'],
+                    'failures': job['failures'],
+                    'skipped_overlaps': job['skipped_overlaps']
+                }
+                for name, job in self.jobs.items()
+            }
+
+    def _on_done(self, name, future):
+        """Record the outcome of a job and schedule its next run"""
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'status': 'error', 'error': str(e)}
+
+        finished = time.time()
+        with self.lock:
+            job = self.jobs[name]
+            duration = finished - job['started_at']
+            job['runs'] += 1
+            job['last_run'] = datetime.fromtimestamp(job['started_at']).isoformat()
+            job['last_status'] = result.get('status')
+            job['last_error'] = result.get('error')
+            job['last_duration_ms'] = round(duration * 1000, 1)
+            job['overrun_ms'] = round(max(0.0, duration - job['interval']) * 1000, 1)
+            if result.get('status') != 'ok':
+                job['failures'] += 1
+            job['next_run'] = job['started_at'] + self._jittered(job)
+            job['started_at'] = None
+            self.completed += 1
+
+    def _jittered(self, job):
+        """Interval with random jitter so sources don't line up on the same tick"""
+        return max(0.0, job['interval'] + random.uniform(-job['jitter'], job['jitter']))
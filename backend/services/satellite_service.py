@@ -1,52 +1,124 @@
-import requests
 import json
-import base64
+import hashlib
 from datetime import datetime, timedelta
 import random
-from config import Config
 import os
+import time
+import numpy as np
+from config import Config
+from services.http_client import get_http_client
+from services.single_flight import SingleFlight
+from services.image_store import ImageStore
+from services.fallback_assets import get_fallback_assets
+from services.scene_change import SceneChangeDetector
+from services.dem import DemRaster, open_dem
+from services.flood_engine import WATER_BANDS, WATER_BANDS_EVALSCRIPT, FloodEngine, imagery_hash, split_bbox
+from services.imagery_cache import ImageryDiskCache
+from services.tile_pyramid import TILE_SIZE, TilePyramid, crop_tile, tile_mercator_bounds
+
+TRUE_COLOR_EVALSCRIPT = """
+                //VERSION=3
+                function setup() {
+                    return {
+                        input: ["B02", "B03", "B04"],
+                        output: { bands: 3 }
+                    };
+                }
+                
+                function evaluatePixel(sample) {
+                    return [sample.B04, sample.B03, sample.B02];
+                }
+            """
+IMAGE_WIDTH = 512
+IMAGE_HEIGHT = 512
+CRS84 = "http://www.opengis.net/def/crs/OGC/1.3/CRS84"
+WEB_MERCATOR = "http://www.opengis.net/def/crs/EPSG/0/3857"
+
+_credentials_notice_shown = False  # The missing-credentials notice is printed once per process
 
 class SatelliteService:
     def __init__(self):
         self.config = Config()
+        self.http = get_http_client()
+        self.flight = SingleFlight()
+        self.last_good = None
+        self.images = ImageStore(self.config.SATELLITE_IMAGE_STORE_SIZE)
+        self.disk_cache = ImageryDiskCache(self.config.SATELLITE_CACHE_DIR,
+                                         int(self.config.SATELLITE_CACHE_MAX_MB * 2 ** 20))
+        self.tile_cache = ImageryDiskCache(self.config.SATELLITE_TILE_DIR,
+                                           int(self.config.SATELLITE_TILE_CACHE_MAX_MB * 2 ** 20))
+        self.band_cache = ImageryDiskCache(self.config.SATELLITE_BAND_DIR,
+                                           int(self.config.SATELLITE_BAND_CACHE_MAX_MB * 2 ** 20), suffix='.tar')
+        self.flood = FloodEngine([], index=self.config.FLOOD_WATER_INDEX, threshold=self.config.FLOOD_WATER_THRESHOLD,
+                                 zone_radius_m=self.config.FLOOD_ZONE_RADIUS_M)
+        self.scene = SceneChangeDetector(self.config.SATELLITE_CHANGE_THRESHOLD, self.config.SATELLITE_CHANGE_SIZE)
+        self.dem = self._load_dem()
+        self.fallback = get_fallback_assets(self.config.SATELLITE_STATIC_IMAGE)
+        self.fallback.mock(self.config.SATELLITE_MOCK_SEED)  # Drawn now so the first fallback is a lookup
+        self.pyramid = TilePyramid(self.default_bbox(), self.config.SATELLITE_TILE_MIN_ZOOM,
+                                   self.config.SATELLITE_TILE_MAX_ZOOM)
+        self.tile_failures = {}  # Sentinel tile key -> when its render may be retried
         self.access_token = None
         self.token_expiry = None
+        self._credentials_notice()
         
+    def _credentials_notice(self):
+        """Say once per process that imagery will be static or mock for lack of credentials"""
+        global _credentials_notice_shown
+        if not _credentials_notice_shown and not self.has_credentials():
+            _credentials_notice_shown = True
+            print("Sentinel Hub credentials not configured. Using static and mock imagery.")
+    
+    def has_credentials(self):
+        """Check whether Sentinel Hub credentials are configured"""
+        return not (self.config.SENTINEL_HUB_CLIENT_ID == 'your_sentinel_hub_client_id_here' or 
+                    self.config.SENTINEL_HUB_CLIENT_SECRET == 'your_sentinel_hub_client_secret_here')
+    
+    def cached_access_token(self):
+        """Return the current access token if it is still valid"""
+        if self.access_token and self.token_expiry and datetime.now() < self.token_expiry:
+            return self.access_token
+        return None
+    
+    def token_request(self):
+        """Describe the Sentinel Hub OAuth client credentials request"""
+        return {
+            'method': 'POST',
+            'url': self.config.SENTINEL_HUB_AUTH_URL,
+            'data': {
+                'grant_type': 'client_credentials',
+                'client_id': self.config.SENTINEL_HUB_CLIENT_ID,
+                'client_secret': self.config.SENTINEL_HUB_CLIENT_SECRET
+            },
+            'timeout': 30
+        }
+    
+    def parse_token(self, status_code, body):
+        """Store the access token from an OAuth response and return it"""
+        if status_code == 200:
+            token_data = json.loads(body)
+            self.access_token = token_data['access_token']
+            # Set expiry to 50 minutes (tokens typically last 1 hour)
+            self.token_expiry = datetime.now() + timedelta(minutes=50)
+            return self.access_token
+        print(f"Failed to get Sentinel Hub access token: {status_code}")
+        return None
+    
     def _get_access_token(self):
         """Get OAuth 2.0 access token from Sentinel Hub"""
         try:
             # Check if credentials are provided
-            if (self.config.SENTINEL_HUB_CLIENT_ID == 'your_sentinel_hub_client_id_here' or 
-                self.config.SENTINEL_HUB_CLIENT_SECRET == 'your_sentinel_hub_client_secret_here'):
-                print("Sentinel Hub credentials not configured. Using mock data.")
+            if not self.has_credentials():
                 return None
             
             # Check if we have a valid token
-            if self.access_token and self.token_expiry and datetime.now() < self.token_expiry:
-                return self.access_token
+            access_token = self.cached_access_token()
+            if access_token:
+                return access_token
             
             # Request new token
-            auth_data = {
-                'grant_type': 'client_credentials',
-                'client_id': self.config.SENTINEL_HUB_CLIENT_ID,
-                'client_secret': self.config.SENTINEL_HUB_CLIENT_SECRET
-            }
-            
-            response = requests.post(
-                self.config.SENTINEL_HUB_AUTH_URL,
-                data=auth_data,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                token_data = response.json()
-                self.access_token = token_data['access_token']
-                # Set expiry to 50 minutes (tokens typically last 1 hour)
-                self.token_expiry = datetime.now() + timedelta(minutes=50)
-                return self.access_token
-            else:
-                print(f"Failed to get Sentinel Hub access token: {response.status_code}")
-                return None
+            response = self.http.request(**self.token_request())
+            return self.parse_token(response.status_code, response.content)
                 
         except Exception as e:
             print(f"Error getting Sentinel Hub access token: {e}")
@@ -54,123 +126,320 @@ class SatelliteService:
     
     def get_area_imagery(self, bbox=None, time_range=None):
         """Get satellite imagery for a specific area"""
-        try:
-            # Use Mahakumbh area if no bbox provided
-            if not bbox:
-                bbox = [
-                    self.config.MAHAKUMBH_LON - 0.1,  # min_lon
-                    self.config.MAHAKUMBH_LAT - 0.1,  # min_lat
-                    self.config.MAHAKUMBH_LON + 0.1,  # max_lon
-                    self.config.MAHAKUMBH_LAT + 0.1   # max_lat
-                ]
-            
-            # Use last 7 days if no time range provided
-            if not time_range:
-                end_time = datetime.now()
-                start_time = end_time - timedelta(days=7)
-                time_range = {
-                    'from': start_time.isoformat() + 'Z',
-                    'to': end_time.isoformat() + 'Z'
-                }
-            
-            access_token = self._get_access_token()
-            if not access_token:
-                print("DEBUG: No access token available, using static image fallback")
-                return self._get_mock_satellite_data()
-            
-            # Prepare request payload for Sentinel Hub
-            payload = {
-                "input": {
-                    "bounds": {
-                        "bbox": bbox,
-                        "properties": {
-                            "crs": "http://www.opengis.net/def/crs/OGC/1.3/CRS84"
-                        }
-                    },
-                    "data": [
-                        {
-                            "type": "sentinel-2-l2a",
-                            "dataFilter": {
-                                "mosaickingOrder": "leastCC"
-                            }
-                        }
-                    ]
+        key = (
+            'get_area_imagery',
+            tuple(round(value, 6) for value in bbox) if bbox else None,
+            tuple(sorted(time_range.items())) if time_range else None
+        )
+        return self.flight.do(key, lambda: self._fetch_area_imagery(bbox, time_range))
+    
+    def default_bbox(self):
+        """Bounding box of the Mahakumbh area [min_lon, min_lat, max_lon, max_lat]"""
+        return [
+            self.config.MAHAKUMBH_LON - 0.1,  # min_lon
+            self.config.MAHAKUMBH_LAT - 0.1,  # min_lat
+            self.config.MAHAKUMBH_LON + 0.1,  # max_lon
+            self.config.MAHAKUMBH_LAT + 0.1   # max_lat
+        ]
+    
+    def default_time_range(self):
+        """Time range covering the last 7 days"""
+        end_time = datetime.now()
+        start_time = end_time - timedelta(days=7)
+        return {
+            'from': start_time.isoformat() + 'Z',
+            'to': end_time.isoformat() + 'Z'
+        }
+    
+    def imagery_request(self, access_token, bbox, time_range, width=IMAGE_WIDTH, height=IMAGE_HEIGHT, crs=CRS84):
+        """Describe the Sentinel Hub process API request for a true colour render"""
+        # Prepare request payload for Sentinel Hub
+        payload = {
+            "input": {
+                "bounds": {
+                    "bbox": bbox,
+                    "properties": {
+                        "crs": crs
+                    }
                 },
-                "output": {
-                    "width": 512,
-                    "height": 512,
-                    "responses": [
-                        {
-                            "identifier": "default",
-                            "format": {
-                                "type": "image/png"
-                            }
+                "data": [
+                    {
+                        "type": "sentinel-2-l2a",
+                        "dataFilter": {
+                            "mosaickingOrder": "leastCC"
                         }
-                    ]
-                },
-                "evalscript": """
-                    //VERSION=3
-                    function setup() {
-                        return {
-                            input: ["B02", "B03", "B04"],
-                            output: { bands: 3 }
-                        };
                     }
-                    
-                    function evaluatePixel(sample) {
-                        return [sample.B04, sample.B03, sample.B02];
+                ]
+            },
+            "output": {
+                "width": width,
+                "height": height,
+                "responses": [
+                    {
+                        "identifier": "default",
+                        "format": {
+                            "type": "image/png"
+                        }
                     }
-                """
-            }
-            
-            headers = {
+                ]
+            },
+            "evalscript": TRUE_COLOR_EVALSCRIPT
+        }
+        
+        return {
+            'method': 'POST',
+            'url': f"{self.config.SENTINEL_HUB_API_URL}/process",
+            'json': payload,
+            'headers': {
                 'Authorization': f'Bearer {access_token}',
                 'Content-Type': 'application/json'
-            }
+            },
+            'timeout': 60
+        }
+    
+    def quantize_time_range(self, time_range):
+        """Widen a time range to whole cache quanta so renders within one quantum share a cache key"""
+        quantum = self.config.SATELLITE_CACHE_TIME_QUANTUM_HOURS * 3600
+        epoch = datetime(1970, 1, 1)
+        start = (datetime.fromisoformat(time_range['from'].rstrip('Z')) - epoch).total_seconds()
+        end = (datetime.fromisoformat(time_range['to'].rstrip('Z')) - epoch).total_seconds()
+        return {
+            'from': (epoch + timedelta(seconds=start // quantum * quantum)).isoformat() + 'Z',
+            'to': (epoch + timedelta(seconds=-(-end // quantum) * quantum)).isoformat() + 'Z'
+        }
+    
+    def imagery_cache_key(self, bbox, time_range):
+        """Disk cache key for a true colour render of an area and time range"""
+        return ImageryDiskCache.make_key(
+            bbox=[round(value, 4) for value in bbox],
+            time_range=[time_range['from'], time_range['to']],
+            size=[IMAGE_WIDTH, IMAGE_HEIGHT],
+            evalscript=_evalscript_hash()
+        )
+    
+    def cached_imagery(self, bbox, time_range):
+        """Satellite data for a render already on disk, or None"""
+        image = self.disk_cache.get(self.imagery_cache_key(bbox, time_range))
+        if image is None:
+            return None
+        self.last_good = self._format_satellite_data(image, bbox, time_range)
+        return self.last_good
+    
+    def get_tile(self, z, x, y):
+        """(PNG, ETag, max age) of one tile of the event area pyramid, rendered on first request; None outside it
+
+        A Sentinel tile that fails to render is served as a crop of the static
+        image under the static tile's ETag and a short max age, so neither
+        browsers nor revalidation pin it, and its render is not retried for
+        SATELLITE_TILE_RETRY_AFTER seconds.
+        """
+        if not self.pyramid.contains(z, x, y):
+            return None
+        static_key = ImageryDiskCache.make_key(tile=[z, x, y], static=self.fallback.static_or_minimal().hash)
+        if not self.has_credentials():
+            return self._static_tile(static_key, z, x, y), static_key, self.config.SATELLITE_TILE_MAX_AGE
+        
+        time_range = self.quantize_time_range(self.default_time_range())
+        key = ImageryDiskCache.make_key(tile=[z, x, y], time_range=[time_range['from'], time_range['to']],
+                                        evalscript=_evalscript_hash())
+        tile = self.tile_cache.get(key)
+        if tile is None and self.tile_failures.get(key, 0) <= time.time():
+            tile = self.flight.do(('tile', key), lambda: self._render_tile(key, z, x, y, time_range))
+        if tile is not None:
+            return tile, key, self.config.SATELLITE_TILE_MAX_AGE
+        return self._static_tile(static_key, z, x, y), static_key, self.config.SATELLITE_TILE_FALLBACK_MAX_AGE
+    
+    def get_tile_metadata(self, tile_url):
+        """TileJSON description of the event area pyramid"""
+        bbox = self.pyramid.bbox
+        return {
+            'tilejson': '2.2.0',
+            'name': 'Mahakumbh Sentinel-2 true colour',
+            'tiles': [tile_url],
+            'minzoom': self.pyramid.min_zoom,
+            'maxzoom': self.pyramid.max_zoom,
+            'bounds': bbox,
+            'center': [(bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2, self.pyramid.min_zoom + 2],
+            'tile_count': self.pyramid.tile_count(),
+            'source': 'sentinel-2-l2a' if self.has_credentials() else 'static'
+        }
+    
+    def _render_tile(self, key, z, x, y, time_range):
+        """Render a tile through Sentinel Hub and store it on disk; None (remembered for a while) if that fails"""
+        access_token = self._get_access_token()
+        if access_token:
+            try:
+                request = self.imagery_request(access_token, tile_mercator_bounds(z, x, y), time_range,
+                                               width=TILE_SIZE, height=TILE_SIZE, crs=WEB_MERCATOR)
+                request['timeout'] = 30
+                response = self.http.request(**request)
+                if response.status_code == 200:
+                    self.tile_cache.put(key, response.content)
+                    return response.content
+                print(f"Failed to render tile {z}/{x}/{y}: {response.status_code}")
+            except Exception as e:
+                print(f"Error rendering tile {z}/{x}/{y}: {e}")
+        
+        now = time.time()
+        self.tile_failures = {failed: retry_at for failed, retry_at in self.tile_failures.items() if retry_at > now}
+        self.tile_failures[key] = now + self.config.SATELLITE_TILE_RETRY_AFTER
+        return None
+    
+    def _static_tile(self, key, z, x, y):
+        """A tile cropped from the static image, cached on disk under its own key"""
+        tile = self.tile_cache.get(key)
+        if tile is None:
+            tile = self.flight.do(('tile', key), lambda: self._crop_static_tile(key, z, x, y))
+        return tile
+    
+    def _crop_static_tile(self, key, z, x, y):
+        tile = crop_tile(self.fallback.static_image(), self.default_bbox(), z, x, y)
+        self.tile_cache.put(key, tile)
+        return tile
+    
+    def parse_imagery(self, status_code, body, bbox, time_range):
+        """Build satellite data from a process API response (status_code is None if the request failed)"""
+        if status_code == 200:
+            self.disk_cache.put(self.imagery_cache_key(bbox, time_range), body)
+            self.last_good = self._format_satellite_data(body, bbox, time_range)
+            return self.last_good
+        print(f"Failed to get satellite imagery: {status_code}")
+        return self._fallback_imagery()
+    
+    def _fetch_area_imagery(self, bbox, time_range):
+        """Render satellite imagery for an area through Sentinel Hub"""
+        try:
+            # Use Mahakumbh area and the last 7 days unless told otherwise
+            bbox = bbox or self.default_bbox()
+            time_range = self.quantize_time_range(time_range or self.default_time_range())
             
-            response = requests.post(
-                f"{self.config.SENTINEL_HUB_API_URL}/process",
-                json=payload,
-                headers=headers,
-                timeout=60
-            )
+            # The same render was already made (possibly before a restart): never leave the box for it
+            cached = self.cached_imagery(bbox, time_range)
+            if cached:
+                return cached
+            
+            access_token = self._get_access_token()
+            if not access_token:
+                return self._fallback_imagery()
             
-            if response.status_code == 200:
-                return self._format_satellite_data(response.content, bbox, time_range)
-            else:
-                print(f"Failed to get satellite imagery: {response.status_code}")
-                return self._get_mock_satellite_data()
+            response = self.http.request(**self.imagery_request(access_token, bbox, time_range))
+            return self.parse_imagery(response.status_code, response.content, bbox, time_range)
                 
         except Exception as e:
             print(f"Error getting satellite imagery: {e}")
-            print("DEBUG: Using static image fallback due to error")
-            return self._get_mock_satellite_data()
+            return self._fallback_imagery()
+    
+    def _fallback_imagery(self):
+        """Last good render, or the mock/static image if there never was one; flagged so it is not cached as fresh"""
+        return dict(self.last_good or self._get_mock_satellite_data(), fallback=True)
+    
+    def set_flood_zones(self, zones):
+        """Set the crowd zones flood water is measured in"""
+        self.flood.set_zones(zones)
+    
+    def water_bands_request(self, access_token, bbox, time_range, width, height):
+        """Describe the process API request for green, NIR and SWIR reflectance as float TIFFs in a tar"""
+        request = self.imagery_request(access_token, bbox, time_range, width=width, height=height)
+        request['json']['output']['responses'] = [
+            {"identifier": band, "format": {"type": "image/tiff"}} for band in WATER_BANDS
+        ]
+        request['json']['evalscript'] = WATER_BANDS_EVALSCRIPT
+        request['headers']['Accept'] = 'application/x-tar'
+        return request
     
     def get_flood_analysis(self, bbox=None):
         """Analyze satellite imagery for flood detection"""
+        key = ('get_flood_analysis', tuple(round(value, 6) for value in bbox) if bbox else None)
+        return self.flight.do(key, lambda: self._per_scene('flood', bbox, self._analyze_floods)
+                              or self._get_mock_flood_analysis())
+    
+    def _per_scene(self, name, bbox, analyze):
+        """Run an imagery-derived analysis only when the scene of its area has changed since it last ran"""
+        bbox = bbox or self.default_bbox()
+        imagery = self.get_area_imagery(bbox)
+        area, version = _area_key(bbox), imagery.get('scene_version')
+        result = self.scene.result(area, name, version)
+        if result is None:
+            result = analyze(bbox, imagery)
+            if result is not None:
+                self.scene.store_result(area, name, version, result)
+        return result
+    
+    def _analyze_floods(self, bbox, imagery):
+        """Water per crowd zone from Sentinel-2 bands, one tile of the bbox at a time (None if unavailable)"""
         try:
-            # Get recent imagery
-            imagery_data = self.get_area_imagery(bbox)
+            time_range = self.quantize_time_range(self.default_time_range())
+            access_token = self._get_access_token()
+            if not access_token:
+                return None
             
-            # Mock flood analysis (in real implementation, this would use ML models)
-            flood_risk = random.uniform(0.1, 0.8)
+            summaries, tile_hashes = [], []
+            for tile_bbox, width, height in split_bbox(bbox, self.config.FLOOD_RESOLUTION_M, self.config.FLOOD_TILE_PX):
+                body = self._water_bands(access_token, tile_bbox, time_range, width, height)
+                if body is None:
+                    return None
+                tile_hash = hashlib.sha256(body).hexdigest()
+                tile_hashes.append(tile_hash)
+                summaries.append(self.flood.analyze_tile(tile_hash, body, tile_bbox))
+            result = self.flood.combine(imagery_hash(tile_hashes), summaries)
             
-            return {
-                'flood_risk': flood_risk,
-                'risk_level': self._get_risk_level(flood_risk),
-                'affected_area_km2': random.uniform(0, 50),
-                'water_level_change': random.uniform(-2, 5),
-                'analysis_timestamp': datetime.now().isoformat(),
-                'imagery_data': imagery_data,
-                'recommendations': self._get_flood_recommendations(flood_risk)
-            }
+            excess = [zone['excess_fraction'] for zone in result['zones'] if zone['excess_fraction'] is not None]
+            flood_risk = min(1.0, max(excess, default=0.0) / self.config.FLOOD_CRITICAL_EXCESS_FRACTION)
+            return dict(
+                result,
+                flood_risk=flood_risk,
+                risk_level=self._get_risk_level(flood_risk),
+                affected_area_km2=round(sum(max(0.0, zone['excess_fraction']) * zone['observed_area_km2']
+                                            for zone in result['zones'] if zone['excess_fraction'] is not None), 4),
+                source='sentinel-2-l2a',
+                bbox=bbox,
+                time_range=time_range,
+                imagery_data=imagery,
+                recommendations=self._get_flood_recommendations(flood_risk)
+            )
         except Exception as e:
             print(f"Error analyzing flood data: {e}")
-            return self._get_mock_flood_analysis()
+            return None
+    
+    def _water_bands(self, access_token, tile_bbox, time_range, width, height):
+        """Band tar for one tile, from the disk cache or Sentinel Hub (None if it could not be fetched)"""
+        key = ImageryDiskCache.make_key(bbox=[round(value, 6) for value in tile_bbox],
+                                        time_range=[time_range['from'], time_range['to']],
+                                        size=[width, height], evalscript=_evalscript_hash(WATER_BANDS_EVALSCRIPT))
+        body = self.band_cache.get(key)
+        if body is not None:
+            return body
+        response = self.http.request(**self.water_bands_request(access_token, tile_bbox, time_range, width, height))
+        if response.status_code != 200:
+            print(f"Failed to get water bands: {response.status_code}")
+            return None
+        self.band_cache.put(key, response.content)
+        return response.content
     
     def get_terrain_analysis(self, bbox=None):
         """Analyze terrain and elevation data"""
+        return self._per_scene('terrain', bbox, self._analyze_terrain) or {}
+    
+    def _analyze_terrain(self, bbox, imagery):
+        """Terrain and land cover of an area (None on error)"""
         try:
+            summary = self.dem.area_summary(bbox) if self.dem else None
+            if summary:
+                return {
+                    'elevation_range': summary['elevation_range'],
+                    'slope_analysis': {
+                        'average_slope': summary['average_slope'],
+                        'steep_areas': summary['steep_area_km2'],
+                        'flood_prone_areas': summary['flood_prone_area_km2'],
+                        'flood_prone_fraction': summary['flood_prone_fraction'],
+                        'units': 'km2'
+                    },
+                    # Land cover needs a classifier over the imagery; still estimated
+                    'land_cover': self._mock_land_cover(),
+                    'source': 'dem',
+                    'analysis_timestamp': datetime.now().isoformat()
+                }
+            
             # Mock terrain analysis
             return {
                 'elevation_range': {
@@ -183,20 +452,85 @@ class SatelliteService:
                     'steep_areas': random.randint(0, 3),
                     'flood_prone_areas': random.randint(1, 5)
                 },
-                'land_cover': {
-                    'water_bodies': random.uniform(5, 15),
-                    'vegetation': random.uniform(20, 40),
-                    'urban_areas': random.uniform(30, 60),
-                    'bare_soil': random.uniform(5, 20)
-                },
+                'land_cover': self._mock_land_cover(),
                 'analysis_timestamp': datetime.now().isoformat()
             }
         except Exception as e:
             print(f"Error analyzing terrain: {e}")
-            return {}
+            return None
+    
+    def _mock_land_cover(self):
+        """Land cover percentages (mock)"""
+        return {
+            'water_bodies': random.uniform(5, 15),
+            'vegetation': random.uniform(20, 40),
+            'urban_areas': random.uniform(30, 60),
+            'bare_soil': random.uniform(5, 20)
+        }
+    
+    def get_point_terrain(self, lat, lon):
+        """Elevation, slope, aspect and flood-prone flag at a point, or None without a DEM"""
+        if self.dem is None:
+            return None
+        terrain = self.dem.terrain_at([lat], [lon])
+        return {
+            'lat': lat,
+            'lon': lon,
+            'elevation_m': _finite(terrain['elevation'][0]),
+            'slope_deg': _finite(terrain['slope'][0]),
+            'aspect_deg': _finite(terrain['aspect'][0]),
+            'flood_prone': bool(terrain['flood_prone'][0]),
+            'height_above_river_m': _finite(terrain['elevation'][0] - self.dem.reference_m)
+        }
+    
+    def get_zone_terrain(self, zones):
+        """Terrain statistics within FLOOD_ZONE_RADIUS_M of each zone, or None without a DEM"""
+        if self.dem is None:
+            return None
+        return [
+            dict(self.dem.zone_summary(zone['coordinates'][0], zone['coordinates'][1], self.config.FLOOD_ZONE_RADIUS_M) or {},
+                 zone_id=zone['id'], name=zone['name'])
+            for zone in zones
+        ]
+    
+    def _route_terrain(self, coordinates):
+        """Distance, climb and flood exposure along a route from the DEM"""
+        distance_km, elevation_gain, flooded, samples = 0.0, 0.0, 0, 0
+        for start, end in zip(coordinates, coordinates[1:]):
+            profile = self.dem.profile(start, end)
+            climbs = np.diff(profile['elevation'])
+            distance_km += profile['distance_km']
+            elevation_gain += float(np.nansum(np.clip(climbs, 0, None)))
+            flooded += int(np.count_nonzero(profile['flood_prone']))
+            samples += len(profile['flood_prone'])
+        return {
+            'distance_km': round(distance_km, 3),
+            'elevation_gain': round(elevation_gain, 2),
+            'flood_risk': round(flooded / samples, 4) if samples else 0.0
+        }
+    
+    def _load_dem(self):
+        """Memory-map the configured DEM, or None to keep the mock terrain"""
+        if not os.path.exists(self.config.DEM_PATH):
+            return None
+        try:
+            elevation, bbox, nodata = open_dem(self.config.DEM_PATH)
+            return DemRaster(elevation, bbox, nodata, tile_size=self.config.DEM_TILE_SIZE,
+                             flood_height_m=self.config.DEM_FLOOD_HEIGHT_M,
+                             flood_max_slope=self.config.DEM_FLOOD_MAX_SLOPE_DEG,
+                             steep_slope=self.config.DEM_STEEP_SLOPE_DEG,
+                             reference_m=self.config.DEM_FLOOD_REFERENCE_M,
+                             max_tiles=self.config.DEM_TILE_CACHE_SIZE)
+        except Exception as e:
+            print(f"Error loading DEM {self.config.DEM_PATH}: {e}")
+            return None
     
     def get_evacuation_route_analysis(self):
         """Analyze satellite data for evacuation route planning"""
+        return self._per_scene('evacuation', None, self._analyze_evacuation_routes) or {'routes': [], 'recommendations': []}
+    
+    def _analyze_evacuation_routes(self, bbox, imagery):
+        """Evacuation routes around the event area (None on error)"""
         try:
             # Get terrain analysis
             terrain = self.get_terrain_analysis()
@@ -229,6 +563,10 @@ class SatelliteService:
                 }
             ]
             
+            if self.dem is not None:
+                for route in routes:
+                    route.update(self._route_terrain(route['coordinates']))
+            
             return {
                 'routes': routes,
                 'terrain_analysis': terrain,
@@ -241,16 +579,13 @@ class SatelliteService:
             }
         except Exception as e:
             print(f"Error analyzing evacuation routes: {e}")
-            return {'routes': [], 'recommendations': []}
+            return None
     
     def _format_satellite_data(self, image_data, bbox, time_range):
         """Format satellite imagery data"""
         try:
-            # Encode image data as base64
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
-            
             return {
-                'image_data': image_base64,
+                **self._image_fields(image_data, bbox),
                 'bbox': bbox,
                 'time_range': time_range,
                 'resolution': '10m',
@@ -262,6 +597,18 @@ class SatelliteService:
             print(f"Error formatting satellite data: {e}")
             return {}
     
+    def _image_fields(self, image_bytes, bbox, image_hash=None):
+        """Store image bytes, describe where clients can fetch them and how far they are from the last scene"""
+        image_hash = self.images.put(image_bytes, image_hash)
+        change_score, scene_version = self.scene.observe(_area_key(bbox), image_bytes, image_hash)
+        return {
+            'image_hash': image_hash,
+            'image_url': f"/api/satellite/image/{image_hash}.png",
+            'image_size': len(image_bytes),
+            'change_score': round(change_score, 5),
+            'scene_version': scene_version
+        }
+    
     def _get_risk_level(self, risk_score):
         """Convert risk score to risk level"""
         if risk_score >= 0.7:
@@ -296,47 +643,19 @@ class SatelliteService:
     
     def _get_mock_satellite_data(self):
         """Generate mock satellite data for testing"""
-        print("DEBUG: _get_mock_satellite_data called - generating valid mock image")
-        try:
-            # Try to create an enhanced mock image, fallback to minimal if needed
-            mock_image = self._create_enhanced_mock_image()
-            print(f"DEBUG: Generated enhanced mock image, length: {len(mock_image)}")
-            
-            return {
-                'image_data': mock_image,
-                'bbox': [
-                    self.config.MAHAKUMBH_LON - 0.1,
-                    self.config.MAHAKUMBH_LAT - 0.1,
-                    self.config.MAHAKUMBH_LON + 0.1,
-                    self.config.MAHAKUMBH_LAT + 0.1
-                ],
-                'time_range': {
-                    'from': (datetime.now() - timedelta(days=7)).isoformat() + 'Z',
-                    'to': datetime.now().isoformat() + 'Z'
-                },
-                'resolution': '10m',
-                'satellite': 'Sentinel-2',
-                'bands': ['B02', 'B03', 'B04'],
-                'timestamp': datetime.now().isoformat()
-            }
-        except Exception as e:
-            print(f"DEBUG: Error generating enhanced mock image: {e}")
-            print("DEBUG: Falling back to static image")
-            # Return static image data as fallback
-            fallback_data = {
-                'image_data': self._get_static_image_fallback(),
-                'bbox': [81.7463, 25.3358, 81.9463, 25.5358],
-                'time_range': {
-                    'from': (datetime.now() - timedelta(days=7)).isoformat() + 'Z',
-                    'to': datetime.now().isoformat() + 'Z'
-                },
-                'resolution': '10m',
-                'satellite': 'Sentinel-2',
-                'bands': ['B02', 'B03', 'B04'],
-                'timestamp': datetime.now().isoformat()
-            }
-            print(f"DEBUG: Returning fallback data with image length: {len(fallback_data['image_data'])}")
-            return fallback_data
+        mock_image = self.fallback.mock(self.config.SATELLITE_MOCK_SEED)
+        return {
+            **self._image_fields(mock_image.png, self.default_bbox(), mock_image.hash),
+            'bbox': self.default_bbox(),
+            'time_range': {
+                'from': (datetime.now() - timedelta(days=7)).isoformat() + 'Z',
+                'to': datetime.now().isoformat() + 'Z'
+            },
+            'resolution': '10m',
+            'satellite': 'Sentinel-2',
+            'bands': ['B02', 'B03', 'B04'],
+            'timestamp': datetime.now().isoformat()
+        }
     
     def _get_mock_flood_analysis(self):
         """Generate mock flood analysis data"""
@@ -349,88 +668,15 @@ class SatelliteService:
             'recommendations': ['Monitor water levels', 'Prepare evacuation plans']
         }
 
-    def _get_minimal_png_fallback(self):
-        """Return a minimal PNG image that is guaranteed to be valid"""
-        return "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAQAAAC1HAwCAAAAC0lEQVR42mNkYAAAAAYAAjCB0C8AAAAASUVORK5CYII="
-    
-    def _load_static_satellite_image(self):
-        """Load the static satellite image from the backend directory"""
-        try:
-            # Get the path to the backend directory and look for the static image
-            backend_dir = os.path.dirname(os.path.dirname(__file__))
-            static_image_path = os.path.join(backend_dir, 'satellite-imagery.png')
-            
-            if os.path.exists(static_image_path):
-                print(f"DEBUG: Loading static satellite image from: {static_image_path}")
-                with open(static_image_path, 'rb') as image_file:
-                    image_data = image_file.read()
-                    base64_data = base64.b64encode(image_data).decode('utf-8')
-                    print(f"DEBUG: Static image loaded successfully, size: {len(image_data)} bytes, base64 length: {len(base64_data)}")
-                    return base64_data
-            else:
-                print(f"DEBUG: Static image not found at: {static_image_path}")
-                return None
-        except Exception as e:
-            print(f"DEBUG: Error loading static image: {e}")
-            return None
-    
-    def _get_static_image_fallback(self):
-        """Get the static satellite image as fallback, or minimal PNG if not available"""
-        static_image = self._load_static_satellite_image()
-        if static_image:
-            return static_image
-        else:
-            print("DEBUG: Static image not available, using minimal PNG fallback")
-            return self._get_minimal_png_fallback()
-    
-    def _create_enhanced_mock_image(self):
-        """Create an enhanced mock image using PIL if available"""
-        try:
-            from PIL import Image, ImageDraw
-            import io
-            
-            # Create a 256x256 image with terrain-like features
-            width, height = 256, 256
-            image = Image.new('RGB', (width, height), color=(34, 139, 34))  # Forest green base
-            
-            # Add some terrain features
-            draw = ImageDraw.Draw(image)
-            
-            # Add water bodies (blue areas)
-            for _ in range(3):
-                x1 = random.randint(0, width)
-                y1 = random.randint(0, height)
-                x2 = x1 + random.randint(40, 120)
-                y2 = y1 + random.randint(40, 120)
-                draw.ellipse([x1, y1, x2, y2], fill=(70, 130, 180))  # Steel blue
-            
-            # Add urban areas (gray areas)
-            for _ in range(5):
-                x1 = random.randint(0, width)
-                y1 = random.randint(0, height)
-                x2 = x1 + random.randint(20, 80)
-                y2 = y1 + random.randint(20, 80)
-                draw.rectangle([x1, y1, x2, y2], fill=(128, 128, 128))  # Gray
-            
-            # Add roads (dark lines)
-            for _ in range(4):
-                x1 = random.randint(0, width)
-                y1 = random.randint(0, height)
-                x2 = x1 + random.randint(80, 200)
-                y2 = y1 + random.randint(80, 200)
-                draw.line([x1, y1, x2, y2], fill=(64, 64, 64), width=6)
-            
-            # Convert to base64
-            buffer = io.BytesIO()
-            image.save(buffer, format='PNG')
-            image_data = buffer.getvalue()
-            buffer.close()
-            
-            return base64.b64encode(image_data).decode('utf-8')
-            
-        except ImportError:
-            print("DEBUG: PIL not available, using minimal PNG")
-            return self._get_minimal_png_fallback()
-        except Exception as e:
-            print(f"DEBUG: Error creating enhanced mock image: {e}")
-            return self._get_minimal_png_fallback()
+def _evalscript_hash(evalscript=TRUE_COLOR_EVALSCRIPT):
+    """Hash of an evalscript (true colour by default) with whitespace normalised"""
+    evalscript = '\n'.join(line.strip() for line in evalscript.strip().splitlines())
+    return hashlib.sha256(evalscript.encode()).hexdigest()
+
+def _area_key(bbox):
+    """Hashable identity of an area for scene tracking"""
+    return tuple(round(value, 4) for value in bbox)
+
+def _finite(value):
+    """A float for JSON, or None for NaN"""
+    return round(float(value), 3) if np.isfinite(value) else None
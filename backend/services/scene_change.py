@@ -0,0 +1,88 @@
+import io
+import threading
+import numpy as np
+
+def thumbnail(image_bytes, size):
+    """Greyscale size x size float32 thumbnail of an image in [0, 1], or None if it cannot be decoded"""
+    try:
+        from PIL import Image
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            small = image.convert('L').resize((size, size), Image.BOX)
+        return np.asarray(small, dtype=np.float32) / 255.0
+    except Exception as e:
+        print(f"Error decoding imagery for change detection: {e}")
+        return None
+
+class SceneChangeDetector:
+    """Decides whether new imagery of an area is a different scene from the last one analysed
+
+    Identical bytes (same hash) are never decoded. Otherwise the image is
+    reduced to a small greyscale thumbnail and scored by mean absolute pixel
+    difference against the scene analyses last ran on, so slow drift still
+    adds up to a change. Results derived from a scene are kept until the next
+    change.
+    """
+
+    def __init__(self, threshold=0.02, size=64):
+        self.threshold = threshold
+        self.size = size
+        self.lock = threading.Lock()
+        self.scenes = {}
+        self.stats = {'observations': 0, 'identical': 0, 'below_threshold': 0, 'changes': 0,
+                      'analyses_reused': 0, 'analyses_run': 0}
+
+    def observe(self, area, image_bytes, image_hash):
+        """Record imagery of an area; returns the change score against the current scene and its version"""
+        with self.lock:
+            self.stats['observations'] += 1
+            scene = self.scenes.get(area)
+            if scene is not None and scene['hash'] == image_hash:
+                self.stats['identical'] += 1
+                scene['score'] = 0.0
+                return 0.0, scene['version']
+            reference = scene['thumbnail'] if scene else None
+
+        # Decoding happens outside the lock; a concurrent observation of the same area just scores twice
+        current = thumbnail(image_bytes, self.size)
+        if reference is None or current is None or current.shape != reference.shape:
+            score = 1.0
+        else:
+            score = float(np.mean(np.abs(current - reference)))
+
+        with self.lock:
+            scene = self.scenes.get(area)
+            if scene is None or score >= self.threshold:
+                version = scene['version'] + 1 if scene else 1
+                self.scenes[area] = {'hash': image_hash, 'thumbnail': current, 'version': version,
+                                     'score': score, 'results': {}}
+                self.stats['changes'] += 1
+                return score, version
+            # Below the threshold: keep comparing against the scene analyses ran on
+            scene['score'] = score
+            self.stats['below_threshold'] += 1
+            return score, scene['version']
+
+    def result(self, area, name, version):
+        """An analysis result computed for this scene version, or None"""
+        with self.lock:
+            scene = self.scenes.get(area)
+            if scene is None or scene['version'] != version or name not in scene['results']:
+                return None
+            self.stats['analyses_reused'] += 1
+            return scene['results'][name]
+
+    def store_result(self, area, name, version, result):
+        """Keep an analysis result until the scene of the area changes"""
+        with self.lock:
+            self.stats['analyses_run'] += 1
+            scene = self.scenes.get(area)
+            if scene is not None and scene['version'] == version:
+                scene['results'][name] = result
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, threshold=self.threshold, areas={
+                str(list(area)): {'version': scene['version'], 'change_score': round(scene['score'], 5),
+                                  'hash': scene['hash'], 'analyses': sorted(scene['results'])}
+                for area, scene in self.scenes.items()
+            })
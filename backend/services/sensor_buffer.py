@@ -0,0 +1,103 @@
+import threading
+import numpy as np
+
+# Packed little-endian binary reading: zone row (see the schema endpoint), epoch seconds, people count,
+# flow per minute (negative when moving against the zone's flow_direction)
+READING_DTYPE = np.dtype([('zone', '<u4'), ('timestamp', '<f8'), ('count', '<f4'), ('flow', '<f4')])
+
+class SensorRingBuffer:
+    """The most recent sensor readings of every zone in preallocated zones x capacity arrays
+
+    Each zone row is a ring: head is where its next reading goes and size how
+    many slots hold data. A batch is written with a handful of array
+    operations regardless of its length, and nothing is allocated per reading.
+    """
+
+    def __init__(self, zones, capacity=256):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.timestamps = np.zeros((zones, capacity), dtype=np.float64)
+        self.counts = np.zeros((zones, capacity), dtype=np.float32)
+        self.flows = np.zeros((zones, capacity), dtype=np.float32)
+        self.head = np.zeros(zones, dtype=np.int64)
+        self.size = np.zeros(zones, dtype=np.int64)
+        self.unread = np.zeros(zones, dtype=np.int64)
+        self.stats = {'batches': 0, 'readings': 0, 'rejected': 0}
+
+    def ingest(self, zones, timestamps, counts, flows):
+        """Append a batch of readings (parallel arrays); returns how many were accepted
+
+        Readings for unknown zones or with non-finite values are rejected.
+        Within a batch each zone's readings are stored in timestamp order; if
+        a zone gets more than capacity of them only the newest are kept.
+        """
+        zones = np.asarray(zones, dtype=np.int64)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        counts = np.asarray(counts, dtype=np.float32)
+        flows = np.asarray(flows, dtype=np.float32)
+        valid = ((zones >= 0) & (zones < len(self.head)) & np.isfinite(timestamps)
+                 & np.isfinite(counts) & np.isfinite(flows))
+        rejected = int(valid.size - np.count_nonzero(valid))
+        if rejected:
+            zones, timestamps, counts, flows = zones[valid], timestamps[valid], counts[valid], flows[valid]
+
+        order = np.lexsort((timestamps, zones))
+        zones = zones[order]
+        # Rank of each reading within its zone's run, and the run length, from the sorted zone column
+        starts = np.flatnonzero(np.r_[True, zones[1:] != zones[:-1]]) if zones.size else np.empty(0, dtype=np.int64)
+        lengths = np.diff(np.r_[starts, zones.size])
+        rank = np.arange(zones.size) - np.repeat(starts, lengths)
+        run_length = np.repeat(lengths, lengths)
+        keep = rank >= run_length - self.capacity
+        run_zones = zones[starts]
+
+        with self.lock:
+            slots = (self.head[zones] + rank) % self.capacity
+            kept = order[keep]
+            self.timestamps[zones[keep], slots[keep]] = timestamps[kept]
+            self.counts[zones[keep], slots[keep]] = counts[kept]
+            self.flows[zones[keep], slots[keep]] = flows[kept]
+            self.head[run_zones] = (self.head[run_zones] + lengths) % self.capacity
+            self.size[run_zones] = np.minimum(self.capacity, self.size[run_zones] + lengths)
+            self.unread[run_zones] = np.minimum(self.capacity, self.unread[run_zones] + lengths)
+            self.stats['batches'] += 1
+            self.stats['readings'] += int(zones.size)
+            self.stats['rejected'] += rejected
+        return int(zones.size)
+
+    def latest(self):
+        """(timestamp, count, flow) of each zone's newest reading; NaN for zones with none"""
+        with self.lock:
+            rows = np.arange(len(self.head))
+            last = (self.head - 1) % self.capacity
+            empty = self.size == 0
+            return (np.where(empty, np.nan, self.timestamps[rows, last]),
+                    np.where(empty, np.nan, self.counts[rows, last]),
+                    np.where(empty, np.nan, self.flows[rows, last]))
+
+    def series(self, zone, limit=None):
+        """A zone's buffered readings, oldest first: (timestamps, counts, flows) copies"""
+        with self.lock:
+            size = int(self.size[zone]) if limit is None else min(int(self.size[zone]), limit)
+            slots = (self.head[zone] - size + np.arange(size)) % self.capacity
+            return self.timestamps[zone, slots], self.counts[zone, slots], self.flows[zone, slots]
+
+    def drain(self):
+        """Readings stored since the last drain (zones, timestamps, counts, flows), oldest first per zone
+
+        Readings overwritten before they were drained are lost.
+        """
+        with self.lock:
+            zones = np.flatnonzero(self.unread)
+            lengths = self.unread[zones]
+            rows = np.repeat(zones, lengths)
+            offsets = np.arange(rows.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            slots = (self.head[rows] - self.unread[rows] + offsets) % self.capacity
+            self.unread[zones] = 0
+            return rows, self.timestamps[rows, slots], self.counts[rows, slots], self.flows[rows, slots]
+
+    def get_stats(self):
+        with self.lock:
+            return dict(self.stats, zones=len(self.head), capacity=self.capacity,
+                        zones_reporting=int(np.count_nonzero(self.size)),
+                        buffer_bytes=self.timestamps.nbytes + self.counts.nbytes + self.flows.nbytes)
@@ -0,0 +1,44 @@
+import threading
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one in-flight call"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.stats = {'calls': 0, 'executed': 0, 'coalesced': 0}
+
+    def do(self, key, fn):
+        """Run fn() unless a call with this key is already running; then share its result"""
+        with self.lock:
+            self.stats['calls'] += 1
+            call = self.calls.get(key)
+            if call is not None:
+                self.stats['coalesced'] += 1
+                leader = False
+            else:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self.calls[key] = call
+                self.stats['executed'] += 1
+                leader = True
+
+        if leader:
+            try:
+                call['result'] = fn()
+            except Exception as e:
+                call['error'] = e
+            finally:
+                with self.lock:
+                    del self.calls[key]
+                call['done'].set()
+        else:
+            call['done'].wait()
+
+        if call['error'] is not None:
+            raise call['error']
+        return call['result']
+
+    def get_stats(self):
+        """Get how many calls ran and how many were coalesced"""
+        with self.lock:
+            return dict(self.stats, in_flight=len(self.calls))
@@ -0,0 +1,186 @@
+import math
+import numpy as np
+from services.geo import EARTH_RADIUS_KM, haversine_km
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+class GridIndex:
+    """Incremental lat/lon grid index for radius, k-nearest and bounding box queries"""
+
+    def __init__(self, cell_degrees=1.0):
+        self.cell_degrees = cell_degrees
+        self.rows = int(math.ceil(180 / cell_degrees))
+        self.cols = int(math.ceil(360 / cell_degrees))
+        self.cells = {}
+        self.points = {}
+        self.columns = None  # (keys, lats, lons) of every point sorted by latitude, rebuilt after changes
+
+    def insert(self, key, lat, lon):
+        """Add a point, or move it if the key is already indexed"""
+        if key in self.points:
+            self.remove(key)
+        self.columns = None
+        cell = self._cell(lat, lon)
+        self.cells.setdefault(cell, {})[key] = (lat, lon)
+        self.points[key] = cell
+
+    def insert_many(self, keys, lats, lons):
+        """Add or move a batch of points, computing their cells in one pass"""
+        lats = np.asarray(lats, dtype=np.float64)
+        lons = np.asarray(lons, dtype=np.float64)
+        rows = np.clip((lats + 90) // self.cell_degrees, 0, self.rows - 1).astype(np.int64)
+        cols = (((lons + 180) % 360) // self.cell_degrees).astype(np.int64) % self.cols
+        points, cells = self.points, self.cells
+        self.columns = None
+        for key, lat, lon, row, col in zip(keys, lats.tolist(), lons.tolist(), rows.tolist(), cols.tolist()):
+            if key in points:
+                self.remove(key)
+            cell = (row, col)
+            members = cells.get(cell)
+            if members is None:
+                members = cells[cell] = {}
+            members[key] = (lat, lon)
+            points[key] = cell
+
+    def remove(self, key):
+        cell = self.points.pop(key, None)
+        if cell is None:
+            return
+        self.columns = None
+        members = self.cells[cell]
+        del members[key]
+        if not members:
+            del self.cells[cell]
+
+    def radius(self, lat, lon, radius_km):
+        """Keys within radius_km of a point as (keys, distances_km)"""
+        dlat = radius_km / KM_PER_DEGREE
+        row_min, row_max = self._row(lat - dlat), self._row(lat + dlat)
+        widest = min(89.999, max(abs(lat - dlat), abs(lat + dlat)))
+        dlon = radius_km / (KM_PER_DEGREE * math.cos(math.radians(widest)))
+        if dlon >= 180 or lat + dlat >= 90 or lat - dlat <= -90:
+            cols = range(self.cols)
+        else:
+            cols = self._col_range(lon - dlon, lon + dlon)
+
+        keys, lats, lons = self._gather(row_min, row_max, cols)
+        distances = haversine_km(lat, lon, lats, lons)
+        inside = distances <= radius_km
+        return keys[inside], distances[inside]
+
+    def nearest(self, lat, lon, k):
+        """The k closest keys to a point as (keys, distances_km), closest first"""
+        k = min(k, len(self.points))
+        if k <= 0:
+            return np.array([], dtype=object), np.array([])
+        row, col = self._cell(lat, lon)
+        keys, dists = [], []
+        ring = 0
+        while True:
+            ring_keys, lats, lons = self._gather_ring(row, col, ring)
+            if ring_keys.size:
+                keys.append(ring_keys)
+                dists.append(haversine_km(lat, lon, lats, lons))
+            found = sum(part.size for part in keys)
+            if ring * 2 + 1 >= max(self.rows, self.cols):
+                break
+            if found >= k:
+                kth = np.partition(np.concatenate(dists), k - 1)[k - 1]
+                if self._ring_lower_bound(lat, ring) >= kth:
+                    break
+            ring += 1
+
+        keys = np.concatenate(keys)
+        dists = np.concatenate(dists)
+        order = np.argsort(dists)[:k]
+        return keys[order], dists[order]
+
+    def bbox(self, min_lon, min_lat, max_lon, max_lat):
+        """Keys inside a bounding box (min_lon > max_lon crosses the antimeridian)
+
+        Binary search on the latitude-sorted columns cuts out the box's
+        latitude band; only that band is tested for longitude.
+        """
+        keys, lats, lons = self._columns()
+        start = int(np.searchsorted(lats, min_lat, side='left'))
+        end = int(np.searchsorted(lats, max_lat, side='right'))
+        keys, lons = keys[start:end], lons[start:end]
+        if min_lon <= max_lon:
+            in_lon = (lons >= min_lon) & (lons <= max_lon)
+        else:
+            in_lon = (lons >= min_lon) | (lons <= max_lon)
+        return keys[in_lon]
+
+    def __len__(self):
+        return len(self.points)
+
+    def _ring_lower_bound(self, lat, ring):
+        """Closest any point beyond `ring` can be: `ring` whole cells away in latitude or longitude"""
+        gap = math.radians(ring * self.cell_degrees)
+        lat_km = gap * EARTH_RADIUS_KM
+        # Distance from the point to the meridian `gap` away, which every farther column lies beyond
+        lon_km = math.asin(min(1.0, math.cos(math.radians(lat)) * math.sin(min(gap, math.pi / 2)))) * EARTH_RADIUS_KM
+        return min(lat_km, lon_km)
+
+    def _gather(self, row_min, row_max, cols):
+        """Points from every populated cell in a row range and column set"""
+        cols = list(cols)
+        if (row_max - row_min + 1) * len(cols) > len(self.cells):
+            # Range covers more cells than are populated: walk the populated ones instead
+            wanted = set(cols)
+            cells = [cell for cell in self.cells if row_min <= cell[0] <= row_max and cell[1] in wanted]
+        else:
+            cells = [(row, col) for row in range(row_min, row_max + 1) for col in cols if (row, col) in self.cells]
+        return self._points_in(cells)
+
+    def _columns(self):
+        """Every point as (keys, lats, lons) sorted by latitude, rebuilt on first use after a change"""
+        if self.columns is None:
+            keys, lats, lons = self._points_in(list(self.cells))
+            order = np.argsort(lats, kind='stable')
+            self.columns = keys[order], lats[order], lons[order]
+        return self.columns
+
+    def _gather_ring(self, row, col, ring):
+        """Points in the cells exactly `ring` steps (Chebyshev) from a cell"""
+        if ring == 0:
+            return self._points_in([(row, col)] if (row, col) in self.cells else [])
+        cells = set()
+        for offset in range(-ring, ring + 1):
+            for r, c in ((row - ring, col + offset), (row + ring, col + offset),
+                         (row + offset, col - ring), (row + offset, col + ring)):
+                if 0 <= r < self.rows:
+                    cell = (r, c % self.cols)
+                    if cell in self.cells:
+                        cells.add(cell)
+        return self._points_in(cells)
+
+    def _points_in(self, cells):
+        keys, coordinates = [], []
+        for cell in cells:
+            members = self.cells[cell]
+            keys.extend(members.keys())
+            coordinates.extend(members.values())
+        if not keys:
+            return np.array([], dtype=object), np.array([]), np.array([])
+        coordinates = np.asarray(coordinates, dtype=np.float64)
+        return np.array(keys, dtype=object), coordinates[:, 0], coordinates[:, 1]
+
+    def _cell(self, lat, lon):
+        return self._row(lat), self._col(lon)
+
+    def _row(self, lat):
+        return min(self.rows - 1, max(0, int((lat + 90) // self.cell_degrees)))
+
+    def _col(self, lon):
+        return int(((lon + 180) % 360) // self.cell_degrees) % self.cols
+
+    def _col_range(self, lon_min, lon_max):
+        """Column indices covering a longitude span, wrapping at the antimeridian"""
+        start, end = self._col(lon_min), self._col(lon_max)
+        if lon_min > lon_max and start <= end:
+            # A span crossing the antimeridian that starts and ends in one column covers all of them
+            return range(self.cols)
+        if start <= end:
+            return range(start, end + 1)
+        return list(range(start, self.cols)) + list(range(0, end + 1))
@@ -0,0 +1,74 @@
+import io
+import math
+
+TILE_SIZE = 256
+WEB_MERCATOR_HALF_WORLD = math.pi * 6378137.0
+
+def tile_bounds(z, x, y):
+    """Bounds of an XYZ tile in degrees [min_lon, min_lat, max_lon, max_lat]"""
+    n = 2 ** z
+    return [x / n * 360.0 - 180.0, _tile_lat(y + 1, n), (x + 1) / n * 360.0 - 180.0, _tile_lat(y, n)]
+
+def tile_mercator_bounds(z, x, y):
+    """Bounds of an XYZ tile in EPSG:3857 metres [min_x, min_y, max_x, max_y]"""
+    size = 2 * WEB_MERCATOR_HALF_WORLD / 2 ** z
+    min_x = -WEB_MERCATOR_HALF_WORLD + x * size
+    max_y = WEB_MERCATOR_HALF_WORLD - y * size
+    return [min_x, max_y - size, min_x + size, max_y]
+
+def tile_range(bbox, z):
+    """Inclusive (x_min, x_max, y_min, y_max) of the tiles covering a lon/lat bbox at a zoom"""
+    n = 2 ** z
+    x_min, y_max = _tile_xy(bbox[0], bbox[1], n)
+    x_max, y_min = _tile_xy(bbox[2], bbox[3], n)
+    return x_min, x_max, y_min, y_max
+
+class TilePyramid:
+    """The XYZ tiles covering an area between two zoom levels"""
+
+    def __init__(self, bbox, min_zoom, max_zoom):
+        self.bbox = list(bbox)
+        self.min_zoom = min_zoom
+        self.max_zoom = max_zoom
+
+    def contains(self, z, x, y):
+        if not self.min_zoom <= z <= self.max_zoom:
+            return False
+        x_min, x_max, y_min, y_max = tile_range(self.bbox, z)
+        return x_min <= x <= x_max and y_min <= y <= y_max
+
+    def tile_count(self):
+        count = 0
+        for z in range(self.min_zoom, self.max_zoom + 1):
+            x_min, x_max, y_min, y_max = tile_range(self.bbox, z)
+            count += (x_max - x_min + 1) * (y_max - y_min + 1)
+        return count
+
+def crop_tile(source, source_bbox, z, x, y):
+    """Cut one tile out of a lon/lat-aligned RGBA image covering source_bbox; parts outside it are transparent"""
+    from PIL import Image
+
+    width, height = source.size
+    lon_span = source_bbox[2] - source_bbox[0]
+    lat_span = source_bbox[3] - source_bbox[1]
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(z, x, y)
+    # Linear in latitude: the mercator stretch across one tile at these zooms is well under a pixel
+    extent = (
+        (min_lon - source_bbox[0]) / lon_span * width,
+        (source_bbox[3] - max_lat) / lat_span * height,
+        (max_lon - source_bbox[0]) / lon_span * width,
+        (source_bbox[3] - min_lat) / lat_span * height
+    )
+    tile = source.transform((TILE_SIZE, TILE_SIZE), Image.EXTENT, extent, Image.BILINEAR)
+    buffer = io.BytesIO()
+    tile.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+def _tile_lat(y, n):
+    return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+def _tile_xy(lon, lat, n):
+    lat_rad = math.radians(max(-85.0511, min(85.0511, lat)))
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(n - 1, max(0, x)), min(n - 1, max(0, y))
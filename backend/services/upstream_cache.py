@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+
+class UpstreamCache:
+    """Bounded LRU cache with per-source TTL and stale-while-revalidate
+
+    Payloads a service flags with 'fallback' (last good or mock data served
+    while its provider fails) are kept for CACHE_FALLBACK_TTL only, so the
+    real data is fetched again soon after the provider recovers.
+    """
+
+    def __init__(self, max_entries=None):
+        self.config = Config()
+        self.max_entries = max_entries or self.config.CACHE_MAX_ENTRIES
+        self.entries = OrderedDict()
+        self.refreshing = set()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'refreshes': 0, 'refresh_errors': 0, 'evictions': 0}
+
+    def fetch(self, source, loader, key=None):
+        """Return (value, metadata) for a source, loading or revalidating as needed"""
+        cache_key = (source, key)
+        ttl = self.config.CACHE_TTLS.get(source, self.config.CACHE_DEFAULT_TTL)
+        max_stale = ttl * self.config.CACHE_MAX_STALE_FACTOR
+        now = time.time()
+
+        with self.lock:
+            entry = self.entries.get(cache_key)
+            if entry is not None:
+                if entry['fallback']:
+                    ttl = self._fallback_ttl(ttl)
+                    max_stale = ttl * self.config.CACHE_MAX_STALE_FACTOR
+                age = now - entry['stored_at']
+                if age <= ttl:
+                    self.entries.move_to_end(cache_key)
+                    self.stats['hits'] += 1
+                    return entry['value'], self._metadata('hit', age, ttl)
+                if age <= max_stale:
+                    # Serve stale data and let exactly one background refresh replace it
+                    self.entries.move_to_end(cache_key)
+                    self.stats['stale_hits'] += 1
+                    if cache_key not in self.refreshing:
+                        self.refreshing.add(cache_key)
+                        threading.Thread(target=self._refresh, args=(cache_key, loader), daemon=True).start()
+                    return entry['value'], self._metadata('stale', age, ttl)
+            self.stats['misses'] += 1
+
+        value = loader()
+        if self._store(cache_key, value):
+            ttl = self._fallback_ttl(ttl)
+        return value, self._metadata('miss', 0.0, ttl)
+
+    def put(self, source, value, key=None):
+        """Store a value fetched elsewhere (e.g. by the background refresh)"""
+        self._store((source, key), value)
+
+    def get_stats(self):
+        """Get hit/miss counters and current entry ages"""
+        now = time.time()
+        with self.lock:
+            return {
+                'max_entries': self.max_entries,
+                'entries': [
+                    {'source': source, 'key': key, 'age_seconds': round(now - entry['stored_at'], 1),
+                     'fallback': entry['fallback']}
+                    for (source, key), entry in self.entries.items()
+                ],
+                **self.stats
+            }
+
+    def _refresh(self, cache_key, loader):
+        """Reload one entry in the background"""
+        try:
+            self._store(cache_key, loader())
+            with self.lock:
+                self.stats['refreshes'] += 1
+        except Exception as e:
+            print(f"Error refreshing cached {cache_key[0]} data: {e}")
+            with self.lock:
+                self.stats['refresh_errors'] += 1
+        finally:
+            with self.lock:
+                self.refreshing.discard(cache_key)
+
+    def _store(self, cache_key, value):
+        """Store a value; returns whether it is a fallback payload"""
+        with self.lock:
+            fallback = isinstance(value, dict) and bool(value.get('fallback'))
+            self.entries[cache_key] = {'value': value, 'stored_at': time.time(), 'fallback': fallback}
+            self.entries.move_to_end(cache_key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats['evictions'] += 1
+        return fallback
+
+    def _fallback_ttl(self, ttl):
+        return min(ttl, self.config.CACHE_FALLBACK_TTL)
+
+    def _metadata(self, status, age, ttl):
+        return {'status': status, 'age_seconds': round(age, 1), 'ttl_seconds': ttl}
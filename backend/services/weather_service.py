@@ -1,59 +1,86 @@
-import requests
 import json
 from datetime import datetime, timedelta
 import random
 from config import Config
+from services.http_client import get_http_client
+from services.single_flight import SingleFlight
 
 class WeatherService:
     def __init__(self):
         self.config = Config()
+        self.http = get_http_client()
+        self.flight = SingleFlight()
+        self.last_good = {}
         self.base_url = "https://api.openweathermap.org/data/2.5"
         
     def get_current_weather(self):
         """Get current weather data for Mahakumbh location"""
-        try:
-            # Try to get real data from OpenWeatherMap
-            url = f"{self.base_url}/weather"
-            params = {
+        return self.flight.do(('get_current_weather',), self._fetch_current_weather)
+    
+    def get_forecast(self):
+        """Get weather forecast for next 5 days"""
+        return self.flight.do(('get_forecast',), self._fetch_forecast)
+    
+    def current_weather_request(self):
+        """Describe the OpenWeatherMap current weather request"""
+        return {
+            'method': 'GET',
+            'url': f"{self.base_url}/weather",
+            'params': {
                 'lat': self.config.MAHAKUMBH_LAT,
                 'lon': self.config.MAHAKUMBH_LON,
                 'appid': self.config.OPENWEATHER_API_KEY,
                 'units': 'metric'
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                return self._format_weather_data(data)
-            else:
-                # Fallback to mock data
-                return self._get_mock_weather_data()
-                
+            },
+            'timeout': 10
+        }
+    
+    def forecast_request(self):
+        """Describe the OpenWeatherMap forecast request"""
+        request = self.current_weather_request()
+        request['url'] = f"{self.base_url}/forecast"
+        return request
+    
+    def parse_current_weather(self, status_code, body):
+        """Build weather data from a response (status_code is None if the request failed)"""
+        if status_code == 200:
+            self.last_good['weather'] = self._format_weather_data(json.loads(body))
+            return self.last_good['weather']
+        # Fallback to the last good reading or mock data
+        return self._fallback_weather()
+    
+    def parse_forecast(self, status_code, body):
+        """Build forecast data from a response (status_code is None if the request failed)"""
+        if status_code == 200:
+            self.last_good['forecast'] = self._format_forecast_data(json.loads(body))
+            return self.last_good['forecast']
+        return self._fallback_forecast()
+    
+    def _fetch_current_weather(self):
+        """Fetch current weather from OpenWeatherMap"""
+        try:
+            response = self.http.request(**self.current_weather_request())
+            return self.parse_current_weather(response.status_code, response.content)
         except Exception as e:
             print(f"Error fetching weather data: {e}")
-            return self._get_mock_weather_data()
+            return self._fallback_weather()
     
-    def get_forecast(self):
-        """Get weather forecast for next 5 days"""
+    def _fetch_forecast(self):
+        """Fetch the 5 day forecast from OpenWeatherMap"""
         try:
-            url = f"{self.base_url}/forecast"
-            params = {
-                'lat': self.config.MAHAKUMBH_LAT,
-                'lon': self.config.MAHAKUMBH_LON,
-                'appid': self.config.OPENWEATHER_API_KEY,
-                'units': 'metric'
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            if response.status_code == 200:
-                data = response.json()
-                return self._format_forecast_data(data)
-            else:
-                return self._get_mock_forecast_data()
-                
+            response = self.http.request(**self.forecast_request())
+            return self.parse_forecast(response.status_code, response.content)
         except Exception as e:
             print(f"Error fetching forecast data: {e}")
-            return self._get_mock_forecast_data()
+            return self._fallback_forecast()
+    
+    def _fallback_weather(self):
+        """Last good weather reading, or mock data if there never was one; flagged so it is not cached as fresh"""
+        return dict(self.last_good.get('weather') or self._get_mock_weather_data(), fallback=True)
+    
+    def _fallback_forecast(self):
+        """Last good forecast, or mock data if there never was one; flagged so it is not cached as fresh"""
+        return dict(self.last_good.get('forecast') or self._get_mock_forecast_data(), fallback=True)
     
     def get_flood_alerts(self):
         """Get flood alerts from CWC"""
@@ -0,0 +1,85 @@
+import numpy as np
+
+RISK_LEVELS = ['low', 'moderate', 'high', 'critical']
+RISK_DENSITY_BOUNDS = np.array([0.3, 0.7, 0.9])  # Density at which each level after 'low' starts
+HIGH_RISK = RISK_LEVELS.index('high')
+DIRECTIONS = ['north', 'east', 'south', 'west']
+
+def risk_codes(density):
+    """Risk level index (into RISK_LEVELS) for each density"""
+    return np.searchsorted(RISK_DENSITY_BOUNDS, density, side='right').astype(np.int8)
+
+class ZoneTable:
+    """Crowd zone state as NumPy columns, one row per zone
+
+    Updates and aggregates are whole-column operations; per-zone dicts are
+    only built by records() for the API.
+    """
+
+    def __init__(self, zones):
+        self.ids = np.array([zone['id'] for zone in zones], dtype=object)
+        self.names = np.array([zone['name'] for zone in zones], dtype=object)
+        self.lats = np.array([zone['coordinates'][0] for zone in zones], dtype=np.float64)
+        self.lons = np.array([zone['coordinates'][1] for zone in zones], dtype=np.float64)
+        self.capacity = np.array([zone['capacity'] for zone in zones], dtype=np.int64)
+        self.direction = np.array([DIRECTIONS.index(zone.get('flow_direction', 'north')) for zone in zones], dtype=np.int8)
+        self.density = np.array([zone.get('current_density', 0.0) for zone in zones], dtype=np.float64)
+        self.flow_rate = np.zeros(len(zones), dtype=np.int64)
+        self.risk = risk_codes(self.density)
+        self.rows = {zone_id: row for row, zone_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def update(self, density, flow_rate):
+        """Replace the density and flow rate columns and rederive risk levels"""
+        self.density = np.asarray(density, dtype=np.float64)
+        self.flow_rate = np.asarray(flow_rate, dtype=np.int64)
+        self.risk = risk_codes(self.density)
+
+    def metrics(self):
+        """Capacity, occupancy and density over all zones"""
+        total_capacity = int(self.capacity.sum())
+        total_current = float(np.dot(self.capacity, self.density))
+        return {
+            'total_capacity': total_capacity,
+            'current_occupancy': int(total_current),
+            'occupancy_percentage': total_current / total_capacity * 100 if total_capacity else 0.0,
+            'average_density': float(self.density.mean()) if len(self) else 0.0,
+            'max_density': float(self.density.max()) if len(self) else 0.0,
+            'zones_at_capacity': int(np.count_nonzero(self.density > 0.9))
+        }
+
+    def risk_counts(self):
+        """Number of zones at each risk level"""
+        return dict(zip(RISK_LEVELS, np.bincount(self.risk, minlength=len(RISK_LEVELS)).tolist()))
+
+    def critical_rows(self):
+        """Rows of zones at high or critical risk, in zone order"""
+        return np.flatnonzero(self.risk >= HIGH_RISK)
+
+    def records(self, rows=None, extra=None, defaults=None):
+        """JSON view of zones (all, or the given rows)
+
+        extra maps a row to additional fields for that zone; zones without an
+        entry get defaults instead.
+        """
+        rows = np.arange(len(self)) if rows is None else np.asarray(rows, dtype=np.int64)
+        extra, defaults = extra or {}, defaults or {}
+        columns = zip(rows.tolist(), self.ids[rows].tolist(), self.names[rows].tolist(), self.lats[rows].tolist(),
+                      self.lons[rows].tolist(), self.capacity[rows].tolist(), self.density[rows].tolist(),
+                      self.direction[rows].tolist(), self.risk[rows].tolist(), self.flow_rate[rows].tolist())
+        records = []
+        for row, zone_id, name, lat, lon, capacity, density, direction, risk, flow_rate in columns:
+            records.append({
+                'id': zone_id,
+                'name': name,
+                'coordinates': [lat, lon],
+                'capacity': capacity,
+                'current_density': density,
+                'flow_direction': DIRECTIONS[direction],
+                'risk_level': RISK_LEVELS[risk],
+                'flow_rate': flow_rate,
+                **extra.get(row, defaults)
+            })
+        return records
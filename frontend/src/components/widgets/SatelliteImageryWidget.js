@@ -20,6 +20,8 @@ import {
   Download as DownloadIcon,
 } from '@mui/icons-material';
 
+const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:5001';
+
 const SatelliteImageryWidget = ({ data }) => {
   const [openDialog, setOpenDialog] = React.useState(false);
 
@@ -38,6 +40,9 @@ const SatelliteImageryWidget = ({ data }) => {
     );
   }
 
+  // The image itself is served by a content-addressed endpoint; the JSON only carries its URL
+  const imageSrc = data.image_url ? `${API_BASE_URL}${data.image_url}` : null;
+
   const handleOpenDialog = () => {
     setOpenDialog(true);
   };
@@ -46,12 +51,15 @@ const SatelliteImageryWidget = ({ data }) => {
     setOpenDialog(false);
   };
 
-  const handleDownload = () => {
-    if (data.image_data) {
+  const handleDownload = async () => {
+    if (imageSrc) {
+      const response = await fetch(imageSrc);
+      const objectUrl = URL.createObjectURL(await response.blob());
       const link = document.createElement('a');
-      link.href = `data:image/png;base64,${data.image_data}`;
+      link.href = objectUrl;
       link.download = `satellite-imagery-${new Date().toISOString().split('T')[0]}.png`;
       link.click();
+      URL.revokeObjectURL(objectUrl);
     }
   };
 
@@ -77,13 +85,13 @@ const SatelliteImageryWidget = ({ data }) => {
           </Box>
 
           {/* Image Display */}
-          {data.image_data ? (
+          {imageSrc ? (
             <Box mb={3}>
               <Box
                 sx={{
                   width: '100%',
                   height: 200,
-                  backgroundImage: `url(data:image/png;base64,${data.image_data})`,
+                  backgroundImage: `url(${imageSrc})`,
                   backgroundSize: 'cover',
                   backgroundPosition: 'center',
                   backgroundRepeat: 'no-repeat',
@@ -176,7 +184,7 @@ const SatelliteImageryWidget = ({ data }) => {
               size="small"
               startIcon={<VisibilityIcon />}
               onClick={handleOpenDialog}
-              disabled={!data.image_data}
+              disabled={!imageSrc}
             >
               View Full
             </Button>
@@ -185,7 +193,7 @@ const SatelliteImageryWidget = ({ data }) => {
               size="small"
               startIcon={<DownloadIcon />}
               onClick={handleDownload}
-              disabled={!data.image_data}
+              disabled={!imageSrc}
             >
               Download
             </Button>
@@ -203,7 +211,7 @@ const SatelliteImageryWidget = ({ data }) => {
           </Box>
 
           {/* Configuration Help for Placeholder Images */}
-          {data.image_data && data.image_data.length < 200 && (
+          {imageSrc && data.image_size < 200 && (
             <Box mt={2}>
               <Alert severity="info">
                 <Typography variant="body2">
@@ -239,12 +247,12 @@ const SatelliteImageryWidget = ({ data }) => {
           </Typography>
         </DialogTitle>
         <DialogContent>
-          {data.image_data && (
+          {imageSrc && (
             <Box
               sx={{
                 width: '100%',
                 height: '60vh',
-                backgroundImage: `url(data:image/png;base64,${data.image_data})`,
+                backgroundImage: `url(${imageSrc})`,
                 backgroundSize: 'contain',
                 backgroundPosition: 'center',
                 backgroundRepeat: 'no-repeat',
@@ -56,7 +56,7 @@ const SatelliteWidget = ({ data }) => {
           <Box display="flex" alignItems="center" gap={1} mb={1}>
             <VisibilityIcon color="success" fontSize="small" />
             <Typography variant="body2">
-              {data.image_data ? 'Image Available' : 'No Image'}
+              {data.image_url ? 'Image Available' : 'No Image'}
             </Typography>
           </Box>
           <Chip 